@@ -0,0 +1,83 @@
+"""Dispatch cost per emit: pyee + per-consumer lookup vs. EventBus.
+
+Usage: python benchmarks/bench_dispatch.py (needs pyee: pip install .[bench])
+"""
+
+import collections
+import timeit
+
+from pyee import EventEmitter
+
+from firestation_gateway.eventbus import EventBus
+
+CONSUMERS = 6
+EVENTS = {
+    "genius_alarm": {"enabled": True, "type": "callout"},
+    "genius_idle": {"enabled": True, "type": "normal"},
+    "genius_selftest": {"enabled": False, "type": "callout"},
+}
+DATA = {"time": "", "source": "Genius"}
+NUMBER = 100_000
+
+
+def setup_pyee():
+    emitter = EventEmitter()
+    queues = []
+    for _ in range(CONSUMERS):
+        q = collections.deque()
+        queues.append(q)
+        for name in EVENTS:
+            # BaseConsumerQueued._create_handler before the event bus
+            def handler(data, name=name, q=q):
+                q.append((name, data))
+
+            emitter.on(name, handler)
+
+    source = "genius"
+
+    def emit():
+        # producer side: event name built per emit
+        emitter.emit(source + "_alarm", DATA)
+        emitter.emit(source + "_alarm", DATA)
+        # consumer side: config lookup and enabled check per event
+        for q in queues:
+            while q:
+                name, _ = q.popleft()
+                cfg = EVENTS.get(name)
+                if cfg is not None and cfg.get("enabled", True) is False:
+                    continue
+
+    return emit
+
+
+def setup_bus():
+    bus = EventBus()
+    queues = []
+    for _ in range(CONSUMERS):
+        q = collections.deque()
+        queues.append(q)
+        for name, cfg in EVENTS.items():
+            bus.subscribe(name, lambda n, d, c, q=q: q.append((n, d, c)))
+    bus.compile(EVENTS)
+    alarm = "genius_alarm"
+
+    def emit():
+        bus.emit(alarm, DATA)
+        bus.emit(alarm, DATA)
+        for q in queues:
+            while q:
+                q.popleft()
+
+    return emit
+
+
+def main():
+    for label, setup in (("pyee", setup_pyee), ("eventbus", setup_bus)):
+        emit = setup()
+        best = min(timeit.repeat(emit, number=NUMBER, repeat=5))
+        # two emits per call
+        print(f"{label:10s} {best / NUMBER / 2 * 1e9:8.0f} ns/emit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Benchmarks of the hot paths, no GPIO hardware or network needed.
+
+Usage:
+    python benchmarks/suite.py [--output results.json]
+                               [--compare baseline.json [--threshold 0.2]]
+
+Every case reports ops/sec and the p50/p99 latency of a single operation.
+With --compare the results are checked against a saved run, the exit code
+is 1 if a case got slower than the threshold (relative p50).
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+
+from firestation_gateway.consumers.base import BaseConsumerQueued
+from firestation_gateway.consumers.connect import Connect
+from firestation_gateway.consumers.generic_webhook import GenericWebhook
+from firestation_gateway.consumers.tetracontrol import Tetracontrol
+from firestation_gateway.eventbus import EventBus
+from firestation_gateway.gpio import simulation
+from firestation_gateway.producers.generic_input import GenericInput
+from firestation_gateway.producers.genius import Genius
+
+WARMUP = 1_000
+ITERATIONS = 20_000
+
+
+class StubEmitter:
+    def __init__(self):
+        self.count = 0
+
+    def emit(self, event, data):
+        _ = event, data
+        self.count += 1
+
+
+class NullConsumer(BaseConsumerQueued):
+    def handle_event(self, event_name, data, evt_cfg=None):
+        pass
+
+
+def measure(func, iterations=ITERATIONS, warmup=WARMUP):
+    """Time func() per call, return ops/sec and p50/p99 in ns."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    clock = time.perf_counter_ns
+    start = clock()
+    for _ in range(iterations):
+        t = clock()
+        func()
+        samples.append(clock() - t)
+    total = clock() - start
+    samples.sort()
+    return {
+        "ops_per_sec": iterations / (total / 1e9),
+        "p50_ns": samples[len(samples) // 2],
+        "p99_ns": samples[int(len(samples) * 0.99)],
+        "mean_ns": statistics.fmean(samples),
+    }
+
+
+def bench_sampling():
+    inp = GenericInput(
+        "Bench",
+        StubEmitter(),
+        {},
+        {"time_debounce": 500, "time_alarm": 2000, "simulate": "memory"},
+    )
+    now = [0]
+
+    def sample():
+        now[0] += 100_000_000
+        inp.sample(now[0])
+
+    return measure(sample)
+
+
+def _transitions(inp):
+    # each call moves the input one state further: IDLE -> ACTIVE ->
+    # ALARM -> IDLE (step size larger than all thresholds)
+    now = [0]
+    steps = [True, True, False]
+    step = [0]
+    step_ns = 10_000_000_000
+
+    def transition():
+        level = steps[step[0]]
+        simulation.set_line(inp.name, level)
+        if level and inp._active_since is not None:
+            now[0] += step_ns
+        else:
+            now[0] += 1
+        inp.handle_edge(now[0])
+        step[0] = (step[0] + 1) % 3
+
+    return transition
+
+
+def bench_transitions_generic_input():
+    inp = GenericInput(
+        "Bench",
+        StubEmitter(),
+        {},
+        {"time_debounce": 500, "time_alarm": 2000, "simulate": "memory"},
+    )
+    return measure(_transitions(inp))
+
+
+def bench_transitions_genius():
+    inp = Genius("Bench", StubEmitter(), {}, {"simulate": "memory"})
+    return measure(_transitions(inp))
+
+
+def bench_emit_to_enqueue():
+    bus = EventBus()
+    consumers = [
+        NullConsumer(f"c{i}", bus, {"bench_alarm": {"enabled": True}})
+        for i in range(3)
+    ]
+    bus.compile(["bench_alarm"])
+    data = {"time": "", "source": "bench"}
+
+    def emit():
+        bus.emit("bench_alarm", data)
+        for c in consumers:
+            c.event_queue.get_nowait()
+
+    return measure(emit)
+
+
+def bench_payload_tetracontrol():
+    events = {
+        "bench_alarm": {
+            "type": "callout",
+            "dest": 1234567,
+            "sub": ["&01", "&02"],
+            "text": "F-RWM Fwh Musterstadt*Hauptstr. 112",
+        }
+    }
+    consumer = Tetracontrol(
+        "Bench", EventBus(), events, {"testmode": True, "url": "http://x"}
+    )
+    data = {"time": "", "source": "bench"}
+
+    def build():
+        consumer.handle_event("bench_alarm", data, events["bench_alarm"])
+        consumer.alarm_number = 1
+
+    return measure(build)
+
+
+def bench_payload_connect():
+    events = {
+        "bench_alarm": {
+            "ric": "0000000",
+            "keyword": "F-RWM",
+            "facts": "Meldereingang",
+            "source": "Pi",
+            "address": {"street": "Hauptstr.", "housenumber": "112"},
+        }
+    }
+    consumer = Connect("Bench", EventBus(), events, {"testmode": True})
+    data = {"time": "", "source": "bench"}
+
+    def build():
+        consumer.handle_event("bench_alarm", data, events["bench_alarm"])
+
+    return measure(build)
+
+
+def bench_payload_webhook():
+    events = {
+        "bench_alarm": {
+            "body": {
+                "text": "Alarm {data[source]} ({time})",
+                "data": "{data}",
+            }
+        }
+    }
+    consumer = GenericWebhook(
+        "Bench",
+        EventBus(),
+        events,
+        {"testmode": True, "url": "http://x", "prewarm": False},
+    )
+    data = {"time": "", "source": "bench"}
+
+    def build():
+        consumer.handle_event("bench_alarm", data, events["bench_alarm"])
+
+    return measure(build)
+
+
+CASES = {
+    "sampling": bench_sampling,
+    "transitions_generic_input": bench_transitions_generic_input,
+    "transitions_genius": bench_transitions_genius,
+    "emit_to_enqueue": bench_emit_to_enqueue,
+    "payload_tetracontrol": bench_payload_tetracontrol,
+    "payload_connect": bench_payload_connect,
+    "payload_webhook": bench_payload_webhook,
+}
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        change = res["p50_ns"] / base["p50_ns"] - 1.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:28s} p50 {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("cases", nargs="*", help=", ".join(CASES))
+    args = parser.parse_args()
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+
+    # benchmark the code, not the log handler
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    print(f"{'case':28s} {'ops/s':>12s} {'p50 ns':>9s} {'p99 ns':>9s}")
+    for name in args.cases or CASES:
+        res = CASES[name]()
+        results[name] = res
+        print(
+            f"{name:28s} {res['ops_per_sec']:12.0f} "
+            f"{res['p50_ns']:9d} {res['p99_ns']:9d}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
-from .core import main
-
 __version__ = "0.2.0"
 __version_info__ = tuple(int(i) for i in __version__.split(".") if i.isdigit())
 
 __all__ = ["main"]
+
+
+def main():
+    # the CLI (click, yaml, plugins) is imported only when it is used
+    from .core import main as cli  # pylint: disable=import-outside-toplevel
+
+    cli()  # pylint: disable=no-value-for-parameter
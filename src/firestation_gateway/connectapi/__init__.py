@@ -1,3 +1,3 @@
-from .client import ConnectApiClient
+from .client import SERVER, ConnectApiClient, OperationTemplate
 
-__all__ = ["ConnectApiClient"]
+__all__ = ["SERVER", "ConnectApiClient", "OperationTemplate"]
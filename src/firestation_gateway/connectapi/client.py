@@ -1,28 +1,78 @@
+import copy
 import json
 import logging
-import requests
+from typing import Any, Dict
+from firestation_gateway.httppool import PooledSession
 # from .model import OperationModel
 
-URL = "https://connectapi.feuersoftware.com/interfaces/public"
+SERVER = "https://connectapi.feuersoftware.com"
+URL = SERVER + "/interfaces/public"
 
 LOG = logging.getLogger(__name__)
 
+_START = "\0start\0"
+
+
+class OperationTemplate:
+    """
+    Operation JSON encoded once, only 'Start' is set when it is sent.
+    """
+
+    __slots__ = ("_head", "_tail", "operation")
+
+    def __init__(self, operation: Dict[str, Any]):
+        operation = copy.deepcopy(operation)
+        for key in ["Keyword", "Ric"]:
+            if not operation.get(key):
+                raise ValueError(f"Operation: '{key}' missing.")
+        if not isinstance(operation.get("Address", {}), dict):
+            raise TypeError("Operation: 'Address' is no mapping.")
+        operation["Start"] = _START
+        self._head, self._tail = json.dumps(operation).split(
+            json.dumps(_START)
+        )
+        operation["Start"] = ""
+        self.operation = operation
+
+    def body(self, start: str) -> str:
+        return self._head + json.dumps(start) + self._tail
+
 
 class ConnectApiClient:
-    def __init__(self, token: str):
+    def __init__(self, token: str, session: PooledSession = None):
+        if session is None:
+            session = PooledSession(SERVER, prewarm=False, refresh_interval=0)
+        self.session = session
         self.header = {
             "Authorization": f"bearer {token}",
             "Accept": "application/json",
             "Content-type": "application/json",
         }
 
-    def _request(self, url: str, data: str):
-        r = requests.post(url, data=data, headers=self.header, timeout=10.0)
+    def _request(self, url: str, data: str, timeout: float):
+        r = self.session.post(
+            url, data=data, headers=self.header, timeout=timeout
+        )
         if r.status_code != 204:
             LOG.error("'%s' [%s] - %s", url, r.status_code, r.text)
         r.raise_for_status()
         return r
 
-    def send_operation(self, data: dict):
+    def close(self):
+        self.session.close()
+
+    def server_status(self, timeout: float = 10.0):
+        """Check that the server answers (no API call)."""
+        r = self.session.head(SERVER, timeout=timeout)
+        if r.status_code >= 500:
+            r.raise_for_status()
+        return r
+
+    def send_operation(self, data: dict, timeout: float = 10.0):
         # TODO: check data with model.py
-        return self._request(URL + "/operation", json.dumps(data))
+        return self._request(URL + "/operation", json.dumps(data), timeout)
+
+    def send_template(
+        self, template: OperationTemplate, start: str, timeout: float = 10.0
+    ):
+        return self._request(URL + "/operation", template.body(start), timeout)
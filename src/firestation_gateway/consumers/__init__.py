@@ -1,13 +1,24 @@
 from typing import Any
-from .tetracontrol import Tetracontrol
-from .connect import Connect
-from .generic_output import GenericPrintout, GenericOutput
+
+from firestation_gateway.plugins import PluginRegistry
+
+CONSUMERS = PluginRegistry(
+    __name__,
+    "firestation_gateway.consumers",
+    {
+        "tetracontrol": ".tetracontrol:Tetracontrol",
+        "connect": ".connect:Connect",
+        "generic-webhook": ".generic_webhook:GenericWebhook",
+        "generic-printout": ".generic_output:GenericPrintout",
+        "generic-output": ".generic_output:GenericOutput",
+    },
+)
 
 
 def get_consumer(ctype: str) -> Any:
-    return {
-        "tetracontrol": Tetracontrol,
-        "connect": Connect,
-        "generic-printout": GenericPrintout,
-        "generic-output": GenericOutput,
-    }.get(ctype, None)
+    return CONSUMERS.get(ctype)
+
+
+def __getattr__(name: str) -> Any:
+    # the classes stay importable from the package, loaded on first use
+    return CONSUMERS.builtin_class(name)
@@ -1,37 +1,669 @@
+import heapq
+import inspect
+import logging
 import threading
 import queue
-from typing import Any
+import time
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Type
 
+from firestation_gateway import history, metrics
+from firestation_gateway.eventbus import current_trace, is_enabled
 
-class BaseConsumerQueued(threading.Thread):
-    def __init__(self, name: str, emitter, events_config):
+from .coalesce import Coalescer
+from .eventqueue import EventQueue, PRIORITY_NAMES, QueuePolicy, get_priority
+from .outbox import Outbox
+from .ratelimit import RateLimit, get_bucket
+from .retry import Delivery, RetryPolicy
+
+LOGGER = logging.getLogger(__name__)
+
+
+class BaseConsumerQueued(  # pylint: disable=too-many-instance-attributes
+    threading.Thread
+):
+    # expected failures of deliver() calls (logged, retried if retryable)
+    DELIVERY_EXCEPTIONS: Tuple[Type[Exception], ...] = ()
+
+    def __init__(self, name: str, emitter, events_config, config=None):
         super().__init__(name=name)
         self.emitter = emitter
+        self.events_config = events_config
         self.running = True
-        self.event_queue = queue.Queue()
+        # set by retire(): finish and pass queued events to the successor
+        self._retiring = False
+        self._successor: Optional[BaseConsumerQueued] = None
+        self._handed_over = threading.Event()
+        if not isinstance(config, dict):
+            config = {}
+        # bounded, alarms first (params 'queue', event 'priority')
+        self.queue_policy = QueuePolicy.from_config(config.get("queue"))
+        self.event_queue = EventQueue(
+            self.queue_policy,
+            lambda item: get_priority(item[0], item[3]),
+            self._overflow,
+        )
+        self._overflowing = False
+        self.retry_policy = RetryPolicy.from_config(config.get("retry"))
+        # heap of failed deliveries ordered by next attempt
+        self._retries = []
+        # deliveries of an event (several destinations) sent at the same
+        # time (see deliver_many())
+        self.concurrency = _concurrency(config.get("concurrency", 4))
+        self._senders: Optional[ThreadPoolExecutor] = None
+        # set by the runtime to share its executor (else: own threads)
+        self.send_executor: Optional[Executor] = None
+
+        self._init_metrics(name)
+        self._current_trace = None
+
+        # collapse repeated events of a source (params/event 'coalesce')
+        self.coalesce = _window(config.get("coalesce", 0), "coalesce")
+        self._coalescer = Coalescer()
+        # sends per destination (see rate_limited())
+        self.rate_limit = RateLimit.from_config(config.get("rate_limit"))
+        self._limited = set()
+        self._suppressed = {
+            reason: metrics.SUPPRESSED.labels(name, reason)
+            for reason in ("duplicate", "cancelled", "rate_limited")
+        }
+        for event_name, evt_cfg in events_config.items():
+            if isinstance(evt_cfg, dict) and "coalesce" in evt_cfg:
+                _window(evt_cfg["coalesce"], f"{event_name}: coalesce")
+            get_priority(event_name, evt_cfg)
+
+        # optional on-disk copy of the queue, entries are acknowledged
+        # after the event is handled (incl. all retries)
+        self.outbox = None
+        self._current_seq = None
+        # (event_name, data) being handled and its deliver() calls
+        self._current_event = None
+        self._deliveries = 0
+        # reason the event being handled is not sent (see suppress_event())
+        self._event_suppressed: Optional[str] = None
+        self._open_deliveries = Counter()
+        if config.get("outbox"):
+            self.outbox = Outbox.from_config(config["outbox"], name)
+            now = time.monotonic_ns()
+            for seq, event_name, data in self.outbox.replay():
+                evt_cfg = events_config.get(event_name)
+                self.event_queue.put(
+                    (event_name, data, seq, evt_cfg, now, None), block=False
+                )
+
+        # handle_event(event_name, data, evt_cfg) gets the event config
+        # resolved by the event bus
+        self._pass_config = (
+            len(inspect.signature(self.handle_event).parameters) >= 3
+        )
         for event_name in events_config:
             # Add all configured events
             # Note: each handler runs in the context of the emitter.
-            emitter.on(event_name, self._create_handler(event_name))
+            if hasattr(emitter, "subscribe"):
+                emitter.subscribe(
+                    event_name, self.enqueue, events_config[event_name]
+                )
+            else:
+                emitter.on(event_name, self._create_handler(event_name))
+
+    def _init_metrics(self, name: str) -> None:
+        # alarm path latencies of this consumer
+        self._lat = {
+            stage: metrics.STAGE_LATENCY.labels(stage, name)
+            for stage in ("enqueue", "queue", "send", "response", "total")
+        }
+        # removed by close(), a reload may drop the consumer
+        self._gauges = metrics.GaugeFunctions()
+        # late binding: the runtime may replace event_queue
+        self._gauges.set(
+            metrics.QUEUE_DEPTH,
+            lambda: self.event_queue.qsize(),  # pylint: disable=W0108
+            name,
+        )
+        self._gauges.set(
+            metrics.RETRY_DEPTH, lambda: len(self._retries), name
+        )
+        self._wait = {}
+        for priority, label in PRIORITY_NAMES.items():
+            self._wait[priority] = metrics.QUEUE_WAIT.labels(name, label)
+            self._gauges.set(
+                metrics.QUEUE_CLASS_DEPTH,
+                lambda p=priority: self.event_queue.depth(p),
+                name,
+                label,
+            )
+        self._overflows = {
+            action: metrics.QUEUE_OVERFLOW.labels(name, action)
+            for action in ("dropped", "spilled")
+        }
+        self._outbox_errors = metrics.OUTBOX_ERRORS.labels(name)
 
     # this function runs in the context of the emitter
+    def enqueue(self, event_name: str, data: Any, evt_cfg: Any = None):
+        seq = None
+        if self.outbox is not None:
+            try:
+                seq = self.outbox.append(event_name, data)
+            except OSError:
+                # e.g. disk full, the event is queued in memory only
+                self._outbox_errors.inc()
+                LOGGER.exception(
+                    "%s: Outbox write of '%s' failed", self.name, event_name
+                )
+        self.event_queue.put(
+            (
+                event_name,
+                data,
+                seq,
+                evt_cfg,
+                time.monotonic_ns(),
+                current_trace(),
+            )
+        )
+
     def _create_handler(self, event_name):
+        evt_cfg = self.events_config.get(event_name)
+
         def handler(data):
-            self.event_queue.put((event_name, data))
+            self.enqueue(event_name, data, evt_cfg)
 
         return handler
 
     def run(self):
         """Main loop handling all events from queue."""
-        while self.running:
-            event_name, data = self.event_queue.get()
-            self.handle_event(event_name, data)
+        while self.running and not self.retired:
+            try:
+                item = self.event_queue.get(timeout=self.next_retry_timeout())
+            except queue.Empty:
+                pass
+            else:
+                self.safe_call(self.dispatch, item)
+            self.safe_call(self.process_retries)
+        self.close()
+
+    def safe_call(self, func: Callable[..., None], *args) -> None:
+        """func(*args), an unexpected error is logged: the consumer keeps
+        handling the queue."""
+        try:
+            func(*args)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("%s: %s failed", self.name, func.__name__)
+
+    def close(self):
+        """Release resources, called when the consumer has stopped."""
+        if self._senders is not None:
+            self._senders.shutdown(wait=False)
+        self.event_queue.close()
+        if self.outbox is not None:
+            self.outbox.close()
+        self._gauges.remove()
 
     def stop(self):
         """Stop running thread."""
         self.running = False
         # send fake event to queue for release q.get()
-        self.event_queue.put(("system_stop", None))
+        self.event_queue.put(("system_stop", None, None, None, 0, None))
+
+    def retire(self, successor: Optional["BaseConsumerQueued"] = None):
+        """Stop as soon as the in-flight deliveries are done.
+
+        Queued events are passed to 'successor' (the consumer replacing
+        this one on a config reload) by the consumer itself when it takes
+        the next item from its queue, so events are never dispatched by
+        two threads; wait_handed_over() waits for it. Without successor
+        they are handled before the consumer stops.
+        """
+        self._successor = successor
+        self._retiring = True
+        # wakes the consumer, markers are taken before events
+        self.event_queue.put(("system_stop", None, None, None, 0, None))
+
+    def wait_handed_over(self, running: Callable[[], bool]) -> None:
+        """Wait until the queued events are passed to the successor.
+
+        'running' tells whether the consumer still takes items from its
+        queue, else (e.g. not started) the events are passed on here.
+        """
+        while self._successor is not None:
+            if self._handed_over.wait(0.1):
+                return
+            if not running():
+                self._hand_over_queued()
+                return
+
+    @property
+    def retired(self) -> bool:
+        return (
+            self._retiring
+            and (self._successor is None or self._handed_over.is_set())
+            and not self._retries
+            and not self._coalescer
+            and self.event_queue.qsize() == 0
+        )
+
+    def accept(  # pylint: disable=too-many-arguments
+        self, event_name: str, data: Any, seq, t_enqueue: int, trace=None
+    ):
+        """Queue an event taken over from the replaced consumer."""
+        routes = getattr(self.emitter, "routes", None)
+        if routes is None:
+            configs = [self.events_config.get(event_name)]
+            subscribed = event_name in self.events_config
+        else:
+            configs = [
+                evt_cfg
+                for sink, evt_cfg in routes(event_name)
+                if getattr(sink, "__self__", None) is self
+            ]
+            subscribed = bool(configs)
+        if not subscribed:
+            LOGGER.info(
+                "%s: Event '%s' not configured anymore, dropped",
+                self.name,
+                event_name,
+            )
+            if seq is not None:
+                self.outbox.ack(seq)
+            return
+        # runs in the reload, the successor may not consume yet
+        self.event_queue.put(
+            (event_name, data, seq, configs[0], t_enqueue, trace),
+            block=False,
+        )
+
+    def _hand_over(self, item) -> None:
+        event_name, data, seq, _, t_enqueue, trace = item
+        successor = self._successor
+        if successor.outbox is not self.outbox:
+            # move the entry to the outbox of the successor
+            new_seq = None
+            if successor.outbox is not None:
+                new_seq = successor.outbox.append(event_name, data)
+            if seq is not None:
+                self.outbox.ack(seq)
+            seq = new_seq
+        successor.accept(event_name, data, seq, t_enqueue, trace)
+
+    def _hand_over_queued(self, item=None) -> None:
+        """Pass 'item' and all queued events on to the successor."""
+        while True:
+            if item is not None and not _is_marker(item):
+                self._hand_over(item)
+            try:
+                item = self.event_queue.get_nowait()
+            except queue.Empty:
+                break
+        self._handed_over.set()
+
+    def dispatch(self, item) -> None:
+        """Handle one (event_name, data, seq, evt_cfg, t_enqueue, trace)
+        item."""
+        if self._successor is not None:
+            self._hand_over_queued(item)
+            return
+        if _is_marker(item):
+            return
+        event_name, data, _, evt_cfg, _, _ = item
+        window = self.coalesce
+        if isinstance(evt_cfg, dict):
+            window = float(evt_cfg.get("coalesce", window))
+        if window > 0:
+            now = time.monotonic()
+            self._flush_coalesced(now)
+            source = data.get("source") if isinstance(data, dict) else None
+            item, dropped, reason = self._coalescer.add(
+                source or event_name, item, window, now
+            )
+            if dropped is not None:
+                self._suppress(dropped, reason)
+            if item is None:
+                return
+        self._handle(item)
+
+    def _flush_coalesced(self, now: float) -> None:
+        for item, reason in self._coalescer.due(now):
+            if reason:
+                self._suppress(item, reason)
+            else:
+                self._handle(item)
+
+    def _suppress(self, item, reason: str) -> None:
+        event_name, data, seq, _, _, _ = item
+        self._suppressed[reason].inc()
+        history.record_delivery(
+            self.name, event_name, data, "suppressed", reason
+        )
+        LOGGER.info(
+            "%s: Event '%s' suppressed (%s)", self.name, event_name, reason
+        )
+        self._release(seq)
+
+    # this function runs in the context of the emitter
+    def _overflow(self, item, action: str) -> None:
+        event_name, data, seq, _, _, _ = item
+        self._overflows[action].inc()
+        if not self._overflowing:
+            # logged once until the queue is empty again
+            self._overflowing = True
+            LOGGER.warning(
+                "%s: Queue full, events are %s (first: '%s')",
+                self.name,
+                action,
+                event_name,
+            )
+        if action == "dropped":
+            history.record_delivery(
+                self.name, event_name, data, "dropped", "queue full"
+            )
+            if seq is not None:
+                self.outbox.ack(seq)
 
-    def handle_event(self, event_name: str, data: Any):
+    def _handle(self, item) -> None:
+        event_name, data, seq, evt_cfg, t_enqueue, trace = item
+        t_dequeue = time.monotonic_ns()
+        self._lat["queue"].observe_ns(t_dequeue - t_enqueue)
+        self._wait[get_priority(event_name, evt_cfg)].observe_ns(
+            t_dequeue - t_enqueue
+        )
+        if self._overflowing and not self.event_queue.qsize():
+            self._overflowing = False
+            LOGGER.info("%s: Queue drained", self.name)
+        if trace is not None:
+            self._lat["enqueue"].observe_ns(t_enqueue - trace["emit"])
+            self._current_trace = dict(trace, dequeue=t_dequeue)
+        self._current_seq = seq
+        self._current_event = (event_name, data)
+        self._deliveries = 0
+        self._event_suppressed = None
+        error = None
+        try:
+            if self._pass_config:
+                self.handle_event(event_name, data, evt_cfg)
+            else:
+                self.handle_event(event_name, data)
+        except Exception as e:  # pylint: disable=broad-except
+            # e.g. a broken template, the event is not handled again
+            LOGGER.exception("%s: Event '%s' failed", self.name, event_name)
+            error = repr(e)
+        finally:
+            self._current_seq = None
+            self._current_event = None
+        reason = self._event_suppressed
+        if error is not None:
+            history.record_delivery(
+                self.name, event_name, data, "failed", error
+            )
+        elif reason is not None:
+            history.record_delivery(
+                self.name, event_name, data, "suppressed", reason
+            )
+        elif not self._deliveries:
+            # handled without deliver() (e.g. GPIO output, test mode)
+            history.record_delivery(self.name, event_name, data, "handled")
+        self._current_trace = None
+        # done unless a delivery is waiting for a retry
+        self._release(seq)
+
+    def _release(self, seq) -> None:
+        if seq is not None and not self._open_deliveries[seq]:
+            del self._open_deliveries[seq]
+            self.outbox.ack(seq)
+
+    def handle_event(self, event_name: str, data: Any, evt_cfg: Any = None):
         pass
+
+    def compiled(self, cache: dict, event_name: str, evt_cfg, compile_event):
+        """Templates of an event from 'cache' (compiled at startup), events
+        matched by a pattern are compiled on first use. None: disabled."""
+        compiled = cache.get(event_name)
+        if compiled is None:
+            if evt_cfg is None:
+                evt_cfg = self.events_config.get(event_name)
+            if evt_cfg is None or not is_enabled(evt_cfg):
+                return None
+            # event matched by a pattern
+            compiled = cache[event_name] = compile_event(event_name, evt_cfg)
+        return compiled
+
+    def is_retryable(self, exc: Exception) -> bool:
+        _ = exc
+        return True
+
+    def deliver(self, description: str, func, *args) -> Optional[Any]:
+        """Call func(*args, timeout=...) with retries.
+
+        Returns the result of a successful first attempt. If it fails the
+        delivery is retried in the background (between later events)
+        until it succeeds or the deadline of the retry policy is reached.
+        """
+        return self.deliver_many([(description, func, args)])[0]
+
+    def deliver_many(
+        self, deliveries: Sequence[Tuple[str, Any, Tuple[Any, ...]]]
+    ) -> List[Optional[Any]]:
+        """deliver() of (description, func, args) for several destinations.
+
+        The first attempts run at the same time ('concurrency' at most),
+        so the event takes about one round trip instead of one per
+        destination. Returns the results in the order of 'deliveries'
+        (None: failed, retried in the background).
+        """
+        now = time.monotonic()
+        self._deliveries += len(deliveries)
+        pending = [
+            Delivery(
+                now,
+                description,
+                func,
+                args,
+                now + self.retry_policy.deadline,
+                seq=self._current_seq,
+                trace=self._current_trace,
+                event=self._current_event,
+            )
+            for description, func, args in deliveries
+        ]
+        return self._attempt_many(pending, now)
+
+    def _attempt_many(
+        self, deliveries: List[Delivery], now: float
+    ) -> List[Optional[Any]]:
+        if len(deliveries) == 1 or self.concurrency == 1:
+            return [self._attempt(d, now) for d in deliveries]
+        senders = self.send_executor
+        if senders is None:
+            if self._senders is None:
+                self._senders = ThreadPoolExecutor(
+                    self.concurrency, thread_name_prefix=f"{self.name}-send"
+                )
+            senders = self._senders
+        # only the calls run in the senders, the results are handled here;
+        # at most 'concurrency' at a time, also in a shared executor
+        slots = threading.BoundedSemaphore(self.concurrency)
+        futures = []
+        for delivery in deliveries:
+            slots.acquire()  # pylint: disable=consider-using-with
+            future = senders.submit(self._call, delivery, now)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+        return [
+            self._complete(delivery, future.result)
+            for delivery, future in zip(deliveries, futures)
+        ]
+
+    def _attempt(self, delivery: Delivery, now: float) -> Optional[Any]:
+        return self._complete(delivery, lambda: self._call(delivery, now))
+
+    def _complete(self, delivery: Delivery, call) -> Optional[Any]:
+        """Settle the attempt returned by call() (see _call())."""
+        try:
+            result = call()
+        except Exception as e:  # pylint: disable=broad-except
+            # unexpected failure (not one of DELIVERY_EXCEPTIONS), a bug
+            # is not retried
+            LOGGER.exception(
+                "%s: '%s' failed (attempt %d), giving up",
+                self.name,
+                delivery.description,
+                delivery.attempt,
+            )
+            self._record(delivery, "failed", repr(e))
+            self._finish(delivery)
+            return None
+        return self._settle(delivery, *result)
+
+    def _call(self, delivery: Delivery, now: float):
+        """One attempt: (result, expected exception, send time in ns)."""
+        delivery.attempt += 1
+        timeout = self.retry_policy.attempt_timeout
+        if delivery.attempt > 1:
+            timeout = max(0.1, min(timeout, delivery.deadline - now))
+        t_send = time.monotonic_ns()
+        if delivery.attempt == 1 and delivery.trace is not None:
+            self._lat["send"].observe_ns(t_send - delivery.trace["dequeue"])
+        try:
+            return delivery.func(*delivery.args, timeout=timeout), None, t_send
+        except self.DELIVERY_EXCEPTIONS as e:
+            return None, e, t_send
+
+    def _settle(
+        self, delivery: Delivery, result, e: Optional[Exception], t_send: int
+    ) -> Optional[Any]:
+        if e is not None:
+            delay = self.retry_policy.delay(delivery.attempt)
+            if (
+                not self.is_retryable(e)
+                or time.monotonic() + delay >= delivery.deadline
+            ):
+                LOGGER.error(
+                    "%s: '%s' failed (attempt %d), giving up: %s",
+                    self.name,
+                    delivery.description,
+                    delivery.attempt,
+                    e,
+                )
+                self._record(delivery, "failed", str(e))
+                self._finish(delivery)
+                return None
+            LOGGER.warning(
+                "%s: '%s' failed (attempt %d), retry in %.1fs: %s",
+                self.name,
+                delivery.description,
+                delivery.attempt,
+                delay,
+                e,
+            )
+            self._record(delivery, "retrying", str(e))
+            delivery.due = time.monotonic() + delay
+            if delivery.attempt == 1 and delivery.seq is not None:
+                self._open_deliveries[delivery.seq] += 1
+            heapq.heappush(self._retries, delivery)
+            return None
+        t_response = time.monotonic_ns()
+        self._lat["response"].observe_ns(t_response - t_send)
+        if delivery.trace is not None:
+            self._lat["total"].observe_ns(t_response - delivery.trace["edge"])
+        if delivery.attempt > 1:
+            LOGGER.info(
+                "%s: '%s' delivered (attempt %d)",
+                self.name,
+                delivery.description,
+                delivery.attempt,
+            )
+        self._record(delivery, "delivered")
+        self._finish(delivery)
+        return result
+
+    def _record(self, delivery: Delivery, outcome: str, error="") -> None:
+        if delivery.event is None:
+            return
+        event_name, data = delivery.event
+        detail = f"{delivery.description} (attempt {delivery.attempt})"
+        if error:
+            detail += f": {error}"
+        history.record_delivery(self.name, event_name, data, outcome, detail)
+
+    def _finish(self, delivery: Delivery) -> None:
+        if delivery.seq is None:
+            return
+        if delivery.attempt > 1:
+            self._open_deliveries[delivery.seq] -= 1
+        # the event being handled is released by _handle() once all its
+        # deliveries are settled
+        if delivery.seq != self._current_seq:
+            self._release(delivery.seq)
+
+    def suppress_event(self, reason: str) -> None:
+        """The event being handled is not sent at all (e.g. every
+        destination is rate limited), recorded as suppressed."""
+        self._event_suppressed = reason
+
+    def rate_limited(self, destination) -> bool:
+        """Take a send of 'destination' from the rate limit, True if none
+        is left (the send is counted as suppressed)."""
+        if self.rate_limit.per_minute <= 0:
+            return False
+        if get_bucket(destination, self.rate_limit).take():
+            self._limited.discard(destination)
+            return False
+        self._suppressed["rate_limited"].inc()
+        if destination not in self._limited:
+            # logged once per storm
+            self._limited.add(destination)
+            LOGGER.warning(
+                "%s: Rate limit of %s reached, events are dropped",
+                self.name,
+                destination,
+            )
+        return True
+
+    def next_retry_timeout(self) -> Optional[float]:
+        """Seconds until the next retry (or the end of a coalescing
+        window) is due (None: nothing pending)."""
+        deadlines = [
+            d
+            for d in (
+                self._retries[0].due if self._retries else None,
+                self._coalescer.next_deadline(),
+            )
+            if d is not None
+        ]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def process_retries(self) -> None:
+        """Run all retries (and pass on coalesced events) which are due."""
+        now = time.monotonic()
+        self._flush_coalesced(now)
+        due = []
+        while self._retries and self._retries[0].due <= now:
+            due.append(heapq.heappop(self._retries))
+        if due:
+            self._attempt_many(due, now)
+
+
+def _is_marker(item) -> bool:
+    # see stop() and retire()
+    return item[0] == "system_stop" and item[2] is None
+
+
+def _concurrency(value) -> int:
+    try:
+        concurrency = int(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"concurrency: Invalid value ({value}).") from e
+    if concurrency < 1:
+        raise ValueError("concurrency: Must be >= 1.")
+    return concurrency
+
+
+def _window(value, name: str) -> float:
+    try:
+        window = float(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{name}: Invalid value ({value}).") from e
+    if window < 0:
+        raise ValueError(f"{name}: Must be >= 0.")
+    return window
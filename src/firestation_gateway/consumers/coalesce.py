@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# queue item: (event_name, data, seq, evt_cfg, t_enqueue, trace)
+Item = Tuple[str, Any, Optional[int], Any, int, Optional[dict]]
+
+
+@dataclass
+class _Window:
+    end: float
+    length: float
+    # event name sent last
+    last: str
+    # latest event held back in the window
+    pending: Optional[Item] = None
+    # an event differing from 'last' was held back
+    changed: bool = False
+
+
+class Coalescer:
+    """Collapse the events of a source (e.g. a flapping input).
+
+    The first event of a source is passed on at once and opens a window.
+    Events within the window are held back, only the latest is kept. At
+    the end of the window it is passed on if it differs from the event
+    sent last (then a new window opens), otherwise it is dropped:
+    repeated events collapse, alarm/idle pairs cancel out.
+
+    Not thread safe, used by the consumer thread/task only.
+    """
+
+    def __init__(self):
+        self._windows: Dict[str, _Window] = {}
+
+    def __bool__(self) -> bool:
+        return any(w.pending is not None for w in self._windows.values())
+
+    def add(
+        self, key: str, item: Item, length: float, now: float
+    ) -> Tuple[Optional[Item], Optional[Item], str]:
+        """Returns (item to pass on, dropped item, drop reason)."""
+        window = self._windows.get(key)
+        if window is None or (now >= window.end and window.pending is None):
+            self._windows[key] = _Window(now + length, length, item[0])
+            return item, None, ""
+        dropped = window.pending
+        window.pending = item
+        window.changed |= item[0] != window.last
+        if dropped is None:
+            return None, None, ""
+        return None, dropped, _reason(dropped, item)
+
+    def due(self, now: float) -> List[Tuple[Item, str]]:
+        """Held items of ended windows: (item, "") to pass on, else
+        (item, reason) to drop."""
+        result = []
+        for key, window in list(self._windows.items()):
+            if window.end > now:
+                continue
+            item, window.pending = window.pending, None
+            if item is None:
+                del self._windows[key]
+            elif item[0] == window.last:
+                result.append(
+                    (item, "cancelled" if window.changed else "duplicate")
+                )
+                del self._windows[key]
+            else:
+                result.append((item, ""))
+                window.last = item[0]
+                window.end = now + window.length
+            window.changed = False
+        return result
+
+    def next_deadline(self) -> Optional[float]:
+        ends = [w.end for w in self._windows.values() if w.pending]
+        return min(ends) if ends else None
+
+
+def _reason(dropped: Item, item: Item) -> str:
+    return "duplicate" if dropped[0] == item[0] else "cancelled"
@@ -1,10 +1,11 @@
 import logging
 import datetime
-from typing import Any
-import requests
+from typing import Any, List
 from firestation_gateway import connectapi
+from firestation_gateway.eventbus import is_enabled
+from firestation_gateway.health import HealthPolicy, HealthProber
 
-from .base import BaseConsumerQueued
+from .http import BaseConsumerHTTP
 
 
 LOGGER = logging.getLogger(__name__)
@@ -28,7 +29,7 @@ operation = {
 }
 
 
-class Connect(BaseConsumerQueued):
+class Connect(BaseConsumerHTTP):
     def __init__(
         self,
         name: str,
@@ -36,46 +37,115 @@ class Connect(BaseConsumerQueued):
         events_config,
         config,
     ):
-        super().__init__(name, emitter, events_config)
+        super().__init__(name, emitter, events_config, config)
         self.events_config = events_config
+        # token of a unit or a list (every operation goes to all units)
+        self.tokens = config.get("token")
+        if not isinstance(self.tokens, list):
+            self.tokens = [self.tokens]
         self.testmode = config.get("testmode", False)
         if self.testmode:
             LOGGER.warning(
                 "ConnectApi: Testmode enabled! No real alarm is sent."
             )
-        self.connectapi = connectapi.ConnectApiClient(config.get("token"))
+        # concurrent sends and the health check
+        session = self.pooled_session(connectapi.SERVER, config, 1)
+        self.clients = [
+            connectapi.ConnectApiClient(token, session)
+            for token in self.tokens
+        ]
+        self.connectapi = self.clients[0]
+        # operation templates per event name, invalid events fail here
+        self.templates = {
+            name.lower(): self.compile_operation(name, evt_cfg)
+            for name, evt_cfg in events_config.items()
+            if is_enabled(evt_cfg)
+        }
+        # connection checked in the background, never delays the startup
+        self.health = None
+        health_policy = HealthPolicy.from_config(config.get("health"))
+        if not self.testmode and health_policy.interval > 0:
+            self.health = HealthProber(
+                name, self.connectapi.server_status, health_policy
+            )
+            self.health.start()
+
+    def close(self):
+        super().close()
+        if self.health is not None:
+            self.health.stop()
+        self.connectapi.close()
+
+    @staticmethod
+    def compile_operation(
+        event_name: str, evt_cfg
+    ) -> List[connectapi.OperationTemplate]:
+        """Operation templates of an event, one per 'ric' (or list)."""
+        if not isinstance(evt_cfg, dict):
+            raise TypeError(f"{event_name}: Event config missing.")
+        op = dict(operation)
+        rics = evt_cfg.get("ric")
+        if not isinstance(rics, list):
+            rics = [rics]
+        op["Keyword"] = evt_cfg.get("keyword")
+        op["Facts"] = evt_cfg.get("facts")
+        op["Source"] = evt_cfg.get("source")
+        address = evt_cfg.get("address", False)
+        if address:
+            if not isinstance(address, dict):
+                raise TypeError(f"{event_name}: Invalid 'address'.")
+            op["Address"] = {
+                "Street": address.get("street", ""),
+                "HouseNumber": address.get("housenumber", ""),
+                "ZipCode": address.get("zipcode", ""),
+                "City": address.get("city", ""),
+            }
+        try:
+            return [
+                connectapi.OperationTemplate(dict(op, Ric=ric))
+                for ric in rics or [None]
+            ]
+        except (TypeError, ValueError) as e:
+            raise type(e)(f"{event_name}: {e}") from e
 
-    def handle_event(self, event_name: str, data: Any):
-        message = f"Event='{event_name}', data='{data}'"
-        LOGGER.debug(message)
+    def handle_event(self, event_name: str, data: Any, evt_cfg: Any = None):
+        LOGGER.debug("Event='%s', data='%s'", event_name, data)
 
-        evt_cfg = self.events_config.get(event_name)
-        if evt_cfg is not None:
-            if evt_cfg.get("enabled", True) is False:
-                return
-            # event is set within config
+        templates = self.compiled(
+            self.templates, event_name, evt_cfg, self.compile_operation
+        )
+        if templates is None:
+            return
 
-            op = operation.copy()
-            op["Start"] = datetime.datetime.now().isoformat()
-            op["Ric"] = evt_cfg.get("ric")
-            op["Keyword"] = evt_cfg.get("keyword")
-            op["Facts"] = evt_cfg.get("facts")
-            op["Source"] = evt_cfg.get("source")
-            if evt_cfg.get("address", False):
-                op["Address"]["Street"] = evt_cfg["address"].get("street", "")
-                op["Address"]["HouseNumber"] = evt_cfg["address"].get(
-                    "housenumber", ""
+        start = datetime.datetime.now().isoformat()
+        deliveries = []
+        for unit, (token, client) in enumerate(
+            zip(self.tokens, self.clients), 1
+        ):
+            for template in templates:
+                # the API limits the operations per token
+                if self.rate_limited(("connect", token)):
+                    continue
+                LOGGER.info(
+                    "Operation %s Start=%s", template.operation, start
                 )
-                op["Address"]["ZipCode"] = evt_cfg["address"].get(
-                    "zipcode", ""
+                ric = template.operation["Ric"]
+                description = f"{event_name} -> Ric {ric}"
+                if len(self.clients) > 1:
+                    description += f" (unit {unit})"
+                deliveries.append(
+                    (description, client.send_template, (template, start))
                 )
-                op["Address"]["City"] = evt_cfg["address"].get("city", "")
-
-            LOGGER.info(op)
-            if not self.testmode:
-                try:
-                    self.connectapi.send_operation(op)
-                except requests.exceptions.ConnectionError as e:
-                    LOGGER.error(e)
-                except requests.exceptions.HTTPError as e:
-                    LOGGER.error(e)
+        if not deliveries:
+            self.suppress_event("rate_limited")
+            return
+        if self.testmode:
+            return
+        results = self.deliver_many(deliveries)
+        if len(deliveries) > 1:
+            LOGGER.info(
+                "%s: Operation delivered to %d of %d destinations",
+                event_name,
+                sum(r is not None for r in results),
+                len(deliveries),
+            )
@@ -0,0 +1,304 @@
+import heapq
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+from .retry import policy_from_config
+
+LOGGER = logging.getLogger(__name__)
+
+# priority classes, lower value = handled first
+PRIORITIES = {"alarm": 0, "selftest": 1, "normal": 2, "idle": 3}
+PRIORITY_NAMES = {v: k for k, v in PRIORITIES.items()}
+DEFAULT_PRIORITY = PRIORITIES["normal"]
+
+OVERFLOW_POLICIES = ("drop_oldest", "block", "spill")
+
+# queue item: (event_name, data, seq, evt_cfg, t_enqueue, trace)
+Item = Tuple[str, Any, Optional[int], Any, int, Optional[dict]]
+
+
+@dataclass
+class QueuePolicy:
+    """
+    Capacity of a consumer queue (params 'queue').
+
+    Attributes:
+        size (int):            Max. events in the queue (0 = no limit).
+        overflow (str):        Handling of a full queue:
+                               "drop_oldest": drop the oldest event of the
+                               lowest priority class,
+                               "block": the producer waits for space (at
+                               most 'block_timeout', then "drop_oldest"),
+                               "spill": move the newest event of the lowest
+                               priority class to a file, it is queued again
+                               when there is space.
+        block_timeout (float): Max. wait of a producer in seconds.
+        spill_path (str):      Directory for "spill".
+    """
+
+    size: int = 0
+    overflow: str = "drop_oldest"
+    block_timeout: float = 1.0
+    spill_path: str = "/var/lib/firestation-gw/spill"
+
+    def __post_init__(self):
+        if self.size < 0:
+            raise ValueError("queue: 'size' must be >= 0")
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"queue: 'overflow' must be one of {OVERFLOW_POLICIES}"
+            )
+        if self.block_timeout < 0:
+            raise ValueError("queue: 'block_timeout' must be >= 0")
+
+    @classmethod
+    def from_config(cls, config) -> "QueuePolicy":
+        return policy_from_config(cls, config, "queue")
+
+
+def get_priority(event_name: str, evt_cfg: Any = None) -> int:
+    """Priority class of an event: 'priority' of the event config, else
+    by the event name ("..._alarm", "..._selftest", "..._idle")."""
+    if isinstance(evt_cfg, dict) and "priority" in evt_cfg:
+        name = evt_cfg["priority"]
+        if name not in PRIORITIES:
+            raise ValueError(
+                f"{event_name}: 'priority' must be one of {list(PRIORITIES)}"
+            )
+        return PRIORITIES[name]
+    return PRIORITIES.get(event_name.rpartition("_")[2], DEFAULT_PRIORITY)
+
+
+def _is_marker(item: Item) -> bool:
+    # stop/retire markers, see BaseConsumerQueued.stop()
+    return item[0] == "system_stop" and item[2] is None
+
+
+class SpillFile:
+    """Events moved out of a full queue.
+
+    Event name, data, outbox seq and trace are stored as JSON lines in
+    an anonymous file in 'path'. Only an index (priority, enqueue time,
+    offset, event config) is kept in memory, pop() returns
+    the oldest event of the most important class. The file is emptied
+    when all events are restored and gone when the queue is closed, use
+    'outbox' to keep events across restarts.
+    """
+
+    def __init__(self, path: str):
+        Path(path).mkdir(parents=True, exist_ok=True)
+        # open until close(), gone with the file descriptor
+        # pylint: disable-next=consider-using-with
+        self._file = tempfile.TemporaryFile(  # noqa: SIM115
+            dir=path, prefix="spill-"
+        )
+        self._index: List[Tuple[int, int, int, int, Any]] = []
+        self._count = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def first_priority(self) -> int:
+        return self._index[0][0]
+
+    def push(self, item: Item, priority: int) -> None:
+        event_name, data, seq, evt_cfg, t_enqueue, trace = item
+        line = json.dumps([event_name, data, seq, trace]).encode() + b"\n"
+        offset = self._file.seek(0, os.SEEK_END)
+        self._file.write(line)
+        # count: FIFO for equal stamps, never compares the configs
+        heapq.heappush(
+            self._index, (priority, t_enqueue, self._count, offset, evt_cfg)
+        )
+        self._count += 1
+
+    def pop(self) -> Item:
+        _, t_enqueue, _, offset, evt_cfg = heapq.heappop(self._index)
+        self._file.seek(offset)
+        event_name, data, seq, trace = json.loads(self._file.readline())
+        if not self._index:
+            self._file.truncate(0)
+        return event_name, data, seq, evt_cfg, t_enqueue, trace
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class EventQueue:
+    """Bounded queue with priority classes.
+
+    get() returns the oldest event of the most important class, so an
+    alarm does not wait behind a backlog of idle events. If the queue is
+    full, put() handles the overflow as configured by the QueuePolicy.
+    Dropped events are passed to on_overflow(item, "dropped"), spilled
+    ones to on_overflow(item, "spilled"). Stop markers are never dropped.
+
+    Thread safe, same interface as queue.Queue (put, get, get_nowait,
+    qsize).
+    """
+
+    def __init__(
+        self,
+        policy: Optional[QueuePolicy] = None,
+        priority: Callable[[Item], int] = lambda item: DEFAULT_PRIORITY,
+        on_overflow: Callable[[Item, str], None] = lambda item, action: None,
+    ):
+        self.policy = policy or QueuePolicy()
+        self.priority = priority
+        self.on_overflow = on_overflow
+        self._markers: Deque[Item] = deque()
+        self._classes: List[Deque[Item]] = [deque() for _ in PRIORITIES]
+        self._size = 0
+        self._maxsize = self.policy.size
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        # waiting threads, notify() is skipped on the hot path without
+        self._getters = 0
+        self._putters = 0
+        self.spill = None
+        if self.policy.overflow == "spill" and self.policy.size:
+            self.spill = SpillFile(self.policy.spill_path)
+
+    def qsize(self) -> int:
+        """Queued events incl. spilled ones (not the markers)."""
+        return self._size + (len(self.spill) if self.spill else 0)
+
+    def depth(self, priority: int) -> int:
+        return len(self._classes[priority])
+
+    def _full(self) -> bool:
+        return 0 < self._maxsize <= self._size
+
+    def put(self, item: Item, block: bool = True) -> None:
+        """Queue an event. With overflow "block" the caller waits for space
+        (not if 'block' is false, e.g. in an event loop)."""
+        if _is_marker(item):
+            with self._lock:
+                self._markers.append(item)
+                self._not_empty.notify()
+            return
+        if self._maxsize == 0:
+            # unbounded: no overflow, no spill
+            priority = self.priority(item)
+            with self._lock:
+                self._classes[priority].append(item)
+                self._size += 1
+                if self._getters:
+                    self._not_empty.notify()
+            return
+        priority = self.priority(item)
+        overflow = None
+        with self._lock:
+            if self._full() and block and self.policy.overflow == "block":
+                self._putters += 1
+                try:
+                    self._not_full.wait_for(
+                        lambda: not self._full(), self.policy.block_timeout
+                    )
+                finally:
+                    self._putters -= 1
+            if self._full() or self.spill:
+                overflow = self._overflow(item, priority)
+            if overflow is None or overflow[0] is not item:
+                self._classes[priority].append(item)
+                self._size += 1
+                if self._getters:
+                    self._not_empty.notify()
+        if overflow is not None:
+            self.on_overflow(*overflow)
+
+    def _overflow(
+        self, item: Item, priority: int
+    ) -> Optional[Tuple[Item, str]]:
+        """Make space for 'item'. Returns the event moved out of the queue
+        (may be 'item' itself) and "dropped" or "spilled", None if there
+        was space."""
+        lowest = max(
+            (p for p, q in enumerate(self._classes) if q), default=None
+        )
+        if not self._full():
+            # spilled events of the class are older and go first
+            if priority < self.spill.first_priority():
+                return None
+            victim = item
+        elif lowest is None or priority > lowest:
+            victim = item
+        elif self.spill is not None:
+            # keep the oldest events in memory
+            if priority == lowest:
+                victim = item
+            else:
+                victim = self._classes[lowest].pop()
+                self._size -= 1
+        else:
+            victim = self._classes[lowest].popleft()
+            self._size -= 1
+        if self.spill is None:
+            return victim, "dropped"
+        try:
+            self.spill.push(victim, self.priority(victim))
+        except (OSError, TypeError, ValueError) as e:
+            LOGGER.error("Spilling event '%s' failed: %s", victim[0], e)
+            return victim, "dropped"
+        return victim, "spilled"
+
+    def _available(self) -> bool:
+        return bool(self._markers or self._size or self.spill)
+
+    def _pop(self) -> Item:
+        if self._markers:
+            return self._markers.popleft()
+        if not self._size:
+            self._restore()
+        for q in self._classes:
+            if q:
+                item = q.popleft()
+                break
+        self._size -= 1
+        if self.spill:
+            self._restore()
+        if self._putters:
+            self._not_full.notify()
+        return item
+
+    def _restore(self) -> None:
+        while self.spill and not self._full():
+            priority = self.spill.first_priority()
+            self._classes[priority].append(self.spill.pop())
+            self._size += 1
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        with self._lock:
+            if not block:
+                if not self._available():
+                    raise queue.Empty
+            elif not self._available():
+                self._getters += 1
+                try:
+                    if not self._not_empty.wait_for(self._available, timeout):
+                        raise queue.Empty
+                finally:
+                    self._getters -= 1
+            return self._pop()
+
+    def get_nowait(self):
+        with self._lock:
+            if not self._available():
+                raise queue.Empty
+            return self._pop()
+
+    def close(self) -> None:
+        with self._lock:
+            if self.spill is not None:
+                self.spill.close()
+                self.spill = None
+
@@ -1,7 +1,10 @@
+import functools
 import logging
+import threading
+import time
 from typing import Any
+from firestation_gateway.gpio import get_edge_monitor, lines
 from .base import BaseConsumerQueued
-from periphery import GPIO
 
 LOGGER = logging.getLogger(__name__)
 
@@ -35,26 +38,44 @@ class GenericPrintout(BaseConsumerQueued):
         events_config,
         config,
     ):
-        super().__init__(name, emitter, events_config)
+        super().__init__(name, emitter, events_config, config)
         self.events_config = events_config
         _ = config
         LOGGER.info("%s: activated", name)
-        LOGGER.debug(self.events_config)
+        LOGGER.debug("%s", self.events_config)
 
-    def handle_event(self, event_name: str, data: Any):
-        message = f"Event='{event_name}', data='{data}'"
-        LOGGER.debug(message)
+    def handle_event(self, event_name: str, data: Any, evt_cfg: Any = -1):
+        LOGGER.debug("Event='%s', data='%s'", event_name, data)
 
-        evt_cfg = self.events_config.get(event_name, -1)
-        if evt_cfg is not -1:
+        if evt_cfg == -1:
+            evt_cfg = self.events_config.get(event_name, -1)
+        if evt_cfg != -1:
             if isinstance(evt_cfg, dict):
                 if evt_cfg.get("enabled", True) is False:
                     LOGGER.info("Event '%s' disabled", event_name)
                     return
-            LOGGER.info(message)
+            LOGGER.info("Event='%s', data='%s'", event_name, data)
+
+
+def _duration(value, name: str) -> int:
+    try:
+        duration = int(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{name}: Invalid value ('{value}').") from e
+    if duration < 0:
+        raise ValueError(f"{name}: Must be >= 0 ms.")
+    return duration
 
 
 class GenericOutput(BaseConsumerQueued):
+    """Set a GPIO output line on events.
+
+    The event config sets the 'value'. With 'pulse' (ms, per event) or
+    'auto_reset' (ms, params) the line returns to 'default_value' after
+    that time, the timer runs on the shared timer wheel of the
+    EdgeMonitor. A new event cancels a pending reset.
+    """
+
     def __init__(
         self,
         name: str,
@@ -62,7 +83,7 @@ class GenericOutput(BaseConsumerQueued):
         events_config,
         config,
     ):
-        super().__init__(name, emitter, events_config)
+        super().__init__(name, emitter, events_config, config)
         self.events_config = events_config
         _ = config
         try:
@@ -75,10 +96,27 @@ class GenericOutput(BaseConsumerQueued):
             ) from e
 
         chip_path = config.get("path", "/dev/gpiochip0")
-        self.pin_out = GPIO(chip_path, line, "out")
-
         out_value = bool(config.get("default_value", False))
-        self.pin_out.write(out_value)
+        self.default_value = out_value
+        self.auto_reset = _duration(config.get("auto_reset", 0), "auto_reset")
+        for event_name, evt_cfg in (events_config or {}).items():
+            if isinstance(evt_cfg, dict) and "pulse" in evt_cfg:
+                _duration(evt_cfg["pulse"], f"{event_name}: pulse")
+        self._reset_lock = threading.Lock()
+        self._reset_timer = None
+        # incremented on each write, a reset of an older write is ignored
+        self._generation = 0
+        if lines.SUPPORTED:
+            # one line request for all outputs of the chip
+            self.pin_out = lines.request_output(
+                chip_path, line, out_value, owner=name
+            )
+        else:
+            # pylint: disable-next=import-outside-toplevel
+            from periphery import GPIO
+
+            self.pin_out = GPIO(chip_path, line, "out")
+            self.pin_out.write(out_value)
         LOGGER.info(
             "%s: Output %s line %s (default value %s)",
             name,
@@ -87,16 +125,51 @@ class GenericOutput(BaseConsumerQueued):
             out_value,
         )
 
-    def handle_event(self, event_name: str, data: Any):
-        message = f"Event='{event_name}', data='{data}'"
-        LOGGER.debug(message)
-
-        evt_cfg = self.events_config.get(event_name, -1)
-        if evt_cfg is not -1:
+    def close(self):
+        super().close()
+        with self._reset_lock:
+            self._generation += 1
+            if self._reset_timer is not None:
+                get_edge_monitor().cancel(self._reset_timer)
+                self._reset_timer = None
+        self.pin_out.close()
+
+    def _write(self, value: bool, duration: int) -> None:
+        with self._reset_lock:
+            self._generation += 1
+            monitor = None
+            if self._reset_timer is not None:
+                monitor = get_edge_monitor()
+                monitor.cancel(self._reset_timer)
+                self._reset_timer = None
+            self.pin_out.write(value)
+            if duration and value != self.default_value:
+                monitor = monitor or get_edge_monitor()
+                self._reset_timer = monitor.call_at(
+                    time.monotonic_ns() + duration * 1_000_000,
+                    functools.partial(self._reset, self._generation),
+                )
+
+    def _reset(self, generation: int, now: int) -> None:
+        # runs in the EdgeMonitor thread
+        _ = now
+        with self._reset_lock:
+            if generation != self._generation:
+                return
+            self._reset_timer = None
+            LOGGER.debug("%s: Reset to %s", self.name, self.default_value)
+            self.pin_out.write(self.default_value)
+
+    def handle_event(self, event_name: str, data: Any, evt_cfg: Any = -1):
+        LOGGER.debug("Event='%s', data='%s'", event_name, data)
+
+        if evt_cfg == -1:
+            evt_cfg = self.events_config.get(event_name, -1)
+        if evt_cfg != -1:
             if isinstance(evt_cfg, dict):
                 if evt_cfg.get("enabled", True) is False:
                     LOGGER.info("Event '%s' disabled", event_name)
                     return
-                LOGGER.info(message)
+                LOGGER.info("Event='%s', data='%s'", event_name, data)
                 val = bool(evt_cfg.get("value", False))
-                self.pin_out.write(val)
+                self._write(val, int(evt_cfg.get("pulse", self.auto_reset)))
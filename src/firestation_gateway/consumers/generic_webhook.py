@@ -0,0 +1,343 @@
+import datetime
+import functools
+import json
+import logging
+import re
+import string
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from firestation_gateway.eventbus import is_enabled
+from firestation_gateway.httppool import PooledSession
+
+from .http import BaseConsumerHTTP
+
+LOGGER = logging.getLogger(__name__)
+
+METHODS = ("POST", "PUT", "PATCH")
+# placeholders of a body template
+FIELDS = ("event", "time", "data")
+DEFAULT_BODY = {"event": "{event}", "time": "{time}", "data": "{data}"}
+
+_FORMATTER = string.Formatter()
+_FIELD_ROOT = re.compile(r"[^.\[]*")
+# a placeholder string inside the JSON encoded body
+_MARKER = re.compile(r'"\\u0000(\d+)\\u0000"')
+
+
+def _field_value(field: str, values: Dict[str, Any]) -> Any:
+    """Value of a placeholder (e.g. 'data[source]'), None if missing."""
+    try:
+        return _FORMATTER.get_field(field, (), values)[0]
+    except (KeyError, IndexError, AttributeError, TypeError):
+        return None
+
+
+def _compile_text(text: str) -> Tuple[List[str], List[Callable]]:
+    """Literal parts and field renderers of a str.format template."""
+    parts = [""]
+    fields = []
+    try:
+        parsed = list(_FORMATTER.parse(text))
+    except ValueError as e:
+        raise ValueError(f"body: Invalid template ({e}).") from e
+    for literal, field, spec, conversion in parsed:
+        parts[-1] += literal
+        if field is None:
+            continue
+        if _FIELD_ROOT.match(field).group() not in FIELDS:
+            raise ValueError(
+                f"body: Unknown placeholder '{{{field}}}' "
+                f"(one of {', '.join(FIELDS)})"
+            )
+
+        def render(values, field=field, spec=spec, conversion=conversion):
+            value = _field_value(field, values)
+            if value is None:
+                return ""
+            value = _FORMATTER.convert_field(value, conversion)
+            return _FORMATTER.format_field(value, spec)
+
+        fields.append(render)
+        parts.append("")
+    return parts, fields
+
+
+class BodyTemplate:
+    """
+    Request body compiled once, only the placeholders are filled when the
+    event is sent.
+
+    A string is a str.format template, a mapping or list is sent as JSON:
+    a string value consisting of one placeholder keeps the type of the
+    value (e.g. "{data}": the event data as object), other strings are
+    formatted. Placeholders: {event} (event name), {time} (ISO time of the
+    event) and {data} (event data, e.g. {data[source]}). Missing values
+    are empty (null in JSON).
+    """
+
+    __slots__ = ("_fields", "_parts", "content_type")
+
+    def __init__(self, body: Any = None, content_type: Optional[str] = None):
+        if body is None:
+            body = DEFAULT_BODY
+        if isinstance(body, str):
+            self._parts, self._fields = _compile_text(body)
+            self.content_type = content_type or "text/plain; charset=utf-8"
+            return
+        if not isinstance(body, (dict, list)):
+            raise TypeError("body: Must be a string, mapping or list.")
+        self._fields = []
+        body = self._mark(body)
+        try:
+            encoded = json.dumps(body)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"body: Not JSON serializable ({e}).") from e
+        pieces = _MARKER.split(encoded)
+        self._parts = pieces[::2]
+        # fields in the order of the JSON text
+        self._fields = [self._fields[int(i)] for i in pieces[1::2]]
+        self.content_type = content_type or "application/json"
+
+    def _mark(self, node: Any) -> Any:
+        """Replace templated strings by markers, collect their renderers."""
+        if isinstance(node, dict):
+            return {key: self._mark(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [self._mark(value) for value in node]
+        if not isinstance(node, str):
+            return node
+        parts, fields = _compile_text(node)
+        if not fields:
+            # '{{' and '}}' unescaped
+            return parts[0]
+        parsed = next(_FORMATTER.parse(node))
+        if len(fields) == 1 and parts == ["", ""] and not any(parsed[2:]):
+            # "{field}": the JSON value of the field
+            render = functools.partial(_render_value, parsed[1])
+        else:
+            render = functools.partial(_render_string, parts, fields)
+        self._fields.append(render)
+        return f"\0{len(self._fields) - 1}\0"
+
+    def body(self, values: Dict[str, Any]) -> bytes:
+        return _render(self._parts, self._fields, values).encode()
+
+
+def _render(parts: List[str], fields: List[Callable], values) -> str:
+    out = [parts[0]]
+    for render, part in zip(fields, parts[1:]):
+        out.append(render(values))
+        out.append(part)
+    return "".join(out)
+
+
+def _render_value(field: str, values) -> str:
+    return json.dumps(_field_value(field, values), default=str)
+
+
+def _render_string(parts: List[str], fields: List[Callable], values) -> str:
+    return json.dumps(_render(parts, fields, values))
+
+
+class Endpoint:
+    """An HTTP endpoint with its own connection pool."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        name: str,
+        url: str,
+        session: PooledSession,
+        *,
+        method: str = "POST",
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.name = name
+        self.url = url
+        self.session = session
+        self.method = method
+        self.headers = dict(headers or {})
+        # overrides the attempt timeout of the consumer (params 'retry')
+        self.timeout = timeout
+
+    def send(self, body: bytes, content_type: str, timeout: float = 10.0):
+        if self.timeout is not None:
+            timeout = min(timeout, self.timeout)
+        r = self.session.request(
+            self.method,
+            self.url,
+            data=body,
+            headers=dict(self.headers, **{"Content-Type": content_type}),
+            timeout=timeout,
+        )
+        if r.status_code >= 400:
+            LOGGER.error("'%s' [%s] - %s", self.url, r.status_code, r.text)
+        r.raise_for_status()
+        return r
+
+    def close(self):
+        self.session.close()
+
+
+class GenericWebhook(BaseConsumerHTTP):
+    """Send events to arbitrary HTTP endpoints.
+
+    Every endpoint (params 'endpoints' or 'url') has its own connection
+    pool, the endpoints of an event are sent at the same time (params
+    'concurrency'). The body of an event ('body', see BodyTemplate) is
+    compiled at startup and rendered once per event. Failed sends are
+    retried as configured in params 'retry' (attempt_timeout, or
+    'timeout' per endpoint), client errors (4xx) are not retried.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        emitter,
+        events_config,
+        config,
+    ):
+        super().__init__(name, emitter, events_config, config)
+        self.events_config = events_config
+        if not isinstance(config, dict):
+            config = {}
+        self.testmode = config.get("testmode", False)
+        if self.testmode:
+            LOGGER.warning("%s: Testmode enabled! Nothing is sent.", name)
+        endpoints = config.get("endpoints")
+        if endpoints is None and config.get("url"):
+            endpoints = [{"url": config["url"]}]
+        if not endpoints or not isinstance(endpoints, list):
+            raise ValueError(f"{name}: 'endpoints' (or 'url') missing.")
+        self.endpoints: Dict[str, Endpoint] = {}
+        for ep_cfg in endpoints:
+            endpoint = self._endpoint(config, ep_cfg)
+            if endpoint.name in self.endpoints:
+                raise ValueError(
+                    f"{name}: Endpoint '{endpoint.name}' defined twice."
+                )
+            self.endpoints[endpoint.name] = endpoint
+        # (body, endpoints) per event name, invalid events fail here
+        self.templates = {
+            name.lower(): self.compile_event(name, evt_cfg)
+            for name, evt_cfg in events_config.items()
+            if is_enabled(evt_cfg)
+        }
+
+    def _endpoint(self, config: dict, ep_cfg) -> Endpoint:
+        if isinstance(ep_cfg, str):
+            ep_cfg = {"url": ep_cfg}
+        if not isinstance(ep_cfg, dict) or not ep_cfg.get("url"):
+            raise ValueError(f"{self.name}: Endpoint 'url' missing.")
+        url = str(ep_cfg["url"])
+        method = str(ep_cfg.get("method", "POST")).upper()
+        if method not in METHODS:
+            raise ValueError(
+                f"{url}: 'method' must be one of {', '.join(METHODS)}"
+            )
+        headers = ep_cfg.get("headers") or {}
+        if not isinstance(headers, dict):
+            raise TypeError(f"{url}: Invalid 'headers'.")
+        timeout = ep_cfg.get("timeout")
+        if timeout is not None:
+            try:
+                timeout = float(timeout)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"{url}: Invalid 'timeout'.") from e
+            if timeout <= 0:
+                raise ValueError(f"{url}: 'timeout' must be > 0")
+        # pool params of the endpoint, default: those of the consumer
+        session = self.pooled_session(url, dict(config, **ep_cfg))
+        return Endpoint(
+            str(ep_cfg.get("name", url)),
+            url,
+            session,
+            method=method,
+            headers={str(k): str(v) for k, v in headers.items()},
+            timeout=timeout,
+        )
+
+    def close(self):
+        super().close()
+        for endpoint in self.endpoints.values():
+            endpoint.close()
+
+    def compile_event(
+        self, event_name: str, evt_cfg
+    ) -> Tuple[BodyTemplate, List[Endpoint]]:
+        """Body template and endpoints ('endpoints' by name, default: all)
+        of an event."""
+        if not isinstance(evt_cfg, dict):
+            evt_cfg = {}
+        names = evt_cfg.get("endpoints")
+        if names is None:
+            endpoints = list(self.endpoints.values())
+        else:
+            if not isinstance(names, list):
+                names = [names]
+            unknown = [n for n in names if n not in self.endpoints]
+            if unknown:
+                raise ValueError(
+                    f"{event_name}: Unknown endpoint(s) {unknown}."
+                )
+            endpoints = [self.endpoints[n] for n in names]
+        try:
+            body = BodyTemplate(
+                evt_cfg.get("body"), evt_cfg.get("content_type")
+            )
+        except (TypeError, ValueError) as e:
+            raise type(e)(f"{event_name}: {e}") from e
+        return body, endpoints
+
+    def handle_event(self, event_name: str, data: Any, evt_cfg: Any = None):
+        LOGGER.debug("Event='%s', data='%s'", event_name, data)
+
+        compiled = self.compiled(
+            self.templates, event_name, evt_cfg, self.compile_event
+        )
+        if compiled is None:
+            return
+        template, endpoints = compiled
+
+        # rendered once, the same body goes to every endpoint
+        body = template.body(
+            {
+                "event": event_name,
+                "time": datetime.datetime.now().isoformat(),
+                "data": data,
+            }
+        )
+        deliveries = []
+        limited = 0
+        for endpoint in endpoints:
+            if self.rate_limited(("webhook", endpoint.url)):
+                limited += 1
+                continue
+            if self.testmode:
+                LOGGER.info(
+                    "%s: %s %s %s",
+                    event_name,
+                    endpoint.method,
+                    endpoint.url,
+                    body.decode(),
+                )
+                continue
+            deliveries.append(
+                (
+                    f"{event_name} -> {endpoint.name}",
+                    endpoint.send,
+                    (body, template.content_type),
+                )
+            )
+        if endpoints and limited == len(endpoints):
+            self.suppress_event("rate_limited")
+        if not deliveries:
+            return
+        results = self.deliver_many(deliveries)
+        if len(deliveries) > 1:
+            LOGGER.info(
+                "%s: Delivered to %d of %d endpoints",
+                event_name,
+                sum(r is not None for r in results),
+                len(deliveries),
+            )
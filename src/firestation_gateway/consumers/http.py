@@ -0,0 +1,33 @@
+import requests
+
+from firestation_gateway.httppool import (
+    POOL_SIZE,
+    PooledSession,
+    is_retryable,
+)
+
+from .base import BaseConsumerQueued
+
+
+class BaseConsumerHTTP(BaseConsumerQueued):
+    """Consumer sending its events by HTTP (pooled connections)."""
+
+    DELIVERY_EXCEPTIONS = (requests.exceptions.RequestException,)
+
+    testmode = False
+
+    def pooled_session(
+        self, base_url: str, config: dict, connections: int = 0
+    ) -> PooledSession:
+        """Connection pool (params 'pool_size', 'keepalive', ...) for the
+        concurrent sends and 'connections' more (e.g. health checks), no
+        background I/O in testmode."""
+        return PooledSession.from_config(
+            base_url,
+            config,
+            enabled=not self.testmode,
+            pool_size=max(POOL_SIZE, self.concurrency + connections),
+        )
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return is_retryable(exc)
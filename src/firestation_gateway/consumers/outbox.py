@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, List, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+SEGMENT_SIZE = 1024 * 1024
+COMMIT_INTERVAL = 0.05
+
+# record: type, payload length, crc32(payload)
+_HEADER = struct.Struct("<BII")
+_ACK = struct.Struct("<Q")
+_TYPE_EVENT = 1
+_TYPE_ACK = 2
+
+# open outboxes by directory, shared while a consumer is replaced
+_open = {}
+_open_lock = threading.Lock()
+
+
+class Outbox:
+    """Append-only on-disk log of queued events.
+
+    Events and acknowledgements are appended to segment files
+    ('<n>.seg'), each record protected by a CRC32. A background thread
+    fsyncs at most every 'commit_interval' seconds, so a burst of events
+    costs a single fsync (group commit). Segments are deleted as soon as
+    all their events (and all events of older segments) are acknowledged.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        segment_size: int = SEGMENT_SIZE,
+        commit_interval: float = COMMIT_INTERVAL,
+    ):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.commit_interval = commit_interval
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._closed = False
+        self._users = 1
+        # segment index -> unacknowledged seqs of the segment
+        self._segments: OrderedDict[int, set] = OrderedDict()
+        self._seq_segment = {}
+        self._seq = 0
+        self._file = None
+        self._index = 0
+        self._pending = self._load()
+
+        self._thread = threading.Thread(
+            target=self._run, name="Outbox-" + self.path.name, daemon=True
+        )
+        self._thread.start()
+
+    @classmethod
+    def open(cls, path: str, **kwargs) -> "Outbox":
+        """Open the outbox of 'path' or share it if it is open already.
+
+        Every user has to close() it, pending events are replayed to the
+        first user only.
+        """
+        path = os.path.abspath(path)
+        with _open_lock:
+            outbox = _open.get(path)
+            if outbox is not None:
+                outbox._users += 1
+                return outbox
+            outbox = _open[path] = cls(path, **kwargs)
+            return outbox
+
+    @classmethod
+    def from_config(cls, config: dict, name: str) -> "Outbox":
+        if isinstance(config, str):
+            config = {"path": config}
+        if not isinstance(config, dict) or "path" not in config:
+            raise ValueError("outbox: No 'path' parameter set!")
+        try:
+            return cls.open(
+                os.path.join(config["path"], name.lower().replace(" ", "_")),
+                segment_size=int(config.get("segment_size", SEGMENT_SIZE)),
+                commit_interval=float(
+                    config.get("commit_interval", COMMIT_INTERVAL)
+                ),
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"outbox: Invalid value ({e}).") from e
+
+    def replay(self) -> List[Tuple[int, str, Any]]:
+        """Return (seq, event_name, data) of events not acknowledged before
+        the last shutdown (only once)."""
+        pending, self._pending = self._pending, []
+        return pending
+
+    def append(self, event_name: str, data: Any) -> int:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            payload = json.dumps(
+                [seq, event_name, data], default=str
+            ).encode("utf-8")
+            self._write(_TYPE_EVENT, payload)
+            self._segments[self._index].add(seq)
+            self._seq_segment[seq] = self._index
+        self._dirty.set()
+        return seq
+
+    def ack(self, seq: int) -> None:
+        with self._lock:
+            index = self._seq_segment.pop(seq, None)
+            if index is None:
+                return
+            self._segments[index].discard(seq)
+            self._write(_TYPE_ACK, _ACK.pack(seq))
+            self._compact()
+        self._dirty.set()
+
+    def close(self) -> None:
+        with _open_lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+            if _open.get(str(self.path)) is self:
+                del _open[str(self.path)]
+        self._closed = True
+        self._dirty.set()
+        self._thread.join()
+        with self._lock:
+            self._commit()
+            self._file.close()
+
+    def _segment_path(self, index: int) -> Path:
+        return self.path / f"{index:08d}.seg"
+
+    def _write(self, rtype: int, payload: bytes) -> None:
+        if self._file.tell() >= self.segment_size:
+            self._open_segment(self._index + 1)
+        self._file.write(
+            _HEADER.pack(rtype, len(payload), zlib.crc32(payload)) + payload
+        )
+
+    def _open_segment(self, index: int) -> None:
+        if self._file is not None:
+            self._commit()
+            self._file.close()
+        self._index = index
+        # open until the next segment, closed by _open_segment()/close()
+        self._file = open(  # noqa: SIM115 pylint: disable=consider-using-with
+            self._segment_path(index), "ab"
+        )
+        self._segments[index] = set()
+        self._fsync_dir()
+
+    def _compact(self) -> None:
+        # only delete from the oldest segment on, later segments may hold
+        # the acknowledgements of events in earlier ones
+        while len(self._segments) > 1:
+            index, unacked = next(iter(self._segments.items()))
+            if unacked:
+                break
+            self._segments.popitem(last=False)
+            self._segment_path(index).unlink(missing_ok=True)
+
+    def _commit(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _fsync_dir(self) -> None:
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._dirty.wait()
+            if self._closed:
+                break
+            self._dirty.clear()
+            try:
+                self._sync()
+            except OSError:
+                # e.g. disk full, the events stay queued in memory
+                LOGGER.exception("outbox: Commit of '%s' failed", self.path)
+            # collect everything arriving meanwhile for the next commit
+            time.sleep(self.commit_interval)
+
+    def _sync(self) -> None:
+        with self._lock:
+            self._file.flush()
+            # the segment may be closed by _open_segment() meanwhile
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read_segment(path: Path):
+        with open(path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos + _HEADER.size <= len(data):
+            rtype, length, crc = _HEADER.unpack_from(data, pos)
+            payload = data[pos + _HEADER.size : pos + _HEADER.size + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                LOGGER.warning("outbox: '%s' truncated at %d", path, pos)
+                break
+            pos += _HEADER.size + length
+            yield rtype, payload
+
+    def _load(self) -> List[Tuple[int, str, Any]]:
+        """Read all segments, rewrite pending events into a new segment
+        and remove the old ones."""
+        events = {}
+        acked = set()
+        old = sorted(self.path.glob("*.seg"))
+        for path in old:
+            for rtype, payload in self._read_segment(path):
+                if rtype == _TYPE_EVENT:
+                    seq, event_name, data = json.loads(payload)
+                    events[seq] = (event_name, data)
+                elif rtype == _TYPE_ACK:
+                    acked.add(_ACK.unpack(payload)[0])
+
+        last = int(old[-1].stem) if old else 0
+        self._open_segment(last + 1)
+        # continue numbering, old files may survive a crash during cleanup
+        self._seq = max(events, default=0)
+        pending = []
+        for seq in sorted(events):
+            if seq in acked:
+                continue
+            event_name, data = events[seq]
+            pending.append((self.append(event_name, data), event_name, data))
+        self._commit()
+        for path in old:
+            path.unlink()
+        self._fsync_dir()
+        if pending:
+            LOGGER.info(
+                "outbox: %d pending event(s) in '%s'", len(pending), self.path
+            )
+        return pending
@@ -0,0 +1,304 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from firestation_gateway import history, logpipe, metrics
+from firestation_gateway.eventbus import EventBus, current_trace
+from firestation_gateway.shmring import RING_SIZE, ShmRing
+
+from . import worker
+from .retry import policy_from_config
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class ProcessPolicy:
+    """
+    Worker process of a consumer (params 'process').
+
+    Attributes:
+        ring_size (int):     Size of the shared memory ring in bytes, events
+                             are dropped while it is full.
+        backoff (float):     Delay before the first restart of a dead
+                             worker in seconds.
+        backoff_max (float): Upper limit of the (doubling) delay.
+        stop_timeout (float): Wait for the worker to stop, then kill it.
+    """
+
+    ring_size: int = RING_SIZE
+    backoff: float = 1.0
+    backoff_max: float = 60.0
+    stop_timeout: float = 10.0
+
+    def __post_init__(self):
+        if self.ring_size < 4096:
+            raise ValueError("process: 'ring_size' must be >= 4096")
+        if self.backoff <= 0 or self.backoff_max < self.backoff:
+            raise ValueError(
+                "process: 'backoff' must be > 0 and <= 'backoff_max'"
+            )
+        if self.stop_timeout <= 0:
+            raise ValueError("process: 'stop_timeout' must be > 0")
+
+    @classmethod
+    def from_config(cls, config) -> "ProcessPolicy":
+        return policy_from_config(cls, config, "process")
+
+
+class ProcessConsumer:  # pylint: disable=too-many-instance-attributes
+    """Run a consumer in a worker process.
+
+    The proxy subscribes the events of the consumer and writes them to a
+    shared memory ring (ShmRing), the worker reads them and passes them
+    to the real consumer. The emitting process never blocks on the
+    network side: a full ring drops events. A supervisor thread restarts
+    a dead worker (with a doubling delay), events in the ring are kept.
+
+    On a config reload the successor (a ProcessConsumer of the same
+    name) starts its worker once this worker has handled its queued
+    events, so the order is kept and the outbox is used by one process at
+    a time.
+    """
+
+    def __init__(self, consumer_cfg: dict, emitter):
+        self.name = consumer_cfg["name"]
+        self.emitter = emitter
+        self.consumer_cfg = consumer_cfg
+        params = dict(consumer_cfg["params"])
+        self.policy = ProcessPolicy.from_config(params.pop("process"))
+        # the worker builds the consumer from this config
+        self._worker_cfg = dict(consumer_cfg, params=params)
+        self._check_config()
+        self.outbox = None
+        self.ring = ShmRing.create(self.policy.ring_size)
+        self._ring_lock = threading.Lock()
+        # wakes the worker while it waits for events
+        self._doorbell_r, self._doorbell_w = os.pipe()
+        os.set_blocking(self._doorbell_w, False)
+        self._stopping = threading.Event()
+        # set by stop(): kill the worker if it is still running then
+        self._kill_at: Optional[float] = None
+        self._closed = False
+        self._predecessor: Optional[ProcessConsumer] = None
+        self._process = None
+        self._supervisor = threading.Thread(
+            target=self._supervise, name=f"Worker-{self.name}", daemon=True
+        )
+        self._full = False
+        self._dropped = metrics.QUEUE_OVERFLOW.labels(self.name, "dropped")
+        self._restarts = metrics.WORKER_RESTARTS.labels(self.name)
+        self._gauges = metrics.GaugeFunctions()
+        self._gauges.set(
+            metrics.QUEUE_DEPTH, lambda: len(self.ring), self.name
+        )
+
+        for event_name, evt_cfg in (consumer_cfg["events"] or {}).items():
+            emitter.subscribe(event_name, self.enqueue, evt_cfg)
+
+    def _check_config(self) -> None:
+        """Build the consumer here once, so an invalid config (ValueError,
+        TypeError) fails now and not in every restart of the worker."""
+        # the outbox belongs to the worker (a predecessor may use it)
+        params = dict(self._worker_cfg["params"], outbox=None)
+        try:
+            consumer = worker.create_consumer(
+                dict(self._worker_cfg, params=params), EventBus()
+            )
+        except OSError as e:
+            # e.g. GPIO lines still used by the worker of a predecessor
+            LOGGER.debug("%s: Config not checked (%s)", self.name, e)
+            return
+        if consumer is None:
+            raise ValueError(
+                f"Consumer '{self._worker_cfg['type']}' not exists."
+            )
+        consumer.close()
+
+    # this function runs in the context of the emitter
+    def enqueue(self, event_name: str, data: Any, evt_cfg: Any = None):
+        _ = evt_cfg
+        self._put(event_name, data, current_trace())
+
+    def _put(self, event_name: str, data: Any, trace) -> None:
+        with self._ring_lock:
+            if self._closed:
+                return
+            try:
+                added = self.ring.put(event_name, data, trace)
+            except (TypeError, ValueError) as e:
+                LOGGER.error(
+                    "%s: Event '%s' not sent to the worker: %s",
+                    self.name,
+                    event_name,
+                    e,
+                )
+                return
+            if self.ring.sleeping:
+                self._ring()
+        if added:
+            self._full = False
+            return
+        self._dropped.inc()
+        if not self._full:
+            # logged once until there is space again
+            self._full = True
+            LOGGER.warning(
+                "%s: Worker ring full, events are dropped", self.name
+            )
+
+    def accept(  # pylint: disable=too-many-arguments
+        self, event_name: str, data: Any, seq, t_enqueue: int, trace=None
+    ):
+        """Queue an event taken over from the replaced consumer."""
+        _ = seq, t_enqueue
+        self._put(event_name, data, trace)
+
+    def _ring(self) -> None:
+        try:
+            os.write(self._doorbell_w, b"\0")
+        except BlockingIOError:
+            # the worker has not read the pipe yet, it will wake up
+            pass
+
+    def start(self) -> None:
+        self._supervisor.start()
+
+    def stop(self) -> None:
+        self._kill_at = time.monotonic() + self.policy.stop_timeout
+        self._stopping.set()
+        self._command(worker.STOP)
+
+    def retire(self, successor=None) -> None:
+        """Let the worker handle the queued events and stop."""
+        if isinstance(successor, ProcessConsumer):
+            successor._predecessor = self  # pylint: disable=protected-access
+        self._stopping.set()
+        self._command(worker.RETIRE)
+
+    def _command(self, command: int) -> None:
+        with self._ring_lock:
+            if self._closed:
+                return
+            self.ring.command = command
+            self._ring()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._supervisor.is_alive():
+            self._supervisor.join(timeout)
+
+    @property
+    def retired(self) -> bool:
+        return self._stopping.is_set() and not self._supervisor.is_alive()
+
+    def drained(self) -> bool:
+        """The worker has handled the events of the ring and its queue."""
+        with self._ring_lock:
+            return self._closed or bool(self.ring.drained)
+
+    def close(self) -> None:
+        """Release the ring, called when the worker is gone."""
+        with self._ring_lock:
+            if self._closed:
+                return
+            self._closed = True
+            os.close(self._doorbell_r)
+            os.close(self._doorbell_w)
+            self.ring.close()
+        self._gauges.remove()
+
+    def _wait_predecessor(self) -> None:
+        predecessor = self._predecessor
+        if predecessor is None:
+            return
+        # the outbox can only be used by one process
+        shared = self.consumer_cfg["params"].get("outbox")
+        while not self._stopping.is_set():
+            done = (
+                predecessor.retired if shared else predecessor.drained()
+            )
+            if done:
+                break
+            time.sleep(worker.POLL_INTERVAL)
+        self._predecessor = None
+
+    def _spawn(self) -> subprocess.Popen:
+        # a fresh interpreter: nothing of the GPIO side (threads, lines) is
+        # inherited, the config is passed on stdin
+        path = os.pathsep.join(filter(None, sys.path))
+        env = dict(os.environ, PYTHONPATH=path)
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, "-m", worker.__name__],
+            stdin=subprocess.PIPE,
+            pass_fds=(self._doorbell_r,),
+            env=env,
+        )
+        with process.stdin:
+            process.stdin.write(
+                json.dumps(
+                    {
+                        "consumer": self._worker_cfg,
+                        "ring": self.ring.path,
+                        "doorbell": self._doorbell_r,
+                        "logging": logpipe.OPTIONS,
+                        "history": history.worker_config(),
+                    },
+                    default=str,
+                ).encode()
+            )
+        return process
+
+    def _supervise(self) -> None:
+        self._wait_predecessor()
+        delay = self.policy.backoff
+        while not self._stopping.is_set():
+            t_start = time.monotonic()
+            try:
+                self._process = self._spawn()
+            except OSError as e:
+                LOGGER.error(
+                    "%s: Worker process not started: %s", self.name, e
+                )
+            else:
+                LOGGER.info(
+                    "%s: Worker process started (pid %d)",
+                    self.name,
+                    self._process.pid,
+                )
+                while self._process.poll() is None:
+                    if self._stopping.wait(worker.POLL_INTERVAL):
+                        break
+                if self._stopping.is_set():
+                    break
+                LOGGER.error(
+                    "%s: Worker process died (exit code %s)",
+                    self.name,
+                    self._process.returncode,
+                )
+            if time.monotonic() - t_start > self.policy.backoff_max:
+                delay = self.policy.backoff
+            LOGGER.info("%s: Worker restart in %.1fs", self.name, delay)
+            self._restarts.inc()
+            if self._stopping.wait(delay):
+                break
+            delay = min(self.policy.backoff_max, delay * 2)
+        self._finish()
+
+    def _finish(self) -> None:
+        process = self._process
+        # a retiring worker may finish its retries, unless stop() is called
+        while process is not None and process.poll() is None:
+            time.sleep(worker.POLL_INTERVAL)
+            if self._kill_at is not None and time.monotonic() > self._kill_at:
+                LOGGER.error(
+                    "%s: Worker process does not stop, killed", self.name
+                )
+                process.kill()
+                process.wait()
+        self.close()
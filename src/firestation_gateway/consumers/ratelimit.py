@@ -0,0 +1,74 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+
+from .retry import policy_from_config
+
+
+@dataclass
+class RateLimit:
+    """
+    Rate limit per destination of a consumer (params 'rate_limit').
+
+    Attributes:
+        per_minute (float): Sends per minute and destination (0 = no limit).
+        burst (float):      Sends possible at once after a quiet time.
+    """
+
+    per_minute: float = 0.0
+    burst: float = 5.0
+
+    def __post_init__(self):
+        if self.per_minute < 0:
+            raise ValueError("rate_limit: 'per_minute' must be >= 0")
+        if self.burst < 1:
+            raise ValueError("rate_limit: 'burst' must be >= 1")
+
+    @classmethod
+    def from_config(cls, config) -> "RateLimit":
+        return policy_from_config(cls, config, "rate_limit")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        # tokens per second
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, now: Optional[float] = None) -> bool:
+        """Take a token, False if there is none."""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self._t) * self.rate
+            )
+            self._t = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+_buckets: Dict[Hashable, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(key: Hashable, limit: RateLimit) -> TokenBucket:
+    """Bucket of a destination, shared by all consumers sending to it.
+
+    The settings of the latest caller apply (config reload).
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(
+                limit.per_minute / 60, limit.burst
+            )
+        bucket.rate = limit.per_minute / 60
+        bucket.burst = limit.burst
+        return bucket
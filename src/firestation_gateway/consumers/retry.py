@@ -0,0 +1,86 @@
+import random
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+_P = TypeVar("_P")
+
+
+def policy_from_config(cls: Type[_P], config: Any, name: str) -> _P:
+    """Settings dataclass 'cls' from the params 'name' of a consumer.
+
+    Values are converted to the type of the field (int, float or str),
+    others are passed as they are. Missing params keep the default, no
+    mapping means all defaults.
+    """
+    if not isinstance(config, dict):
+        config = {}
+    types = {
+        f.name: f.type for f in fields(cls) if f.type in (int, float, str)
+    }
+    params = {}
+    for key, value in config.items():
+        try:
+            params[key] = types[key](value) if key in types else value
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{name}: Invalid '{key}' ({e}).") from e
+    try:
+        return cls(**params)
+    except TypeError as e:
+        raise ValueError(f"{name}: Invalid parameter ({e}).") from e
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Retry settings of a consumer (params 'retry').
+
+    Attributes:
+        attempt_timeout (float): Timeout of a single attempt in seconds.
+        backoff (float):         Delay before the first retry in seconds.
+        backoff_max (float):     Upper limit of the (doubling) delay.
+        deadline (float):        Give up this many seconds after the event.
+                                 (0 = no retry)
+    """
+
+    attempt_timeout: float = 10.0
+    backoff: float = 1.0
+    backoff_max: float = 60.0
+    deadline: float = 300.0
+
+    def __post_init__(self):
+        if self.attempt_timeout <= 0:
+            raise ValueError("retry: 'attempt_timeout' must be > 0")
+        if self.backoff <= 0 or self.backoff_max < self.backoff:
+            raise ValueError(
+                "retry: 'backoff' must be > 0 and <= 'backoff_max'"
+            )
+        if self.deadline < 0:
+            raise ValueError("retry: 'deadline' must be >= 0")
+
+    @classmethod
+    def from_config(cls, config) -> "RetryPolicy":
+        return policy_from_config(cls, config, "retry")
+
+    def delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter for the given failed attempt."""
+        delay = min(self.backoff_max, self.backoff * 2 ** (attempt - 1))
+        # "equal jitter": keep half, randomize the other half
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+@dataclass(order=True)
+class Delivery:
+    """A pending delivery: func(*args, timeout=...) until it succeeds."""
+
+    due: float
+    description: str = field(compare=False)
+    func: Callable[..., Any] = field(compare=False)
+    args: Tuple[Any, ...] = field(compare=False)
+    deadline: float = field(compare=False)
+    attempt: int = field(default=0, compare=False)
+    # outbox entry of the event (None: no outbox)
+    seq: Optional[int] = field(default=None, compare=False)
+    # alarm path timestamps (monotonic ns) of the event
+    trace: Optional[Dict[str, int]] = field(default=None, compare=False)
+    # (event_name, data) of the event, for the history
+    event: Optional[Tuple[str, Any]] = field(default=None, compare=False)
@@ -1,32 +1,32 @@
 import logging
-from typing import Any
-import requests
+import time
+from typing import Any, List, Optional
 from firestation_gateway import tetracontrol
+from firestation_gateway.eventbus import is_enabled
+from firestation_gateway.health import HealthPolicy
 
-from .base import BaseConsumerQueued
+from .http import BaseConsumerHTTP
 
 
 LOGGER = logging.getLogger(__name__)
 
 sds_callout_prototype = {
-    "Ziel": "",
-    "Text": "",
     "Typ": tetracontrol.TETRAcontrolSDSTyp.CALLOUT,
     "Prio": 1,
     "Flash": 1,
     "COPrio": 1,
-    "CONum": 123,
 }
 sds_prototype = {
-    "Ziel": "",
-    "Text": "",
     "Typ": tetracontrol.TETRAcontrolSDSTyp.NORMAL,
     "Prio": 1,
     "Flash": 1,
 }
 
+# callout numbers (CONum) 1-250
+CONUM_MAX = 250
 
-class Tetracontrol(BaseConsumerQueued):
+
+class Tetracontrol(BaseConsumerHTTP):
     def __init__(
         self,
         name: str,
@@ -34,7 +34,7 @@ class Tetracontrol(BaseConsumerQueued):
         events_config,
         config,
     ):
-        super().__init__(name, emitter, events_config)
+        super().__init__(name, emitter, events_config, config)
         self.events_config = events_config
         self.token = config.get("token")
         self.url = config.get("url")
@@ -43,54 +43,146 @@ class Tetracontrol(BaseConsumerQueued):
             LOGGER.warning(
                 "Tetracontrol: Testmode enabled! No real alarm is sent."
             )
+        # radios (GerID) the SDS are spread across
+        devices = tetracontrol.DevicePolicy.from_config(config.get("devices"))
         self.tetracontrol = tetracontrol.TETRAcontrolClient(
-            self.url, self.token
+            self.url,
+            self.token,
+            # concurrent sends and the checks of all radios
+            self.pooled_session(self.url, config, len(devices.ids)),
+            devices.ids[0],
         )
         # counter for all alarm events
         self.alarm_number = 1
+        # SDS templates per event name, invalid events fail here
+        self.templates = {
+            name.lower(): self.compile_sds(name, evt_cfg)
+            for name, evt_cfg in events_config.items()
+            if is_enabled(evt_cfg)
+        }
+
+        # the radios are checked in the background (check_device), never
+        # delays the startup; failing radios are skipped
+        health_policy = HealthPolicy.from_config(config.get("health"))
+        probe = None
+        if not self.testmode and health_policy.interval > 0:
+            probe = self.tetracontrol.check_device
+        self.device_pool = tetracontrol.DevicePool(
+            name, devices, probe, health_policy
+        )
+        self.device_pool.start()
+
+    def close(self):
+        super().close()
+        self.device_pool.stop()
+        self.tetracontrol.close()
+
+    def compile_sds(
+        self, event_name: str, evt_cfg
+    ) -> List[tetracontrol.SDSTemplate]:
+        """SDS templates of an event, one per 'dest' (ISSI/GSSI or list)."""
+        if not isinstance(evt_cfg, dict):
+            raise TypeError(f"{event_name}: Event config missing.")
+        if evt_cfg.get("type") == "callout":
+            sds = dict(sds_callout_prototype)
+            # only callout support CONum and sub
+            text = "".join(evt_cfg.get("sub", ""))
+        else:
+            # default if not set
+            sds = dict(sds_prototype)
+            text = ""
+        if not isinstance(evt_cfg.get("text"), str):
+            raise TypeError(f"{event_name}: 'text' missing.")
+        dests = evt_cfg.get("dest")
+        if not isinstance(dests, list):
+            dests = [dests]
+        try:
+            dests = [int(dest) for dest in dests]
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{event_name}: Invalid 'dest'.") from e
+        if not dests:
+            raise ValueError(f"{event_name}: 'dest' missing.")
+        sds["Text"] = text + evt_cfg["text"]
+        try:
+            return [
+                tetracontrol.SDSTemplate(
+                    dict(sds, Ziel=dest), self.tetracontrol.device_id
+                )
+                for dest in dests
+            ]
+        except ValueError as e:
+            raise ValueError(f"{event_name}: {e}") from e
+
+    def handle_event(self, event_name: str, data: Any, evt_cfg: Any = None):
+        LOGGER.debug("Event='%s', data='%s'", event_name, data)
+
+        templates = self.compiled(
+            self.templates, event_name, evt_cfg, self.compile_sds
+        )
+        if templates is None:
+            return
+
+        templates = [
+            t
+            for t in templates
+            if not self.rate_limited((self.url, t.model.Ziel))
+        ]
+        if not templates:
+            self.suppress_event("rate_limited")
+            return
+
+        # one callout number for all destinations of the event
+        conum = None
+        if templates[0].callout:
+            conum = self.alarm_number
+            self.alarm_number = self.alarm_number % CONUM_MAX + 1
 
-        if not self.testmode:
-            # test connection to tetracontrol. TODO: remove later
-            try:
-                r = self.tetracontrol.device_status()
-                print(r.text)
-            except requests.exceptions.ConnectionError as e:
-                LOGGER.error(e)
-                # LOG.exception(e)
-            except requests.exceptions.HTTPError as e:
-                LOGGER.error(e)
-            except requests.exceptions.InvalidURL as e:
-                LOGGER.error(e)
-
-    def handle_event(self, event_name: str, data: Any):
-        message = f"Event='{event_name}', data='{data}'"
-        LOGGER.debug(message)
-
-        evt_cfg = self.events_config.get(event_name)
-        if evt_cfg is not None:
-            if evt_cfg.get("enabled", True) is False:
-                return
-            # event is set within config
-            if evt_cfg.get("type") == "callout":
-                sds = sds_callout_prototype.copy()
-                # only callout support CONum and sub
-                sds["CONum"] = self.alarm_number
-                text = "".join(evt_cfg.get("sub", ""))
-                self.alarm_number += 1
-            else:
-                # default if not set
-                sds = sds_prototype.copy()
-                text = ""
-
-            sds["Text"] = text + evt_cfg.get("text")
-            sds["Ziel"] = evt_cfg.get("dest")
-
-            LOGGER.info(sds)
-            if not self.testmode:
-                try:
-                    r = self.tetracontrol.sds(sds)
-                    LOGGER.info(r.text)
-                except requests.exceptions.ConnectionError as e:
-                    LOGGER.error(e)
-                except requests.exceptions.HTTPError as e:
-                    LOGGER.error(e)
+        for template in templates:
+            LOGGER.info(
+                "SDS %s CONum=%s Text='%s'",
+                template.model.Ziel,
+                conum,
+                template.model.Text,
+            )
+        if self.testmode:
+            return
+        results = self.deliver_many(
+            [
+                (f"{event_name} -> {t.model.Ziel}", self._send, (t, conum))
+                for t in templates
+            ]
+        )
+        for template, r in zip(templates, results):
+            if r is not None:
+                LOGGER.info("SDS %s: %s", template.model.Ziel, r.text)
+        if len(templates) > 1:
+            LOGGER.info(
+                "%s: SDS delivered to %d of %d destinations",
+                event_name,
+                sum(r is not None for r in results),
+                len(templates),
+            )
+
+    def _send(
+        self,
+        template: tetracontrol.SDSTemplate,
+        conum: Optional[int],
+        timeout: float,
+    ):
+        # every attempt selects a device, a retry may use another one
+        device = self.device_pool.acquire()
+        LOGGER.debug(
+            "SDS %s via GerID %d", template.model.Ziel, device.device_id
+        )
+        t_start = time.monotonic()
+        ok = False
+        try:
+            r = self.tetracontrol.send_sds(
+                template, conum, timeout, device.device_id
+            )
+            ok = True
+            return r
+        finally:
+            self.device_pool.release(
+                device, ok, time.monotonic() - t_start
+            )
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import select
+import signal
+import sys
+import time
+
+from firestation_gateway import history, logpipe
+from firestation_gateway.eventbus import EventBus, emit_traced
+from firestation_gateway.shmring import ShmRing
+
+from . import get_consumer
+
+LOGGER = logging.getLogger(__name__)
+
+# Worker process of a ProcessConsumer (python -m ..., arguments as JSON on
+# stdin). Only the consumer side is imported, never the gateway.
+
+# ShmRing.command
+RUN = 0
+STOP = 1
+RETIRE = 2
+
+# the reader checks the command and the parent process at least this often
+POLL_INTERVAL = 0.1
+
+
+def create_consumer(worker_cfg, emitter):
+    cls = get_consumer(worker_cfg["type"])
+    if not cls:
+        LOGGER.error("Consumer '%s' not exists.", worker_cfg["type"])
+        return None
+    return cls(
+        name=worker_cfg["name"],
+        emitter=emitter,
+        events_config=worker_cfg["events"],
+        config=worker_cfg["params"],
+    )
+
+
+def main(
+    worker_cfg, ring_path, doorbell: int, log_options, history_cfg=None
+) -> None:
+    """Main function of the worker process."""
+    # Ctrl+C reaches the whole process group, the parent stops the worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logpipe.setup(**log_options)
+    if history_cfg is not None:
+        # delivery outcomes of the worker, the parent prunes
+        history.start(history_cfg, prune=False)
+    parent = os.getppid()
+    ring = ShmRing.attach(ring_path)
+    bus = EventBus()
+    consumer = create_consumer(worker_cfg, bus)
+    if consumer is None:
+        sys.exit(2)
+    consumer.start()
+
+    command = RUN
+    while True:
+        event = ring.get()
+        if event is not None:
+            emit_traced(bus, *event)
+            continue
+        if command != RUN:
+            break
+        command = ring.command
+        if os.getppid() != parent:
+            LOGGER.error("%s: Parent process gone", consumer.name)
+            command = STOP
+        if command != RUN:
+            # read the events written before the command
+            continue
+        # a missed doorbell (flag and ring not yet visible to the other
+        # side) only delays the event by the poll interval
+        ring.sleeping = True
+        if len(ring) == 0:
+            readable, _, _ = select.select([doorbell], [], [], POLL_INTERVAL)
+            if readable:
+                os.read(doorbell, 4096)
+        ring.sleeping = False
+
+    if command == RETIRE and hasattr(consumer, "retire"):
+        # the successor waits for the queued events, not for retries
+        consumer.retire()
+        queued = getattr(consumer, "event_queue", None)
+        while (
+            queued is not None
+            and queued.qsize()
+            and consumer.is_alive()
+            and ring.command != STOP
+        ):
+            time.sleep(POLL_INTERVAL)
+        ring.drained = True
+        while consumer.is_alive() and ring.command != STOP:
+            consumer.join(POLL_INTERVAL)
+    ring.drained = True
+    consumer.stop()
+    consumer.join()
+    ring.close()
+    history.stop()
+
+
+if __name__ == "__main__":
+    _args = json.load(sys.stdin)
+    main(
+        _args["consumer"],
+        _args["ring"],
+        _args["doorbell"],
+        _args["logging"],
+        _args.get("history"),
+    )
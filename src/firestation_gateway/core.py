@@ -1,68 +1,29 @@
+import datetime
+import json
 import logging
+import re
 import sys
 import time
 from pathlib import Path
 
 import click
-import yaml
-from pyee import EventEmitter
 
 import firestation_gateway
 
-from .consumers import get_consumer
-from .producers import get_producer
+from .logpipe import setup as setup_log_pipeline
+from .startup import StartupProfile
 
 CONFIG_EXAMPLE_FILE = "config.example.yaml"
+RUNTIMES = ["threads", "asyncio"]
+# see runtime.IO_WORKERS
+IO_WORKERS = 4
 
 
-def load_config(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+def setup_logging(level=logging.INFO, log_async=False, log_json=False):
+    setup_log_pipeline(level, log_async=log_async, log_json=log_json)
 
 
-def setup_logging(level=logging.INFO):
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s [%(levelname)s|%(threadName)s] %(message)s",
-    )
-
-
-def consumer_setup(config, emitter):
-    consumers = []
-    for consumer_cfg in config["consumers"]:
-        cls = get_consumer(consumer_cfg["type"])
-        if not cls:
-            logging.warning("Consumer '%s' not exists.", consumer_cfg["type"])
-            continue
-
-        consumer = cls(
-            name=consumer_cfg["name"],
-            emitter=emitter,
-            events_config=consumer_cfg["events"],
-            config=consumer_cfg["params"],
-        )
-        consumers.append(consumer)
-    return consumers
-
-
-def producer_setup(config, emitter):
-    producers = []
-    for producer_cfg in config["producers"]:
-        cls = get_producer(producer_cfg["type"])
-        if not cls:
-            logging.warning("Producer '%s' not exists.", producer_cfg["type"])
-            continue
-        producer = cls(
-            name=producer_cfg["name"],
-            emitter=emitter,
-            events_config=producer_cfg["events"],
-            config=producer_cfg["params"],
-        )
-        producers.append(producer)
-    return producers
-
-
-@click.command()
+@click.group(invoke_without_command=True)
 # @click.option("--start", help="Start Firestation-Gateway", is_flag=True)
 @click.option(
     "--config", help="Specify a configuration file", default="config.yaml"
@@ -72,7 +33,57 @@ def producer_setup(config, emitter):
     help="Output a example configuration file",
     is_flag=True,
 )
-def main(config, generate_config):
+@click.option(
+    "--runtime",
+    help="Run producers/consumers in threads or in one asyncio loop",
+    type=click.Choice(RUNTIMES),
+    default="threads",
+)
+@click.option(
+    "--io-workers",
+    help="Number of threads for blocking I/O and sends (asyncio runtime)",
+    type=int,
+    default=IO_WORKERS,
+)
+@click.option(
+    "--watch-config",
+    help="Reload the config when the file changes (as on SIGHUP)",
+    is_flag=True,
+)
+@click.option(
+    "--profile-startup",
+    help="Log the time of the startup phases (imports, config, hardware)",
+    is_flag=True,
+)
+@click.option(
+    "--log-async",
+    help="Write the log in a background thread, a full log ring drops the "
+    "oldest records (see metric firestation_log_dropped_total)",
+    is_flag=True,
+)
+@click.option(
+    "--log-json",
+    help="Log JSON lines (time, level, logger, thread, message)",
+    is_flag=True,
+)
+@click.pass_context
+def main(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    ctx,
+    config,
+    generate_config,
+    runtime,
+    io_workers,
+    watch_config,
+    profile_startup,
+    log_async,
+    log_json,
+):
+    """Run the gateway (without a command)."""
+    # options of the group used by the commands
+    ctx.ensure_object(dict)["config"] = config
+    if ctx.invoked_subcommand is not None:
+        return
+    profile = StartupProfile(profile_startup)
     if generate_config:
         # Output config example and exits
         script_path = Path(__file__)
@@ -82,41 +93,139 @@ def main(config, generate_config):
             print(f.read())
         sys.exit(0)
 
-    setup_logging()
+    setup_logging(log_async=log_async, log_json=log_json)
+    run(config, runtime, io_workers, watch_config, profile)
+
+
+def run(config, runtime, io_workers, watch_config, profile):
+    # imported after the options: --generate-config needs none of them
+    # pylint: disable=import-outside-toplevel
+    from .consumers import CONSUMERS
+    from .gateway import Gateway, load_config
+    from .producers import PRODUCERS
+    from .runtime import run_asyncio, run_threads
+
+    # pylint: enable=import-outside-toplevel
+    profile.mark("imports")
     if Path(config).is_file():
         config_dict = load_config(config)
     else:
         logging.error("config file: '%s' not exists!", config)
         sys.exit(1)
+    profile.mark("config")
 
     logging.info(
         "Start Firestation-Gateway v%s", firestation_gateway.__version__
     )
     logging.debug("Use config: %s", config)
-    emitter = EventEmitter()
+    gateway = Gateway(config_dict, config)
+    profile.mark(
+        "hardware init",
+        *(
+            (f"import {name}", seconds)
+            for registry in (PRODUCERS, CONSUMERS)
+            for name, seconds in registry.load_times.items()
+        ),
+    )
+
+    def on_started():
+        profile.mark("start")
+        # the inputs are watched, now the rest
+        if config_dict.get("metrics"):
+            # pylint: disable-next=import-outside-toplevel
+            from .metrics_server import start_server
 
-    consumers = consumer_setup(config_dict, emitter)
-    producers = producer_setup(config_dict, emitter)
+            start_server(config_dict["metrics"])
+            profile.mark("metrics")
+        profile.report()
+
+    if runtime == "asyncio":
+        run_asyncio(gateway, io_workers, watch_config, on_started)
+    else:
+        run_threads(gateway, watch_config, on_started)
 
-    # Start Threads
-    for p in producers:
-        p.start()
-    for c in consumers:
-        c.start()
 
+def _since(value: str) -> float:
+    """'30m', '2h', '7d' ago or an ISO date/time (local time)."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", value)
+    if match:
+        unit = {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+        return time.time() - float(match.group(1)) * unit
     try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        logging.info("KeyboardInt...")
-
-    # Stop Threads
-    for p in producers:
-        p.stop()
-        p.join()
-    for c in consumers:
-        c.stop()
-        c.join()
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError as e:
+        raise click.BadParameter(f"'{value}' (e.g. 2h, 3d, 2024-05-01)") from e
+
+
+def _history_path(config) -> str:
+    # pylint: disable=import-outside-toplevel
+    from .gateway import load_config
+    from .history import HistoryPolicy
+
+    # pylint: enable=import-outside-toplevel
+    cfg = load_config(config) if Path(config).is_file() else None
+    return HistoryPolicy.from_config((cfg or {}).get("history")).path
+
+
+@main.command("history")
+@click.option("--db", help="History database (default: from the config)")
+@click.option("--source", help="Source, e.g. 'eingang3'")
+@click.option("--type", "event_type", help="Event type, e.g. 'alarm'")
+@click.option("--event", help="Event name, e.g. 'eingang3_alarm'")
+@click.option("--consumer", help="Consumer name")
+@click.option("--since", help="Newer than, e.g. 2h, 3d or 2024-05-01")
+@click.option("--limit", help="Number of records", type=int, default=20)
+@click.option("--json", "as_json", help="Output JSON lines", is_flag=True)
+@click.pass_obj
+def history_command(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    obj,
+    db,
+    source,
+    event_type,
+    event,
+    consumer,
+    since,
+    limit,
+    as_json,
+):
+    """Show the last recorded events and delivery outcomes ('history:
+    path' of --config, or --db)."""
+    # pylint: disable-next=import-outside-toplevel
+    from . import history
+
+    if db is None:
+        db = _history_path(obj["config"])
+    if not Path(db).is_file():
+        raise click.ClickException(f"No history database '{db}'")
+    connection = history.connect(db)
+    try:
+        rows = history.query(
+            connection,
+            source=source,
+            event_type=event_type,
+            event=event,
+            consumer=consumer,
+            since=None if since is None else _since(since),
+            limit=limit,
+        )
+    finally:
+        connection.close()
+    for row in reversed(rows):
+        if as_json:
+            click.echo(json.dumps(dict(row)))
+            continue
+        stamp = datetime.datetime.fromtimestamp(row["time"])
+        click.echo(
+            "  ".join(
+                (
+                    stamp.isoformat(sep=" ", timespec="milliseconds"),
+                    f"{row['event']:<24}",
+                    f"{row['consumer'] or '-':<16}",
+                    f"{row['outcome'] or 'emitted':<10}",
+                    row["detail"],
+                )
+            ).rstrip()
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+import fnmatch
+import logging
+import sys
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# sink(event_name, data, event_config)
+Sink = Callable[[str, Any, Any], None]
+Route = Tuple[Tuple[Sink, Any], ...]
+
+# trace of the event being emitted by this thread, see emit_traced()
+_EMITTING = threading.local()
+
+
+def event_name(source: str, event: str) -> str:
+    """Build the (interned) event name: '<source>_<event>' in lower case."""
+    return sys.intern(f"{source}_{event}".lower())
+
+
+def is_enabled(evt_cfg) -> bool:
+    return not (isinstance(evt_cfg, dict) and evt_cfg.get("enabled") is False)
+
+
+def emit_traced(emitter, event: str, data: Any, trace) -> None:
+    """emitter.emit(event, data) with the trace of the event (monotonic
+    ns stamps of the alarm path), which is not part of the event data:
+    the sinks (running in the context of the emitter) get it by
+    current_trace()."""
+    previous = getattr(_EMITTING, "trace", None)
+    _EMITTING.trace = trace
+    try:
+        emitter.emit(event, data)
+    finally:
+        _EMITTING.trace = previous
+
+
+def current_trace() -> Optional[Dict[str, int]]:
+    """Trace of the event being emitted by this thread (None: none)."""
+    return getattr(_EMITTING, "trace", None)
+
+
+class EventBus:
+    """Event dispatcher with a precompiled routing table.
+
+    Consumers subscribe event names or patterns ('*_alarm') together with
+    their event config. The routes (event name -> tuple of (sink, config))
+    are compiled once for all known events, so emit() is a single dict
+    lookup. Unknown event names are resolved on first use and cached.
+    """
+
+    def __init__(self):
+        # (pattern, sink, event config)
+        self._subscriptions: List[Tuple[str, Sink, Any]] = []
+        self._routes: Dict[str, Route] = {}
+
+    def subscribe(self, pattern: str, sink: Sink, evt_cfg: Any = None):
+        if not is_enabled(evt_cfg):
+            LOGGER.debug("Event '%s' disabled", pattern)
+            return
+        self._subscriptions.append((pattern.lower(), sink, evt_cfg))
+        self._routes = {}
+
+    def on(self, event: str, handler: Callable[[Any], None]):
+        """pyee compatible subscription: handler(data)."""
+        self.subscribe(event, lambda _name, data, _cfg: handler(data))
+
+    def adopt(self, other: "EventBus", owners: Iterable[Any]) -> None:
+        """Copy the subscriptions of 'owners' (bound sinks) from 'other'."""
+        owners = set(owners)
+        for pattern, sink, evt_cfg in other._subscriptions:
+            if getattr(sink, "__self__", None) in owners:
+                self._subscriptions.append((pattern, sink, evt_cfg))
+        self._routes = {}
+
+    def swap(self, other: "EventBus") -> None:
+        """Replace all subscriptions and routes by those of 'other'.
+
+        emit() only reads the routing table, which is replaced by a single
+        assignment: an event is routed either the old or the new way.
+        """
+        self._subscriptions = other._subscriptions
+        self._routes = other._routes
+
+    def compile(self, event_names: Iterable[str]) -> None:
+        """Build the routing table for all known event names."""
+        routes = {}
+        for name in event_names:
+            name = sys.intern(name.lower())
+            routes[name] = self._resolve(name)
+        self._routes = routes
+        for pattern, _, _ in self._subscriptions:
+            if not any(fnmatch.fnmatchcase(n, pattern) for n in routes):
+                LOGGER.warning("No producer sends event '%s'", pattern)
+
+    def _resolve(self, name: str) -> Route:
+        # one route per sink: an exact subscription beats a pattern
+        selected: Dict[Sink, Any] = {}
+        for pattern, sink, evt_cfg in self._subscriptions:
+            if pattern == name:
+                selected[sink] = evt_cfg
+            elif fnmatch.fnmatchcase(name, pattern):
+                selected.setdefault(sink, evt_cfg)
+        return tuple(selected.items())
+
+    def routes(self, name: str) -> Route:
+        route: Optional[Route] = self._routes.get(name)
+        if route is None:
+            route = self._resolve(name.lower())
+            self._routes[sys.intern(name)] = route
+        return route
+
+    def emit(self, event: str, data: Any) -> None:
+        for sink, evt_cfg in self.routes(event):
+            # a failing sink must not keep the event from the others (or
+            # end the producer)
+            try:
+                sink(event, data, evt_cfg)
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("Event '%s': %r failed", event, sink)
@@ -0,0 +1,340 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from . import history, metrics
+from .consumers import CONSUMERS, get_consumer
+from .eventbus import EventBus, event_name
+from .gpio import simulation
+from .producers import get_producer
+
+LOGGER = logging.getLogger(__name__)
+
+# config sections which are reloaded, all others need a restart
+RELOADABLE = ["producers", "consumers"]
+
+
+def load_config(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def create_consumer(consumer_cfg, emitter) -> Optional[Any]:
+    params = consumer_cfg.get("params")
+    # worker process (params 'process': true or its settings)
+    process = params.get("process") if isinstance(params, dict) else None
+    if process is not None and process is not False:
+        if consumer_cfg["type"] not in CONSUMERS.names():
+            LOGGER.warning("Consumer '%s' not exists.", consumer_cfg["type"])
+            return None
+        # multiprocessing is only needed for isolated consumers
+        # pylint: disable-next=import-outside-toplevel
+        from .consumers.process import ProcessConsumer
+
+        return ProcessConsumer(consumer_cfg, emitter)
+    cls = get_consumer(consumer_cfg["type"])
+    if not cls:
+        LOGGER.warning("Consumer '%s' not exists.", consumer_cfg["type"])
+        return None
+    return cls(
+        name=consumer_cfg["name"],
+        emitter=emitter,
+        events_config=consumer_cfg["events"],
+        config=consumer_cfg["params"],
+    )
+
+
+def create_producer(producer_cfg, emitter) -> Optional[Any]:
+    cls = get_producer(producer_cfg["type"])
+    if not cls:
+        LOGGER.warning("Producer '%s' not exists.", producer_cfg["type"])
+        return None
+    return cls(
+        name=producer_cfg["name"],
+        emitter=emitter,
+        events_config=producer_cfg["events"],
+        config=producer_cfg["params"],
+    )
+
+
+def producer_events(config):
+    """All event names the configured producers send."""
+    return [
+        event_name(producer_cfg["name"], event)
+        for producer_cfg in config["producers"]
+        for event in producer_cfg.get("events") or {}
+    ]
+
+
+def _by_name(entries) -> Dict[str, dict]:
+    by_name = {}
+    for entry in entries or []:
+        if entry["name"] in by_name:
+            LOGGER.warning("Name '%s' used twice", entry["name"])
+        by_name[entry["name"]] = entry
+    return by_name
+
+
+class ConfigWatcher:
+    """Call 'on_change()' when the config file has been written or
+    replaced.
+
+    The directory of the file is watched by the inotify FileWatcher of
+    the simulated inputs, on_change() runs in its thread.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[], None]):
+        self.path = path
+        self.name = "config"
+        self.on_change = on_change
+        self._stamp = self._read()
+        simulation.watch_file(path, self)
+
+    @classmethod
+    def create(
+        cls, path: str, on_change: Callable[[], None]
+    ) -> Optional["ConfigWatcher"]:
+        """Watch 'path', None (logged) if inotify is not available."""
+        try:
+            return cls(path, on_change)
+        except OSError as e:
+            LOGGER.warning("Config file not watched: %s", e)
+            return None
+
+    def _read(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def set(self, active: bool) -> None:
+        """Called by the FileWatcher for each event of the file (active:
+        created, written or moved here)."""
+        if not active:
+            return
+        # several events per save, a change is reported once
+        stamp = self._read()
+        if stamp is None or stamp == self._stamp:
+            return
+        self._stamp = stamp
+        self.on_change()
+
+    def close(self) -> None:
+        simulation.unwatch_file(self.path, self)
+
+
+class Gateway:
+    """Producers and consumers of a config.
+
+    reload() compares a new config with the running one by producer and
+    consumer name: unchanged entries keep running, changed entries are
+    rebuilt. A replaced consumer passes its queued events on to its
+    successor and finishes its in-flight deliveries.
+
+    The runtime (see runtime.py) starts and stops the producers and
+    consumers: start_producer(), stop_producer(), start_consumer(),
+    stop_consumer(), retire_consumer() and refresh_inputs().
+
+    With 'history' in the config all emitted events and the delivery
+    outcomes of the consumers are recorded (see history.py).
+    """
+
+    def __init__(self, config: dict, path: Optional[str] = None):
+        self.config = config
+        self.path = path
+        self.emitter = EventBus()
+        self.runtime = None
+        self.consumers: Dict[str, Any] = {}
+        self.producers: Dict[str, Any] = {}
+        # replaced consumers finishing their deliveries
+        self._retiring: List[Any] = []
+        self._lock = threading.Lock()
+        self.history: Optional[history.HistoryRecorder] = None
+        if config.get("history"):
+            self.history = history.start(config["history"])
+            self.emitter.subscribe("*", self.history.record_event)
+
+        for name, cfg in _by_name(config["consumers"]).items():
+            consumer = create_consumer(cfg, self.emitter)
+            if consumer is not None:
+                self.consumers[name] = consumer
+        for name, cfg in _by_name(config["producers"]).items():
+            producer = create_producer(cfg, self.emitter)
+            if producer is not None:
+                self.producers[name] = producer
+        self.emitter.compile(producer_events(config))
+
+    def start(self, runtime) -> None:
+        self.runtime = runtime
+        for p in self.producers.values():
+            runtime.start_producer(p)
+        for c in self.consumers.values():
+            runtime.start_consumer(c)
+
+    def stop(self) -> None:
+        with self._lock:
+            for p in self.producers.values():
+                self.runtime.stop_producer(p)
+            for c in list(self.consumers.values()) + self._retiring:
+                self.runtime.stop_consumer(c)
+            history.stop()
+
+    def reload(self, config: Optional[dict] = None) -> bool:
+        """Apply a changed config (default: read self.path again)."""
+        with self._lock:
+            t_start = time.monotonic()
+            try:
+                if config is None:
+                    config = load_config(self.path)
+                new_consumers = _by_name(config["consumers"])
+                new_producers = _by_name(config["producers"])
+            except (OSError, yaml.YAMLError, KeyError, TypeError) as e:
+                LOGGER.error("Reload: Invalid config, nothing changed: %s", e)
+                return False
+
+            for key in set(config) | set(self.config):
+                if key in RELOADABLE:
+                    continue
+                if config.get(key) != self.config.get(key):
+                    LOGGER.warning(
+                        "Reload: '%s' changed, restart required", key
+                    )
+
+            old_consumers = _by_name(self.config["consumers"])
+            old_producers = _by_name(self.config["producers"])
+            replaced = self._reload_consumers(
+                config, old_consumers, new_consumers
+            )
+            if replaced is None:
+                return False
+            changed_producers, restored = self._reload_producers(
+                old_producers, new_producers
+            )
+            if restored:
+                # the running config of these producers stays in effect
+                config = dict(
+                    config,
+                    producers=[
+                        old_producers[cfg["name"]]
+                        if cfg["name"] in restored
+                        else cfg
+                        for cfg in config["producers"]
+                    ],
+                )
+            self.config = config
+
+            duration = time.monotonic() - t_start
+            metrics.RELOAD_DURATION.labels().observe(duration)
+            LOGGER.info(
+                "Config reloaded in %.1f ms (producers: %s; consumers: %s)",
+                duration * 1000,
+                _summary(old_producers, new_producers, changed_producers),
+                _summary(old_consumers, new_consumers, replaced),
+            )
+            return True
+
+    def _reload_consumers(self, config, old_cfgs, new_cfgs) -> Optional[set]:
+        kept = {
+            name: c
+            for name, c in self.consumers.items()
+            if old_cfgs.get(name) == new_cfgs.get(name)
+        }
+        # new consumers subscribe to a staging bus, its routing table
+        # replaces the running one at once
+        staging = EventBus()
+        owners = list(kept.values())
+        if self.history is not None:
+            owners.append(self.history)
+        staging.adopt(self.emitter, owners)
+        created = {}
+        try:
+            for name, cfg in new_cfgs.items():
+                if name not in kept:
+                    consumer = create_consumer(cfg, staging)
+                    if consumer is not None:
+                        created[name] = consumer
+            staging.compile(producer_events(config))
+        except Exception:  # pylint: disable=broad-exception-caught
+            # plugins may fail in any way, the running config is kept
+            LOGGER.exception("Reload failed, nothing changed")
+            for consumer in created.values():
+                consumer.close()
+            return None
+
+        self.emitter.swap(staging)
+        self._retiring = [c for c in self._retiring if not c.retired]
+        for name, consumer in self.consumers.items():
+            if name not in kept:
+                # queued events go to the successor (if any), before it
+                # is started
+                self.runtime.retire_consumer(consumer, created.get(name))
+                self._retiring.append(consumer)
+        for consumer in created.values():
+            consumer.emitter = self.emitter
+            self.runtime.start_consumer(consumer)
+        replaced = set(created) & set(self.consumers)
+        self.consumers = dict(kept, **created)
+        return replaced
+
+    def _reload_producers(self, old_cfgs, new_cfgs) -> Tuple[set, set]:
+        """Rebuild changed producers: (changed, restored), 'restored' ones
+        failed and run with their old config again."""
+        changed = {
+            name
+            for name in self.producers
+            if old_cfgs.get(name) != new_cfgs.get(name)
+        }
+        # release the lines first, a new producer may use the same lines
+        for name in changed:
+            producer = self.producers.pop(name)
+            self.runtime.stop_producer(producer)
+            if hasattr(producer, "close"):
+                producer.close()
+        created = []
+        restored = set()
+        for name, cfg in new_cfgs.items():
+            if name in self.producers:
+                continue
+            try:
+                producer = create_producer(cfg, self.emitter)
+            except Exception:  # pylint: disable=broad-exception-caught
+                LOGGER.exception("Reload: Producer '%s' not started", name)
+                producer = None
+            if producer is None and name in changed:
+                # keep the input monitored with the running config
+                producer = self._restore_producer(name, old_cfgs[name])
+                changed.discard(name)
+                restored.add(name)
+            if producer is not None:
+                self.producers[name] = producer
+                created.append(producer)
+        if changed or created:
+            # line requests of the remaining inputs may have been renewed
+            self.runtime.refresh_inputs(
+                [p for p in self.producers.values() if p not in created]
+            )
+        for producer in created:
+            self.runtime.start_producer(producer)
+        return changed & set(new_cfgs), restored
+
+    def _restore_producer(self, name: str, cfg: dict) -> Optional[Any]:
+        """Build a producer of the running config again (its replacement
+        failed, the old one has released its lines already)."""
+        try:
+            producer = create_producer(cfg, self.emitter)
+        except Exception:  # pylint: disable=broad-exception-caught
+            LOGGER.exception("Reload: Producer '%s' lost", name)
+            return None
+        LOGGER.warning("Reload: Producer '%s' kept its running config", name)
+        return producer
+
+
+def _summary(old_cfgs, new_cfgs, replaced) -> str:
+    added = len(set(new_cfgs) - set(old_cfgs))
+    removed = len(set(old_cfgs) - set(new_cfgs))
+    return f"{added} new, {len(replaced)} changed, {removed} removed"
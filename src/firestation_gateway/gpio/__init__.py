@@ -0,0 +1,17 @@
+from . import lines, simulation
+from .edge import EdgeMonitor, get_edge_monitor
+from .sampler import PollSampler, SampleBatch, get_poll_sampler, sample_all
+from .timerwheel import Timer, TimerWheel
+
+__all__ = [
+    "EdgeMonitor",
+    "PollSampler",
+    "SampleBatch",
+    "Timer",
+    "TimerWheel",
+    "get_edge_monitor",
+    "get_poll_sampler",
+    "lines",
+    "sample_all",
+    "simulation",
+]
@@ -0,0 +1,201 @@
+import functools
+import logging
+import math
+import os
+import select
+import threading
+import time
+from typing import Callable, Optional
+
+from .timerwheel import Timer, TimerWheel
+
+LOGGER = logging.getLogger(__name__)
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+class EdgeMonitor(threading.Thread):
+    """Wait for edge events of all registered inputs in one epoll loop.
+
+    Inputs may share a file descriptor (lines of one gpio.lines request),
+    all of them are called when it signals events.
+
+    A registered input has to provide:
+        fileno():          line file descriptor (edge events requested)
+        handle_edge(now):  called when the line signals edge events
+        next_deadline():   next time (monotonic ns) a timer is due or None
+        handle_timer(now): called when the deadline has been reached
+
+    Deadlines are kept in a TimerWheel, an input's timer is moved after
+    each call of handle_edge()/handle_timer(). The wheel is shared: other
+    components schedule callbacks with call_at() (e.g. output pulses).
+    """
+
+    def __init__(self):
+        super().__init__(name="EdgeMonitor", daemon=True)
+        self.running = True
+        # fd -> inputs, input -> fd it was registered with
+        self._inputs = {}
+        self._fds = {}
+        # refreshed inputs, read again as edges may have been missed
+        self._resample = set()
+        self._lock = threading.Lock()
+        self._wheel = TimerWheel(time.monotonic_ns())
+        # input -> its deadline timer
+        self._timers = {}
+        # end of the current epoll wait, 0 while awake
+        self._sleep_until = 0.0
+        self._epoll = select.epoll()
+        self._wakeup_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        self._epoll.register(self._wakeup_fd, select.EPOLLIN)
+
+    def register(self, inp) -> None:
+        with self._lock:
+            self._add(inp)
+        self.wakeup()
+
+    def unregister(self, inp) -> None:
+        with self._lock:
+            self._remove(inp)
+        self.wakeup()
+
+    def refresh(self, inputs) -> None:
+        """Register inputs again after their fds have been renewed.
+
+        All inputs sharing an fd have to be refreshed together.
+        """
+        with self._lock:
+            inputs = [i for i in inputs if i in self._fds]
+            for inp in inputs:
+                self._remove(inp)
+            for inp in inputs:
+                self._add(inp)
+            self._resample.update(inputs)
+        self.wakeup()
+
+    def _add(self, inp) -> None:
+        fd = inp.fileno()
+        inputs = self._inputs.setdefault(fd, [])
+        if not inputs:
+            self._epoll.register(fd, select.EPOLLIN | select.EPOLLPRI)
+        inputs.append(inp)
+        self._fds[inp] = fd
+        self._schedule(inp)
+
+    def _remove(self, inp) -> None:
+        fd = self._fds.pop(inp, None)
+        if fd is None:
+            return
+        self._wheel.cancel(self._timers.pop(inp, None))
+        inputs = self._inputs[fd]
+        inputs.remove(inp)
+        if not inputs:
+            del self._inputs[fd]
+            try:
+                self._epoll.unregister(fd)
+            except OSError:
+                # closed (or reused) by a renewed line request
+                pass
+
+    def _schedule(self, inp) -> None:
+        # called with the lock held
+        timer = self._wheel.reschedule(
+            self._timers.get(inp),
+            inp.next_deadline(),
+            functools.partial(self._handle_timer, inp),
+        )
+        if timer is None:
+            self._timers.pop(inp, None)
+        else:
+            self._timers[inp] = timer
+
+    def _handle_edge(self, inp, now: int) -> None:
+        # a failing input (or consumer behind it) must not stop the
+        # monitor thread shared by all inputs
+        try:
+            inp.handle_edge(now)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("EdgeMonitor: Edge of '%s' failed", inp.name)
+        with self._lock:
+            if inp in self._fds:
+                self._schedule(inp)
+
+    def _handle_timer(self, inp, now: int) -> None:
+        with self._lock:
+            if self._timers.get(inp) is None:
+                return
+            del self._timers[inp]
+        try:
+            inp.handle_timer(now)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("EdgeMonitor: Timer of '%s' failed", inp.name)
+        with self._lock:
+            if inp in self._fds:
+                self._schedule(inp)
+
+    def call_at(self, deadline: int, callback: Callable[[int], None]) -> Timer:
+        """Call 'callback(now)' in the monitor thread at 'deadline'
+        (monotonic ns), the returned timer can be cancelled."""
+        with self._lock:
+            timer = self._wheel.schedule(deadline, callback)
+            wake = deadline < self._sleep_until
+        if wake:
+            self.wakeup()
+        return timer
+
+    def cancel(self, timer: Optional[Timer]) -> None:
+        self._wheel.cancel(timer)
+
+    def wakeup(self) -> None:
+        """Interrupt a running epoll wait (e.g. new deadlines)."""
+        os.eventfd_write(self._wakeup_fd, 1)
+
+    def stop(self) -> None:
+        self.running = False
+        self.wakeup()
+
+    def _timeout(self) -> float:
+        with self._lock:
+            expiry = self._wheel.next_expiry()
+            self._sleep_until = math.inf if expiry is None else expiry
+        if expiry is None:
+            # nothing pending, sleep until the next edge
+            return -1
+        return max(0.0, (expiry - time.monotonic_ns()) / 1e9)
+
+    def run(self) -> None:
+        while self.running:
+            with self._lock:
+                by_fd = {fd: list(i) for fd, i in self._inputs.items()}
+                resample, self._resample = self._resample, set()
+            for inp in resample:
+                self._handle_edge(inp, time.monotonic_ns())
+
+            events = self._epoll.poll(self._timeout())
+            self._sleep_until = 0.0
+
+            now = time.monotonic_ns()
+            for fd, _ in events:
+                if fd == self._wakeup_fd:
+                    os.eventfd_read(self._wakeup_fd)
+                    continue
+                for inp in by_fd.get(fd, ()):
+                    self._handle_edge(inp, now)
+
+            for timer in self._wheel.expire(now):
+                try:
+                    timer.callback(now)
+                except Exception:  # pylint: disable=broad-except
+                    LOGGER.exception("EdgeMonitor: Timer callback failed")
+
+
+def get_edge_monitor() -> EdgeMonitor:
+    """Return the shared edge monitor (started on first use)."""
+    global _monitor  # pylint: disable=global-statement
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = EdgeMonitor()
+            _monitor.start()
+            LOGGER.debug("EdgeMonitor started")
+        return _monitor
@@ -0,0 +1,354 @@
+import collections
+import ctypes
+import fcntl
+import logging
+import os
+import platform
+import threading
+from typing import Dict, Optional, Tuple
+
+from .simulation import EdgeEvent
+
+LOGGER = logging.getLogger(__name__)
+
+try:
+    _KERNEL = tuple(int(s) for s in platform.release().split(".")[:2])
+except ValueError:
+    _KERNEL = (0, 0)
+
+# line requests with several lines need the GPIO uAPI v2 (Linux 5.10)
+SUPPORTED = _KERNEL >= (5, 10)
+
+CONSUMER = b"firestation-gw"
+
+BIAS_FLAGS = {
+    "default": 0,
+    "pull_up": 0x100,
+    "pull_down": 0x200,
+    "disable": 0x400,
+}
+
+# <linux/gpio.h>
+_LINES_MAX = 64
+_NUM_ATTRS_MAX = 10
+_GET_LINE_IOCTL = 0xC250B407
+_GET_VALUES_IOCTL = 0xC010B40E
+_SET_VALUES_IOCTL = 0xC010B40F
+_ATTR_ID_FLAGS = 1
+_ATTR_ID_OUTPUT_VALUES = 2
+_FLAG_ACTIVE_LOW = 0x2
+_FLAG_INPUT = 0x4
+_FLAG_OUTPUT = 0x8
+_FLAG_EDGE_BOTH = 0x10 | 0x20
+_EVENT_RISING = 1
+_EVENT_BUFFER = 16
+
+
+class _LineAttribute(ctypes.Structure):
+    _fields_ = [
+        ("id", ctypes.c_uint32),
+        ("padding", ctypes.c_uint32),
+        # union of flags / values / debounce_period_us
+        ("value", ctypes.c_uint64),
+    ]
+
+
+class _LineConfigAttribute(ctypes.Structure):
+    _fields_ = [("attr", _LineAttribute), ("mask", ctypes.c_uint64)]
+
+
+class _LineConfig(ctypes.Structure):
+    _fields_ = [
+        ("flags", ctypes.c_uint64),
+        ("num_attrs", ctypes.c_uint32),
+        ("padding", ctypes.c_uint32 * 5),
+        ("attrs", _LineConfigAttribute * _NUM_ATTRS_MAX),
+    ]
+
+
+class _LineRequest(ctypes.Structure):
+    _fields_ = [
+        ("offsets", ctypes.c_uint32 * _LINES_MAX),
+        ("consumer", ctypes.c_char * 32),
+        ("config", _LineConfig),
+        ("num_lines", ctypes.c_uint32),
+        ("event_buffer_size", ctypes.c_uint32),
+        ("padding", ctypes.c_uint32 * 5),
+        ("fd", ctypes.c_int32),
+    ]
+
+
+class _LineValues(ctypes.Structure):
+    _fields_ = [("bits", ctypes.c_uint64), ("mask", ctypes.c_uint64)]
+
+
+class _LineEvent(ctypes.Structure):
+    _fields_ = [
+        ("timestamp_ns", ctypes.c_uint64),
+        ("id", ctypes.c_uint32),
+        ("offset", ctypes.c_uint32),
+        ("seqno", ctypes.c_uint32),
+        ("line_seqno", ctypes.c_uint32),
+        ("padding", ctypes.c_uint32 * 6),
+    ]
+
+
+class Line:
+    """One line of a LineGroup, used like a periphery.GPIO object."""
+
+    def __init__(self, group: "LineGroup", offset: int, flags: int, value):
+        self.group = group
+        self.offset = offset
+        self.flags = flags
+        # an owner may request its line again (config reload)
+        self.owner = ""
+        self.users = 1
+        # bit of the line in the group values
+        self.index = 0
+        self.value = bool(value)
+        self._events = collections.deque()
+
+    @property
+    def fd(self) -> int:
+        return self.group.fd
+
+    def read(self) -> bool:
+        bits = self.group.snapshot
+        if bits is None:
+            bits = self.group.get_values()
+        return bool(bits >> self.index & 1)
+
+    def write(self, value: bool) -> None:
+        self.group.set_values({self: value})
+
+    def poll(self, timeout=0) -> bool:
+        _ = timeout
+        if not self._events:
+            self.group.pump()
+        return bool(self._events)
+
+    def read_event(self) -> EdgeEvent:
+        return self._events.popleft()
+
+    def close(self) -> None:
+        self.group.remove(self)
+
+
+class LineGroup:
+    """All lines of one kind on a chip in a single kernel line request.
+
+    Kinds: "edge" (inputs with edge events), "poll" and "out".
+
+    Inputs are read (and outputs set) with one ioctl for all lines. The
+    edge events of all lines arrive on the shared fd, pump() sorts them
+    into the event queues of the lines. Adding or removing a line renews
+    the request, so the fd changes: whoever waits on the fd has to
+    register it again (see EdgeMonitor.refresh).
+    """
+
+    def __init__(self, path: str, kind: str):
+        self.path = path
+        self.kind = kind
+        self.fd = -1
+        # values of all lines frozen for a sampling pass (None: read)
+        self.snapshot: Optional[int] = None
+        # incremented when the lines get new indexes (renewed request)
+        self.generation = 0
+        self._lines: Dict[int, Line] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._lines)
+
+    def add(self, line: Line) -> Line:
+        """Add the line to the request, return the line to use."""
+        with self._lock:
+            current = self._lines.get(line.offset)
+            if current is not None:
+                if not (
+                    line.owner
+                    and line.owner == current.owner
+                    and line.flags == current.flags
+                ):
+                    raise ValueError(
+                        f"line: {self.path} line {line.offset} used twice"
+                    )
+                # same owner again: share the line (keeps its value)
+                current.users += 1
+                return current
+            self._lines[line.offset] = line
+            try:
+                self._request()
+            except (OSError, ValueError):
+                # restore the request of the other lines
+                del self._lines[line.offset]
+                if self._lines:
+                    self._request()
+                raise
+        return line
+
+    def remove(self, line: Line) -> None:
+        with self._lock:
+            line.users -= 1
+            if line.users > 0:
+                return
+            if self._lines.pop(line.offset, None) is None:
+                return
+            if self._lines:
+                self._request()
+            else:
+                self._release()
+
+    def _config(self) -> _LineConfig:
+        # the most common flags are the default, all others go to attrs
+        by_flags: Dict[int, int] = collections.defaultdict(int)
+        values = 0
+        for line in self._lines.values():
+            by_flags[line.flags] |= 1 << line.index
+            values |= int(line.value) << line.index
+        flags = sorted(by_flags, key=lambda f: -by_flags[f].bit_count())
+        attrs = [(_ATTR_ID_FLAGS, f, by_flags[f]) for f in flags[1:]]
+        if self.kind == "out":
+            mask = (1 << len(self)) - 1
+            attrs.append((_ATTR_ID_OUTPUT_VALUES, values, mask))
+        if len(attrs) > _NUM_ATTRS_MAX:
+            raise ValueError(
+                f"{self.path}: Too many different line settings ({self.kind})"
+            )
+        config = _LineConfig(flags=flags[0], num_attrs=len(attrs))
+        for i, (attr_id, value, mask) in enumerate(attrs):
+            config.attrs[i].attr.id = attr_id
+            config.attrs[i].attr.value = value
+            config.attrs[i].mask = mask
+        return config
+
+    def _request(self) -> None:
+        if len(self) > _LINES_MAX:
+            raise ValueError(f"{self.path}: More than {_LINES_MAX} lines")
+        req = _LineRequest(consumer=CONSUMER, num_lines=len(self))
+        for i, line in enumerate(self._lines.values()):
+            line.index = i
+            req.offsets[i] = line.offset
+        self.generation += 1
+        req.config = self._config()
+        if self.kind == "edge":
+            req.event_buffer_size = _EVENT_BUFFER * len(self)
+
+        # the old request has to be released before the lines are free
+        self._release()
+        chip_fd = os.open(self.path, os.O_RDWR | os.O_CLOEXEC)
+        try:
+            fcntl.ioctl(chip_fd, _GET_LINE_IOCTL, req)
+        finally:
+            os.close(chip_fd)
+        self.fd = req.fd
+        if self.kind == "edge":
+            os.set_blocking(self.fd, False)
+        LOGGER.debug(
+            "%s: %s lines %s requested",
+            self.path,
+            self.kind,
+            list(self._lines),
+        )
+
+    def _release(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def get_values(self) -> int:
+        """Read all lines, bit n is the line with index n."""
+        with self._lock:
+            values = _LineValues(mask=(1 << len(self)) - 1)
+            fcntl.ioctl(self.fd, _GET_VALUES_IOCTL, values)
+        return values.bits  # pylint: disable=no-member
+
+    def set_values(self, values: Dict[Line, bool]) -> None:
+        """Set several output lines at once."""
+        with self._lock:
+            mask = bits = 0
+            for line, value in values.items():
+                line.value = bool(value)
+                mask |= 1 << line.index
+                bits |= int(line.value) << line.index
+            req = _LineValues(bits=bits, mask=mask)
+            fcntl.ioctl(self.fd, _SET_VALUES_IOCTL, req)
+
+    def freeze(self) -> None:
+        """Read all lines once, Line.read() returns these values."""
+        self.snapshot = self.get_values()
+
+    def thaw(self) -> None:
+        self.snapshot = None
+
+    def pump(self) -> None:
+        """Move pending edge events to the event queues of the lines."""
+        size = ctypes.sizeof(_LineEvent)
+        with self._lock:
+            while self.fd >= 0:
+                try:
+                    buf = os.read(self.fd, size * _EVENT_BUFFER)
+                except BlockingIOError:
+                    return
+                for pos in range(0, len(buf) - size + 1, size):
+                    event = _LineEvent.from_buffer_copy(buf, pos)
+                    line = self._lines.get(event.offset)
+                    if line is None:
+                        continue
+                    edge = "falling"
+                    if event.id == _EVENT_RISING:
+                        edge = "rising"
+                    # pylint: disable-next=protected-access
+                    line._events.append(EdgeEvent(edge, event.timestamp_ns))
+                if len(buf) < size * _EVENT_BUFFER:
+                    return
+
+
+_groups: Dict[Tuple[str, str], LineGroup] = {}
+_groups_lock = threading.Lock()
+
+
+def _group(path: str, kind: str) -> LineGroup:
+    with _groups_lock:
+        group = _groups.get((path, kind))
+        if group is None:
+            group = _groups[(path, kind)] = LineGroup(path, kind)
+        return group
+
+
+def request_input(
+    path: str,
+    offset: int,
+    sampling: str = "edge",
+    active_low: bool = False,
+    bias: str = "default",
+) -> Line:
+    """Add an input to the shared request of its chip ('edge' or 'poll')."""
+    if sampling not in ["edge", "poll"]:
+        raise ValueError("sampling: Invalid value. Use 'edge' or 'poll'")
+    if bias not in BIAS_FLAGS:
+        raise ValueError(
+            "bias: Invalid value. "
+            "Use 'pull_up', 'pull_down', 'disable' or 'default'"
+        )
+    flags = _FLAG_INPUT | BIAS_FLAGS[bias]
+    if active_low:
+        flags |= _FLAG_ACTIVE_LOW
+    if sampling == "edge":
+        flags |= _FLAG_EDGE_BOTH
+    group = _group(path, sampling)
+    return group.add(Line(group, offset, flags, False))
+
+
+def request_output(
+    path: str, offset: int, value: bool = False, owner: str = ""
+) -> Line:
+    """Add an output (set to 'value') to the shared request of its chip.
+
+    If 'owner' holds the line already (e.g. the consumer is replaced on
+    a config reload), the line is shared and keeps its current value.
+    """
+    group = _group(path, "out")
+    line = Line(group, offset, _FLAG_OUTPUT, value)
+    line.owner = owner
+    return group.add(line)
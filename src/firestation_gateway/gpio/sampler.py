@@ -0,0 +1,252 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .timerwheel import TimerWheel
+
+LOGGER = logging.getLogger(__name__)
+
+_samplers = {}
+_samplers_lock = threading.Lock()
+
+
+def sample_all(inputs) -> None:
+    """Sample all inputs at the same instant.
+
+    Inputs on a shared line request (gpio.lines) are read with a single
+    ioctl per request, the inputs see the frozen values.
+    """
+    groups = set()
+    for inp in inputs:
+        group = getattr(inp.pin_in, "group", None)
+        if group is not None:
+            groups.add(group)
+    for group in groups:
+        group.freeze()
+    now = time.monotonic_ns()
+    try:
+        for inp in inputs:
+            inp.sample(now)
+    finally:
+        for group in groups:
+            group.thaw()
+
+
+class _Group:
+    """Inputs of one LineGroup and the values read last."""
+
+    def __init__(self):
+        self.inputs: List = []
+        # bit in the group values -> inputs of the line
+        self.bits: Dict[int, List] = {}
+        self.values = 0
+        # LineGroup.generation the bits are valid for, -1: rebuild
+        self.generation = -1
+
+    def rebuild(self, generation: int) -> None:
+        self.bits = {}
+        for inp in self.inputs:
+            self.bits.setdefault(1 << inp.pin_in.index, []).append(inp)
+        self.generation = generation
+
+
+class SampleBatch:
+    """Sample many inputs, work only on the lines that changed.
+
+    The lines of a LineGroup are read with one ioctl, the values are
+    compared with the previous read and only the inputs of changed lines
+    get update(). Deadlines of the inputs are kept in a TimerWheel,
+    handle_timer() is called for the due inputs only. So a pass over 64
+    quiet lines costs one ioctl per line request. Inputs without a line
+    group (periphery, simulated 'stat' inputs) are sampled every time.
+
+    A registered input has to provide:
+        pin_in:            line object (gpio.lines.Line, periphery.GPIO
+                           or None)
+        sample(now):       read the input and update the state machine
+        update(active, now): set the value and update the state machine
+        next_deadline():   next time (monotonic ns) a timer is due or None
+        handle_timer(now): called when the deadline has been reached
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inputs: Dict = {}
+        self._groups: Dict = {}
+        self._others: List = []
+        self._wheel = TimerWheel(time.monotonic_ns())
+        self._timers: Dict = {}
+
+    def __len__(self) -> int:
+        return len(self._inputs)
+
+    def __contains__(self, inp) -> bool:
+        return inp in self._inputs
+
+    def inputs(self) -> List:
+        with self._lock:
+            return list(self._inputs)
+
+    def register(self, inp) -> None:
+        with self._lock:
+            group = getattr(inp.pin_in, "group", None)
+            self._inputs[inp] = group
+            if group is None:
+                self._others.append(inp)
+                return
+            state = self._groups.setdefault(group, _Group())
+            state.inputs.append(inp)
+            # all inputs of the group get the current values
+            state.generation = -1
+
+    def unregister(self, inp) -> None:
+        with self._lock:
+            if inp not in self._inputs:
+                return
+            group = self._inputs.pop(inp)
+            self._wheel.cancel(self._timers.pop(inp, None))
+            if group is None:
+                self._others.remove(inp)
+                return
+            state = self._groups[group]
+            state.inputs.remove(inp)
+            state.generation = -1
+            if not state.inputs:
+                del self._groups[group]
+
+    def sample(self, now: Optional[int] = None) -> None:
+        """One sampling pass.
+
+        A failing input is logged and skipped, the value of its line is
+        kept as unseen and passed to update() again on the next pass.
+        """
+        with self._lock:
+            if now is None:
+                now = time.monotonic_ns()
+            touched = []
+            for group, state in self._groups.items():
+                touched += self._sample_group(group, state, now)
+            for inp in self._others:
+                try:
+                    inp.sample(now)
+                except Exception:  # pylint: disable=broad-except
+                    LOGGER.exception(
+                        "PollSampler: Sampling '%s' failed", inp.name
+                    )
+                touched.append(inp)
+            for timer in self._wheel.expire(now):
+                inp = timer.callback
+                if self._timers.get(inp) is timer:
+                    del self._timers[inp]
+                    try:
+                        inp.handle_timer(now)
+                    except Exception:  # pylint: disable=broad-except
+                        LOGGER.exception(
+                            "PollSampler: Timer of '%s' failed", inp.name
+                        )
+                    touched.append(inp)
+            for inp in touched:
+                self._schedule(inp)
+
+    def _sample_group(self, group, state: _Group, now: int) -> List:
+        """Update the inputs of the changed lines, returns them."""
+        generation = group.generation
+        try:
+            values = group.get_values()
+        except OSError as e:
+            if generation != group.generation:
+                # fd closed by a renewed request, read again
+                LOGGER.debug("PollSampler: %s", e)
+            else:
+                LOGGER.exception("PollSampler: Reading %s failed", group.path)
+            return []
+        if generation != group.generation:
+            # renewed meanwhile, indexes unknown: next pass
+            return []
+        if state.generation != generation:
+            state.rebuild(generation)
+            # all lines differ from the saved values
+            state.values = ~values & ((1 << len(group)) - 1)
+        touched = []
+        diff = values ^ state.values
+        while diff:
+            bit = diff & -diff
+            diff ^= bit
+            inputs = state.bits.get(bit, ())
+            updated = [
+                self._update(inp, bool(values & bit), now) for inp in inputs
+            ]
+            # saved only when all inputs of the line have it
+            if all(updated):
+                state.values ^= bit
+            touched.extend(inputs)
+        return touched
+
+    @staticmethod
+    def _update(inp, active: bool, now: int) -> bool:
+        # a failing input (or consumer behind it) must not stop the
+        # sampling of the other inputs
+        try:
+            inp.update(active, now)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("PollSampler: Update of '%s' failed", inp.name)
+            return False
+        return True
+
+    def _schedule(self, inp) -> None:
+        timer = self._wheel.reschedule(
+            self._timers.get(inp), inp.next_deadline(), inp
+        )
+        if timer is None:
+            self._timers.pop(inp, None)
+        else:
+            self._timers[inp] = timer
+
+
+class PollSampler(threading.Thread):
+    """Sample all registered inputs every 'interval' seconds.
+
+    The inputs are kept in a SampleBatch (see there for the interface).
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name=f"PollSampler-{interval}", daemon=True)
+        self.interval = interval
+        self.batch = SampleBatch()
+        self._stop_event = threading.Event()
+
+    def register(self, inp) -> None:
+        self.batch.register(inp)
+
+    def unregister(self, inp) -> None:
+        self.batch.unregister(inp)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            t_start = time.monotonic()
+            try:
+                self.batch.sample()
+            except Exception:  # pylint: disable=broad-except
+                # the thread is shared by all polled inputs
+                LOGGER.exception("PollSampler: Sampling failed")
+
+            # wait until next sampling point
+            elapsed = time.monotonic() - t_start
+            sleep_time = self.interval - elapsed
+            if sleep_time > 0:
+                self._stop_event.wait(sleep_time)
+
+
+def get_poll_sampler(interval: float) -> PollSampler:
+    """Return the shared sampler for 'interval' (started on first use)."""
+    with _samplers_lock:
+        sampler = _samplers.get(interval)
+        if sampler is None:
+            sampler = _samplers[interval] = PollSampler(interval)
+            sampler.start()
+            LOGGER.debug("PollSampler %ss started", interval)
+        return sampler
@@ -0,0 +1,184 @@
+import collections
+import ctypes
+import logging
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+LOGGER = logging.getLogger(__name__)
+
+SIMULATION_MODES = ["inotify", "memory", "stat"]
+
+EdgeEvent = collections.namedtuple("EdgeEvent", ["edge", "timestamp"])
+
+# inotify(7)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_CLOEXEC = 0o2000000
+_IN_ACTIVE = _IN_CREATE | _IN_MOVED_TO | _IN_CLOSE_WRITE
+_IN_INACTIVE = _IN_DELETE | _IN_MOVED_FROM
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+_lines = {}
+_lock = threading.Lock()
+_watcher = None
+
+
+class SimulatedLine:
+    """In-memory input line with the edge interface of periphery.GPIO.
+
+    Level changes are queued as edge events and signalled on an eventfd,
+    so the line can be waited on like a GPIO line (EdgeMonitor, asyncio).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._level = False
+        self._events = collections.deque()
+        self._fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+
+    @property
+    def fd(self) -> int:
+        return self._fd
+
+    def read(self) -> bool:
+        return self._level
+
+    def set(self, active: bool) -> None:
+        active = bool(active)
+        if active == self._level:
+            return
+        self._level = active
+        self._events.append(
+            EdgeEvent("rising" if active else "falling", time.monotonic_ns())
+        )
+        os.eventfd_write(self._fd, 1)
+
+    def poll(self, timeout=0) -> bool:
+        _ = timeout
+        return bool(self._events)
+
+    def read_event(self) -> EdgeEvent:
+        event = self._events.popleft()
+        if not self._events:
+            try:
+                os.eventfd_read(self._fd)
+            except BlockingIOError:
+                pass
+            # an edge added meanwhile must stay signalled
+            if self._events:
+                os.eventfd_write(self._fd, 1)
+        return event
+
+
+def get_line(name: str) -> SimulatedLine:
+    """Return the simulated line 'name' (created on first use)."""
+    with _lock:
+        line = _lines.get(name.lower())
+        if line is None:
+            line = _lines[name.lower()] = SimulatedLine(name.lower())
+        return line
+
+
+def set_line(name: str, active: bool) -> None:
+    """Drive a simulated input (e.g. from tests or benchmarks)."""
+    get_line(name).set(active)
+
+
+class FileWatcher(threading.Thread):
+    """Set simulated lines when their trigger file appears/disappears.
+
+    A line may be any object with 'name' and set(active), which is called
+    for every event of the file (e.g. gateway.ConfigWatcher).
+    """
+
+    def __init__(self):
+        super().__init__(name="SimulationWatcher", daemon=True)
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, "inotify_init1: " + os.strerror(err))
+        # watch descriptor -> {file name: line}
+        self._watches = {}
+        # watched directory -> watch descriptor
+        self._dirs = {}
+
+    def watch(self, path: str, line: SimulatedLine) -> None:
+        path = Path(path)
+        wd = self._libc.inotify_add_watch(
+            self._fd,
+            os.fsencode(path.parent),
+            _IN_ACTIVE | _IN_INACTIVE,
+        )
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch '{path.parent}'")
+        self._dirs[path.parent] = wd
+        self._watches.setdefault(wd, {})[os.fsencode(path.name)] = line
+        LOGGER.debug("Simulation: %s -> line '%s'", path, line.name)
+        line.set(path.is_file())
+
+    def unwatch(self, path: str, line: SimulatedLine) -> None:
+        """Stop driving 'line' by 'path', the directory is not watched
+        anymore when no file of it is left."""
+        path = Path(path)
+        wd = self._dirs.get(path.parent)
+        files = self._watches.get(wd, {})
+        name = os.fsencode(path.name)
+        if files.get(name) is not line:
+            return
+        del files[name]
+        if files:
+            return
+        del self._watches[wd]
+        del self._dirs[path.parent]
+        if self._libc.inotify_rm_watch(self._fd, wd) < 0:
+            err = ctypes.get_errno()
+            LOGGER.warning(
+                "Simulation: inotify_rm_watch '%s': %s",
+                path.parent,
+                os.strerror(err),
+            )
+
+    def run(self) -> None:
+        while True:
+            buf = os.read(self._fd, 4096)
+            pos = 0
+            while pos + _INOTIFY_EVENT.size <= len(buf):
+                wd, mask, _, length = _INOTIFY_EVENT.unpack_from(buf, pos)
+                pos += _INOTIFY_EVENT.size
+                name = buf[pos : pos + length].rstrip(b"\0")
+                pos += length
+                line = self._watches.get(wd, {}).get(name)
+                if line is None:
+                    continue
+                try:
+                    if mask & _IN_ACTIVE:
+                        line.set(True)
+                    elif mask & _IN_INACTIVE:
+                        line.set(False)
+                except Exception:  # pylint: disable=broad-except
+                    LOGGER.exception("Simulation: '%s' failed", line.name)
+
+
+def watch_file(path: str, line: SimulatedLine) -> None:
+    """Drive 'line' by the existence of the file 'path' (inotify)."""
+    global _watcher  # pylint: disable=global-statement
+    with _lock:
+        if _watcher is None:
+            _watcher = FileWatcher()
+            _watcher.start()
+        _watcher.watch(path, line)
+
+
+def unwatch_file(path: str, line: SimulatedLine) -> None:
+    """Undo watch_file()."""
+    with _lock:
+        if _watcher is not None:
+            _watcher.unwatch(path, line)
@@ -0,0 +1,197 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 1 ms ticks, 4 levels of 256 slots: timers up to ~49 days ahead
+RESOLUTION = 1_000_000
+BITS = 8
+LEVELS = 4
+
+
+class Timer:
+    """Handle of a scheduled callback (see TimerWheel.schedule())."""
+
+    __slots__ = ("_index", "_level", "callback", "deadline", "tick")
+
+    def __init__(self, deadline: int, callback: Callable[..., Any], tick):
+        self.deadline = deadline
+        self.callback = callback
+        self.tick = tick
+        # position in the wheel, level None: not scheduled (fired/cancelled)
+        self._level: Optional[int] = None
+        self._index = 0
+
+
+class TimerWheel:
+    """Hierarchical timer wheel, O(1) schedule and cancel.
+
+    Deadlines (monotonic ns) are rounded up to ticks of 'resolution' ns.
+    A timer is kept on the level of the highest tick digit (BITS bits per
+    level) in which it differs from the current tick. When the wheel
+    reaches the start of a slot on a higher level, its timers move down
+    (cascade) until they expire on level 0. A bitmap per level finds the
+    next non-empty slot, so next_expiry() does not scan the slots and an
+    idle wheel is not ticked.
+
+    The owner calls next_expiry() to know how long it may sleep and
+    expire(now) to get the due timers. Thread safe, callbacks are run by
+    the owner.
+    """
+
+    def __init__(
+        self,
+        now: int,
+        resolution: int = RESOLUTION,
+        bits: int = BITS,
+        levels: int = LEVELS,
+    ):
+        self.resolution = resolution
+        self.bits = bits
+        self.levels = levels
+        self._mask = (1 << bits) - 1
+        # all timers up to this tick have expired
+        self._tick = now // resolution
+        self._slots: List[List[Dict[Timer, None]]] = [
+            [{} for _ in range(1 << bits)] for _ in range(levels)
+        ]
+        self._bitmaps = [0] * levels
+        # beyond the top level, placed again at each top level wrap
+        self._overflow: Dict[Timer, None] = {}
+        # scheduled in the past, expire at once
+        self._due: Dict[Timer, None] = {}
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def schedule(self, deadline: int, callback: Callable[..., Any]) -> Timer:
+        """Call 'callback' at 'deadline' (monotonic ns)."""
+        timer = Timer(deadline, callback, -(-deadline // self.resolution))
+        with self._lock:
+            self._place(timer)
+            self._count += 1
+        return timer
+
+    def cancel(self, timer: Optional[Timer]) -> None:
+        """Remove a timer (no-op if it has fired or was cancelled)."""
+        if timer is None:
+            return
+        with self._lock:
+            level = timer._level  # pylint: disable=protected-access
+            if level is None:
+                return
+            if level == -1:
+                del self._due[timer]
+            elif level == self.levels:
+                del self._overflow[timer]
+            else:
+                index = timer._index  # pylint: disable=protected-access
+                slot = self._slots[level][index]
+                del slot[timer]
+                if not slot:
+                    self._bitmaps[level] &= ~(1 << index)
+            timer._level = None  # pylint: disable=protected-access
+            self._count -= 1
+
+    def reschedule(
+        self,
+        timer: Optional[Timer],
+        deadline: Optional[int],
+        callback: Callable[..., Any],
+    ) -> Optional[Timer]:
+        """Move 'timer' to 'deadline' (None: cancel), returns the timer
+        now scheduled. Unchanged deadlines keep the timer."""
+        # pylint: disable-next=protected-access
+        if (
+            timer is not None
+            and timer._level is not None
+            and timer.deadline == deadline
+        ):
+            return timer
+        self.cancel(timer)
+        if deadline is None:
+            return None
+        return self.schedule(deadline, callback)
+
+    def _place(self, timer: Timer) -> None:
+        # pylint: disable=protected-access
+        if timer.tick <= self._tick:
+            timer._level = -1
+            self._due[timer] = None
+            return
+        level = ((timer.tick ^ self._tick).bit_length() - 1) // self.bits
+        if level >= self.levels:
+            timer._level = self.levels
+            self._overflow[timer] = None
+            return
+        index = (timer.tick >> (self.bits * level)) & self._mask
+        timer._level = level
+        timer._index = index
+        self._slots[level][index][timer] = None
+        self._bitmaps[level] |= 1 << index
+
+    def _next_event(self) -> Optional[Tuple[int, int, int]]:
+        """(tick, level, index) of the next slot to expire or cascade,
+        level == self.levels: place the overflow timers again."""
+        best = None
+        best_tick = -1
+        for level, bitmap in enumerate(self._bitmaps):
+            if not bitmap:
+                continue
+            index = (bitmap & -bitmap).bit_length() - 1
+            shift = self.bits * level
+            upper = self._tick >> (shift + self.bits) << (shift + self.bits)
+            tick = upper | (index << shift)
+            if best is None or tick < best_tick:
+                best = (tick, level, index)
+                best_tick = tick
+        if best is None and self._overflow:
+            shift = self.bits * self.levels
+            best = (((self._tick >> shift) + 1) << shift, self.levels, 0)
+        return best
+
+    def next_expiry(self) -> Optional[int]:
+        """Time (monotonic ns) the owner has to call expire() next, None if
+        no timer is scheduled."""
+        with self._lock:
+            if self._due:
+                return 0
+            event = self._next_event()
+        if event is None:
+            return None
+        return event[0] * self.resolution
+
+    def expire(self, now: int) -> List[Timer]:
+        """Advance to 'now', returns the due timers (oldest first)."""
+        target = now // self.resolution
+        with self._lock:
+            due = list(self._due)
+            self._due.clear()
+            while True:
+                event = self._next_event()
+                if event is None or event[0] > target:
+                    break
+                tick, level, index = event
+                self._tick = tick
+                if level == self.levels:
+                    shift = self.bits * self.levels
+                    timers = [
+                        t
+                        for t in self._overflow
+                        if t.tick >> shift << shift == tick
+                    ]
+                    for timer in timers:
+                        del self._overflow[timer]
+                else:
+                    timers = self._slots[level][index]
+                    self._slots[level][index] = {}
+                    self._bitmaps[level] &= ~(1 << index)
+                for timer in timers:
+                    self._place(timer)
+                due.extend(self._due)
+                self._due.clear()
+            self._tick = max(self._tick, target)
+            for timer in due:
+                timer._level = None  # pylint: disable=protected-access
+            self._count -= len(due)
+        return due
@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from firestation_gateway import metrics
+from firestation_gateway.consumers.retry import policy_from_config
+
+LOGGER = logging.getLogger(__name__)
+
+# consumer name -> probers, the last one reports (old ones: config reload)
+_probers: Dict[str, List["HealthProber"]] = {}
+_probers_lock = threading.Lock()
+
+
+@dataclass
+class HealthPolicy:
+    """
+    Connectivity check settings of a consumer (params 'health').
+
+    Attributes:
+        interval (float):    Seconds between checks while the server is
+                             reachable (0 = no checks).
+        timeout (float):     Timeout of a single check in seconds.
+        backoff (float):     Delay after the first failed check in seconds.
+        backoff_max (float): Upper limit of the (doubling) delay.
+    """
+
+    interval: float = 60.0
+    timeout: float = 10.0
+    backoff: float = 5.0
+    backoff_max: float = 300.0
+
+    def __post_init__(self):
+        if self.interval < 0:
+            raise ValueError("health: 'interval' must be >= 0")
+        if self.timeout <= 0:
+            raise ValueError("health: 'timeout' must be > 0")
+        if self.backoff <= 0 or self.backoff_max < self.backoff:
+            raise ValueError(
+                "health: 'backoff' must be > 0 and <= 'backoff_max'"
+            )
+
+    @classmethod
+    def from_config(cls, config) -> "HealthPolicy":
+        return policy_from_config(cls, config, "health")
+
+    def delay(self, failures: int) -> float:
+        """Delay after 'failures' failed checks in a row."""
+        return min(self.backoff_max, self.backoff * 2 ** (failures - 1))
+
+
+@dataclass(frozen=True)
+class HealthStatus:
+    """Result of the last connectivity check.
+
+    Attributes:
+        up (bool):         Server reachable (None: not checked yet).
+        latency (float):   Duration of the last successful check (s).
+        checked (float):   Time of the last check (time.time()).
+        error (str):       Error of the last failed check.
+        failures (int):    Failed checks in a row.
+    """
+
+    up: Optional[bool] = None
+    latency: Optional[float] = None
+    checked: Optional[float] = None
+    error: str = ""
+    failures: int = 0
+
+
+class HealthProber(threading.Thread):
+    """Check the connection to a server in the background.
+
+    probe(timeout=...) is called every 'interval' seconds and raises if
+    the server is not reachable. Failed checks are repeated with a
+    doubling delay. The last status is kept in 'status' (see get_status())
+    and exported as metrics, nobody waits for a check.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        probe: Callable[..., Any],
+        policy: Optional[HealthPolicy] = None,
+    ):
+        super().__init__(name=f"Health-{target}", daemon=True)
+        self.target = target
+        self.probe = probe
+        self.policy = policy or HealthPolicy()
+        self.status = HealthStatus()
+        self._stop_event = threading.Event()
+        self._checks = {
+            result: metrics.HEALTH_CHECKS.labels(target, result)
+            for result in ("ok", "failed")
+        }
+
+    def start(self) -> None:
+        with _probers_lock:
+            _probers.setdefault(self.target, []).append(self)
+            self._export()
+        super().start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        with _probers_lock:
+            probers = _probers.get(self.target, [])
+            if self not in probers:
+                return
+            probers.remove(self)
+            if probers:
+                probers[-1]._export()  # pylint: disable=protected-access
+                return
+            del _probers[self.target]
+            metrics.HEALTH_UP.remove(self.target)
+            metrics.HEALTH_LATENCY.remove(self.target)
+
+    def _export(self) -> None:
+        metrics.HEALTH_UP.set_function(
+            lambda: int(self.status.up), self.target
+        )
+        metrics.HEALTH_LATENCY.set_function(
+            lambda: float(self.status.latency), self.target
+        )
+
+    def run(self) -> None:
+        delay = 0.0
+        while not self._stop_event.wait(delay):
+            try:
+                status = self.check()
+            except Exception:  # pylint: disable=broad-except
+                # e.g. the metrics, the checks go on
+                LOGGER.exception("%s: Check failed", self.target)
+                status = self.status
+            if status.up:
+                delay = self.policy.interval
+            else:
+                delay = self.policy.delay(status.failures)
+
+    def check(self) -> HealthStatus:
+        t_start = time.monotonic()
+        try:
+            self.probe(timeout=self.policy.timeout)
+        except Exception as e:  # pylint: disable=broad-except
+            # connection, timeout, HTTP status (the requests exceptions
+            # are OSError), an invalid answer or a bug of the probe: down
+            status = HealthStatus(
+                up=False,
+                latency=self.status.latency,
+                checked=time.time(),
+                error=str(e),
+                failures=self.status.failures + 1,
+            )
+            self._checks["failed"].inc()
+            if not isinstance(e, (OSError, ValueError)):
+                LOGGER.exception("%s: Check failed", self.target)
+            elif self.status.up is not False:
+                LOGGER.warning("%s: Server not reachable (%s)", self.target, e)
+        else:
+            status = HealthStatus(
+                up=True,
+                latency=time.monotonic() - t_start,
+                checked=time.time(),
+            )
+            self._checks["ok"].inc()
+            if self.status.up is not True:
+                LOGGER.info(
+                    "%s: Server reachable (%.0f ms)",
+                    self.target,
+                    status.latency * 1000,
+                )
+        self.status = status
+        return status
+
+
+def get_status(target: str) -> Optional[HealthStatus]:
+    """Last status of the server of consumer 'target' (None: no checks)."""
+    with _probers_lock:
+        probers = _probers.get(target)
+        return probers[-1].status if probers else None
@@ -0,0 +1,279 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from firestation_gateway import metrics
+from firestation_gateway.consumers.retry import policy_from_config
+
+LOGGER = logging.getLogger(__name__)
+
+HISTORY_PATH = "/var/lib/firestation-gw/history.db"
+
+# row: time, kind, source, type, event, consumer, outcome, detail
+Row = Tuple[
+    float, str, Optional[str], str, str, Optional[str], Optional[str], str
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT,
+    type TEXT NOT NULL,
+    event TEXT NOT NULL,
+    consumer TEXT,
+    outcome TEXT,
+    detail TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS history_source ON history (source, type, time);
+CREATE INDEX IF NOT EXISTS history_type ON history (type, time);
+CREATE INDEX IF NOT EXISTS history_time ON history (time);
+"""
+_INSERT = (
+    "INSERT INTO history"
+    " (time, kind, source, type, event, consumer, outcome, detail)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+_recorder: Optional["HistoryRecorder"] = None
+
+
+@dataclass
+class HistoryPolicy:
+    """
+    Event history (config 'history').
+
+    Attributes:
+        path (str):             SQLite database file.
+        ring_size (int):        Records kept in memory until the next
+                                flush, a full ring drops the oldest.
+        flush_interval (float): Write the records every ... seconds.
+        retention (float):      Delete records older than ... days.
+    """
+
+    path: str = HISTORY_PATH
+    ring_size: int = 10000
+    flush_interval: float = 1.0
+    retention: float = 30.0
+
+    def __post_init__(self):
+        if self.ring_size < 1:
+            raise ValueError("history: 'ring_size' must be > 0")
+        if self.flush_interval <= 0:
+            raise ValueError("history: 'flush_interval' must be > 0")
+        if self.retention <= 0:
+            raise ValueError("history: 'retention' must be > 0")
+
+    @classmethod
+    def from_config(cls, config) -> "HistoryPolicy":
+        return policy_from_config(cls, config, "history")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open (and create) the history database."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+    # readers (history command, worker processes) do not block the writer
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(_SCHEMA)
+    return db
+
+
+def _source(data: Any) -> Optional[str]:
+    if isinstance(data, dict) and isinstance(data.get("source"), str):
+        return data["source"].lower()
+    return None
+
+
+class HistoryRecorder:
+    """Record emitted events and delivery outcomes in an SQLite store.
+
+    record_*() only append to a bounded in-memory ring, a writer thread
+    inserts the records in one transaction every 'flush_interval' and
+    deletes records older than the retention. So recording never waits
+    for the disk: if the writer falls behind, the oldest records are
+    dropped (firestation_history_dropped_total).
+    """
+
+    # delete old records at most this often (seconds)
+    PRUNE_INTERVAL = 600.0
+
+    def __init__(self, policy: HistoryPolicy, prune: bool = True):
+        self.policy = policy
+        self.prune = prune
+        self._ring: Deque[Row] = deque(maxlen=policy.ring_size)
+        self._dropped = metrics.HISTORY_DROPPED.labels()
+        self._stop = threading.Event()
+        self._db = connect(policy.path)
+        self._last_prune = 0.0
+        self._thread = threading.Thread(
+            target=self._run, name="History", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        """Write the pending records and stop."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._db.close()
+
+    def _append(self, row: Row) -> None:
+        # deque.append is atomic, maxlen drops the oldest record
+        if len(self._ring) == self._ring.maxlen:
+            self._dropped.inc()
+        self._ring.append(row)
+
+    # this function runs in the context of the emitter
+    def record_event(self, event_name: str, data: Any, evt_cfg: Any = None):
+        _ = evt_cfg
+        self._append(
+            (
+                time.time(),
+                "event",
+                _source(data),
+                event_name.rpartition("_")[2],
+                event_name,
+                None,
+                None,
+                "",
+            )
+        )
+
+    def record_delivery(
+        self,
+        consumer: str,
+        event_name: str,
+        data: Any,
+        outcome: str,
+        detail: str = "",
+    ) -> None:
+        self._append(
+            (
+                time.time(),
+                "delivery",
+                _source(data),
+                event_name.rpartition("_")[2],
+                event_name,
+                consumer,
+                outcome,
+                detail,
+            )
+        )
+
+    def flush(self) -> None:
+        rows: List[Row] = []
+        try:
+            while True:
+                rows.append(self._ring.popleft())
+        except IndexError:
+            pass
+        if rows:
+            with self._db:
+                self._db.executemany(_INSERT, rows)
+        now = time.time()
+        if self.prune and now - self._last_prune > self.PRUNE_INTERVAL:
+            self._last_prune = now
+            with self._db:
+                deleted = self._db.execute(
+                    "DELETE FROM history WHERE time < ?",
+                    (now - self.policy.retention * 86400,),
+                ).rowcount
+            if deleted:
+                LOGGER.info("History: %d old records deleted", deleted)
+
+    def _run(self) -> None:
+        while True:
+            stopping = self._stop.wait(self.policy.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                LOGGER.error("History: Writing failed: %s", e)
+            if stopping:
+                return
+
+
+def install(recorder: Optional[HistoryRecorder]) -> None:
+    """Set the recorder used by record_delivery() (None: off)."""
+    global _recorder  # pylint: disable=global-statement
+    _recorder = recorder
+
+
+def current() -> Optional[HistoryRecorder]:
+    return _recorder
+
+
+def record_delivery(
+    consumer: str, event_name: str, data: Any, outcome: str, detail: str = ""
+) -> None:
+    """Record the outcome of a consumer for an event (no-op if off)."""
+    recorder = _recorder
+    if recorder is not None:
+        recorder.record_delivery(consumer, event_name, data, outcome, detail)
+
+
+def start(config, prune: bool = True) -> HistoryRecorder:
+    """Start recording as configured ('history' of the config)."""
+    recorder = HistoryRecorder(HistoryPolicy.from_config(config), prune)
+    recorder.start()
+    install(recorder)
+    LOGGER.info("History: %s", recorder.policy.path)
+    return recorder
+
+
+def stop() -> None:
+    """Write the pending records and stop recording."""
+    recorder = _recorder
+    if recorder is not None:
+        install(None)
+        recorder.close()
+
+
+def worker_config() -> Optional[Dict[str, Any]]:
+    """Config of the running recorder for worker processes."""
+    if _recorder is None:
+        return None
+    return asdict(_recorder.policy)
+
+
+def query(  # pylint: disable=too-many-arguments
+    db: sqlite3.Connection,
+    *,
+    source: Optional[str] = None,
+    event_type: Optional[str] = None,
+    event: Optional[str] = None,
+    consumer: Optional[str] = None,
+    since: Optional[float] = None,
+    limit: int = 20,
+) -> List[sqlite3.Row]:
+    """Newest records first, filters are optional."""
+    where = []
+    params: List[Any] = []
+    for column, value in (
+        ("source", source),
+        ("type", event_type),
+        ("event", event),
+        ("consumer", consumer),
+    ):
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value.lower() if column != "consumer" else value)
+    if since is not None:
+        where.append("time >= ?")
+        params.append(since)
+    sql = "SELECT * FROM history"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY time DESC LIMIT ?"
+    params.append(limit)
+    db.row_factory = sqlite3.Row
+    return db.execute(sql, params).fetchall()
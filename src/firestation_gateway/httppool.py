@@ -0,0 +1,150 @@
+import logging
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+LOGGER = logging.getLogger(__name__)
+
+POOL_SIZE = 2
+REFRESH_INTERVAL = 120.0
+PING_TIMEOUT = 5.0
+
+# TCP keepalive: detect dead peers (e.g. NAT timeout) on idle connections
+_KEEPALIVE_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+for _opt, _val in (
+    ("TCP_KEEPIDLE", 60),
+    ("TCP_KEEPINTVL", 15),
+    ("TCP_KEEPCNT", 4),
+):
+    if hasattr(socket, _opt):
+        _KEEPALIVE_OPTIONS.append(
+            (socket.IPPROTO_TCP, getattr(socket, _opt), _val)
+        )
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Retry connection problems, timeouts and server side HTTP errors."""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        status = exc.response.status_code if exc.response is not None else 0
+        return status >= 500 or status == 429
+    return isinstance(
+        exc,
+        (requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+    )
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = (
+            HTTPConnection.default_socket_options + _KEEPALIVE_OPTIONS
+        )
+        super().init_poolmanager(*args, **kwargs)
+
+
+class PooledSession:
+    """HTTP session with a persistent connection pool.
+
+    Connections to the server are kept open between requests. With
+    'prewarm' a connection is opened in the background right away, with
+    'refresh_interval' an idle pool is refreshed by a HEAD request so the
+    first request after a long quiet time does not hit a dead socket.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = POOL_SIZE,
+        keepalive: bool = True,
+        prewarm: bool = True,
+        refresh_interval: float = REFRESH_INTERVAL,
+    ):
+        self.base_url = base_url
+        self.refresh_interval = refresh_interval
+        self.session = requests.Session()
+        if keepalive:
+            adapter = _KeepAliveAdapter(
+                pool_connections=1, pool_maxsize=pool_size
+            )
+        else:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self.session.headers["Connection"] = "close"
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._last_used = time.monotonic()
+        self._stop_event = threading.Event()
+        self._thread = None
+        if prewarm or (keepalive and refresh_interval > 0):
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(prewarm, keepalive and refresh_interval > 0),
+                name="HTTP-" + base_url,
+                daemon=True,
+            )
+            self._thread.start()
+
+    @classmethod
+    def from_config(
+        cls,
+        base_url: str,
+        config: dict,
+        enabled: bool = True,
+        pool_size: int = POOL_SIZE,
+    ):
+        """Create session from consumer params ('enabled' = background I/O,
+        'pool_size' = default of the param, e.g. for concurrent sends)."""
+        try:
+            return cls(
+                base_url,
+                pool_size=int(config.get("pool_size", pool_size)),
+                keepalive=bool(config.get("keepalive", True)),
+                prewarm=enabled and bool(config.get("prewarm", True)),
+                refresh_interval=(
+                    float(config.get("refresh_interval", REFRESH_INTERVAL))
+                    if enabled
+                    else 0
+                ),
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"HTTP pool: Invalid value ({e}).") from e
+
+    def post(self, url, **kwargs):
+        self._last_used = time.monotonic()
+        return self.session.post(url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        self._last_used = time.monotonic()
+        return self.session.request(method, url, **kwargs)
+
+    def head(self, url, **kwargs):
+        self._last_used = time.monotonic()
+        return self.session.head(url, **kwargs)
+
+    def ping(self) -> bool:
+        """Open/refresh a pooled connection to the server."""
+        self._last_used = time.monotonic()
+        try:
+            self.session.head(self.base_url, timeout=PING_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            LOGGER.debug("'%s' ping failed: %s", self.base_url, e)
+            # drop possibly broken connections, next request reconnects
+            self.session.close()
+            return False
+        return True
+
+    def close(self):
+        self._stop_event.set()
+        self.session.close()
+
+    def _run(self, prewarm, refresh):
+        if prewarm:
+            self.ping()
+        if not refresh:
+            return
+        while not self._stop_event.wait(self.refresh_interval):
+            if time.monotonic() - self._last_used >= self.refresh_interval:
+                self.ping()
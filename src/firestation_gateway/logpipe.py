@@ -0,0 +1,133 @@
+import atexit
+import datetime
+import json
+import logging
+import queue
+import sys
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Deque, Dict, Optional
+
+from firestation_gateway import metrics
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s|%(threadName)s] %(message)s"
+# records kept while the writer is behind, the oldest are dropped
+RING_SIZE = 10000
+
+# options of setup(), passed on to worker processes
+OPTIONS: Dict[str, Any] = {"level": logging.INFO}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class LogRing:
+    """Bounded queue of log records, a full ring drops the oldest record.
+
+    put_nowait() never blocks, so logging from a producer or consumer
+    thread costs a lock and an append. Same interface as queue.Queue for
+    QueueHandler/QueueListener.
+    """
+
+    def __init__(self, size: int = RING_SIZE):
+        self.size = size
+        self._records: Deque[Optional[logging.LogRecord]] = deque()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._waiting = False
+        self._dropped = metrics.LOG_DROPPED.labels()
+        metrics.LOG_RING_DEPTH.set_function(self.qsize)
+
+    def qsize(self) -> int:
+        return len(self._records)
+
+    def put_nowait(self, record: Optional[logging.LogRecord]) -> None:
+        with self._lock:
+            if len(self._records) >= self.size:
+                self._records.popleft()
+                self._dropped.inc()
+            self._records.append(record)
+            if self._waiting:
+                self._ready.notify()
+
+    def get(self, block: bool = True) -> Optional[logging.LogRecord]:
+        with self._lock:
+            while not self._records:
+                if not block:
+                    raise queue.Empty
+                self._waiting = True
+                self._ready.wait()
+                self._waiting = False
+            return self._records.popleft()
+
+
+class _LazyQueueHandler(QueueHandler):
+    """Queue records unformatted, the message is built by the writer.
+
+    Arguments are formatted later in the writer thread, objects logged
+    as arguments must not be changed after the call (events are not).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record (e.g. for journald or log shippers)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup(
+    level=logging.INFO, log_async: bool = False, log_json: bool = False
+) -> None:
+    """Log to stderr, with 'log_async' through a LogRing written by a
+    background thread, with 'log_json' as JSON lines."""
+    global _listener, _queue_handler  # pylint: disable=global-statement
+    flush()
+    OPTIONS.update(level=level, log_async=log_async, log_json=log_json)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(
+        JsonFormatter() if log_json else logging.Formatter(LOG_FORMAT)
+    )
+    root = logging.getLogger()
+    root.setLevel(level)
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    if not log_async:
+        root.addHandler(handler)
+        return
+    ring = LogRing()
+    _queue_handler = _LazyQueueHandler(ring)
+    root.addHandler(_queue_handler)
+    _listener = QueueListener(ring, handler, respect_handler_level=True)
+    _listener.start()
+    _listener._thread.name = "LogWriter"  # pylint: disable=protected-access
+    atexit.register(flush)
+
+
+def flush() -> None:
+    """Write the queued records and stop the writer thread, records
+    logged afterwards are written directly."""
+    global _listener, _queue_handler  # pylint: disable=global-statement
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = _queue_handler = None
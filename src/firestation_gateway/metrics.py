@@ -0,0 +1,299 @@
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+METRICS_ADDRESS = "127.0.0.1"
+METRICS_PORT = 9108
+
+# latency buckets in seconds (100us .. 60s)
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)  # fmt: skip
+
+
+def _labels(names, values, extra="") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_lock", "_sum")
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def observe_ns(self, value: int) -> None:
+        self.observe(value / 1e9)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _Metric:
+    mtype = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Return the child for the label values (keep it for hot paths)."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def remove(self, *values) -> None:
+        with self._lock:
+            self._children.pop(tuple(str(v) for v in values), None)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} {self.mtype}"
+        for key, child in list(self._children.items()):
+            yield from self._render_child(key, child)
+
+    def _render_child(self, key, child):
+        raise NotImplementedError
+
+
+class Histogram(_Metric):
+    mtype = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, key, child):
+        counts, total = child.snapshot()
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            labels = _labels(self.labelnames, key, f'le="{bound}"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _labels(self.labelnames, key)
+        yield f"{self.name}_sum{labels} {total}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Counter(_Metric):
+    mtype = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _render_child(self, key, child):
+        yield f"{self.name}{_labels(self.labelnames, key)} {child.value}"
+
+
+class Gauge(_Metric):
+    """Gauge read by a callback at scrape time (no cost on hot paths)."""
+
+    mtype = "gauge"
+
+    def _new_child(self):
+        return lambda: 0
+
+    def set_function(self, func: Callable[[], float], *values) -> None:
+        with self._lock:
+            self._children[tuple(str(v) for v in values)] = func
+
+    def remove_function(self, func: Callable[[], float], *values) -> None:
+        """Remove the child unless it was set to another function (e.g. by
+        the consumer replacing the owner of 'func' on a reload)."""
+        key = tuple(str(v) for v in values)
+        with self._lock:
+            if self._children.get(key) is func:
+                del self._children[key]
+
+    def _render_child(self, key, child):
+        try:
+            value = child()
+        except (TypeError, ValueError):
+            # no value yet (e.g. float(None)) or its owner is closed
+            return
+        yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+
+class GaugeFunctions:
+    """The set_function() children of an owner, removed together when the
+    owner is gone (its functions keep it alive)."""
+
+    def __init__(self):
+        self._children: List[Tuple[Gauge, Callable[[], float], tuple]] = []
+
+    def set(self, gauge: Gauge, func: Callable[[], float], *values) -> None:
+        gauge.set_function(func, *values)
+        self._children.append((gauge, func, values))
+
+    def remove(self) -> None:
+        for gauge, func, values in self._children:
+            gauge.remove_function(func, *values)
+        self._children = []
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, doc, labelnames, buckets))
+
+    def counter(self, name, doc, labelnames=()):
+        return self._add(Counter(name, doc, labelnames))
+
+    def gauge(self, name, doc, labelnames=()):
+        return self._add(Gauge(name, doc, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Alarm path stages (monotonic ns stamps):
+#   edge -> debounce -> emit -> enqueue -> dequeue -> send -> response
+STAGE_LATENCY = REGISTRY.histogram(
+    "firestation_stage_latency_seconds",
+    "Latency of the alarm path stages",
+    ("stage", "consumer"),
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "firestation_queue_depth", "Events waiting in the queue", ("consumer",)
+)
+QUEUE_CLASS_DEPTH = REGISTRY.gauge(
+    "firestation_queue_class_depth",
+    "Events waiting in the queue by priority class",
+    ("consumer", "priority"),
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "firestation_queue_wait_seconds",
+    "Time events waited in the queue by priority class",
+    ("consumer", "priority"),
+)
+QUEUE_OVERFLOW = REGISTRY.counter(
+    "firestation_queue_overflow_total",
+    "Events dropped or spilled to disk because the queue was full",
+    ("consumer", "action"),
+)
+OUTBOX_ERRORS = REGISTRY.counter(
+    "firestation_outbox_errors_total",
+    "Events not written to the outbox (queued in memory only)",
+    ("consumer",),
+)
+RETRY_DEPTH = REGISTRY.gauge(
+    "firestation_retry_pending",
+    "Deliveries waiting for a retry",
+    ("consumer",),
+)
+SUPPRESSED = REGISTRY.counter(
+    "firestation_suppressed_total",
+    "Events not sent (coalesced or rate limited)",
+    ("consumer", "reason"),
+)
+WORKER_RESTARTS = REGISTRY.counter(
+    "firestation_worker_restarts_total",
+    "Restarts of dead consumer worker processes",
+    ("consumer",),
+)
+HEALTH_UP = REGISTRY.gauge(
+    "firestation_health_up",
+    "Server reachable at the last connectivity check",
+    ("consumer",),
+)
+HEALTH_LATENCY = REGISTRY.gauge(
+    "firestation_health_latency_seconds",
+    "Duration of the last successful connectivity check",
+    ("consumer",),
+)
+HEALTH_CHECKS = REGISTRY.counter(
+    "firestation_health_checks_total",
+    "Connectivity checks",
+    ("consumer", "result"),
+)
+RELOAD_DURATION = REGISTRY.histogram(
+    "firestation_reload_seconds",
+    "Duration of config reloads",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOG_DROPPED = REGISTRY.counter(
+    "firestation_log_dropped_total",
+    "Log records dropped because the log ring was full",
+)
+LOG_RING_DEPTH = REGISTRY.gauge(
+    "firestation_log_ring_depth", "Log records waiting to be written"
+)
+HISTORY_DROPPED = REGISTRY.counter(
+    "firestation_history_dropped_total",
+    "History records dropped because the history ring was full",
+)
+STATUS_POLL = REGISTRY.histogram(
+    "firestation_status_poll_seconds",
+    "Duration of ISSI status polls (request, diff)",
+    ("producer", "stage"),
+)
+STATUS_CHANGES = REGISTRY.counter(
+    "firestation_status_changes_total",
+    "ISSI status changes seen by the status polling",
+    ("producer",),
+)
+DEVICE_SENDS = REGISTRY.counter(
+    "firestation_device_sends_total",
+    "SDS sent per TETRAcontrol device (GerID)",
+    ("consumer", "device", "result"),
+)
+DEVICE_SEND_LATENCY = REGISTRY.histogram(
+    "firestation_device_send_seconds",
+    "Duration of SDS sends per TETRAcontrol device",
+    ("consumer", "device"),
+)
+DEVICE_IN_FLIGHT = REGISTRY.gauge(
+    "firestation_device_in_flight",
+    "SDS being sent per TETRAcontrol device",
+    ("consumer", "device"),
+)
@@ -0,0 +1,38 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .metrics import METRICS_ADDRESS, METRICS_PORT, REGISTRY
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):  # pylint: disable=invalid-name
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        LOGGER.debug("metrics: " + format, *args)
+
+
+def start_server(config) -> ThreadingHTTPServer:
+    """Serve REGISTRY in Prometheus text format (config 'metrics')."""
+    if not isinstance(config, dict):
+        config = {}
+    address = config.get("address", METRICS_ADDRESS)
+    port = int(config.get("port", METRICS_PORT))
+    server = ThreadingHTTPServer((address, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="Metrics", daemon=True
+    ).start()
+    LOGGER.info("Metrics on http://%s:%d/metrics", address, port)
+    return server
@@ -0,0 +1,71 @@
+import importlib
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PluginRegistry:
+    """Producer/consumer types by name, imported on first use.
+
+    Built-in types are given as "module:attribute" (relative to
+    'package'). Other packages can add types with an entry point in
+    'group', e.g. in their pyproject.toml:
+
+        [project.entry-points."firestation_gateway.consumers"]
+        my-consumer = "my_package.consumer:MyConsumer"
+
+    Only the types used in the config are imported, so a gateway without
+    HTTP consumers never loads requests.
+    """
+
+    def __init__(self, package: str, group: str, builtins: Dict[str, str]):
+        self.package = package
+        self.group = group
+        self.builtins = builtins
+        self._loaded: Dict[str, Any] = {}
+        # type -> import duration (seconds), see --profile-startup
+        self.load_times: Dict[str, float] = {}
+
+    def _entry_points(self):
+        # importlib.metadata is only needed for third-party plugins
+        # pylint: disable-next=import-outside-toplevel
+        from importlib.metadata import entry_points
+
+        return entry_points(group=self.group)
+
+    def names(self) -> List[str]:
+        return sorted(
+            set(self.builtins) | {ep.name for ep in self._entry_points()}
+        )
+
+    def get(self, name: str) -> Optional[Any]:
+        if name in self._loaded:
+            return self._loaded[name]
+        t_start = time.monotonic()
+        ref = self.builtins.get(name)
+        if ref is not None:
+            module, attr = ref.split(":")
+            cls = getattr(importlib.import_module(module, self.package), attr)
+        else:
+            cls = next(
+                (ep.load() for ep in self._entry_points() if ep.name == name),
+                None,
+            )
+            if cls is None:
+                return None
+            LOGGER.debug("Plugin '%s' loaded from %s", name, self.group)
+        self.load_times[name] = time.monotonic() - t_start
+        self._loaded[name] = cls
+        return cls
+
+    def builtin_class(self, attr: str) -> Any:
+        """Class of a built-in type by its name (e.g. "Connect"), for
+        module __getattr__() of the package."""
+        for name, ref in self.builtins.items():
+            if ref.rpartition(":")[2] == attr:
+                return self.get(name)
+        raise AttributeError(
+            f"module '{self.package}' has no attribute '{attr}'"
+        )
@@ -1,7 +1,22 @@
 from typing import Any, Optional
-from .genius import Genius
-from .generic_input import GenericInput
+
+from firestation_gateway.plugins import PluginRegistry
+
+PRODUCERS = PluginRegistry(
+    __name__,
+    "firestation_gateway.producers",
+    {
+        "genius": ".genius:Genius",
+        "generic-input": ".generic_input:GenericInput",
+        "tetracontrol-status": ".tetracontrol_status:TetracontrolStatus",
+    },
+)
 
 
 def get_producer(ptype: str) -> Optional[Any]:
-    return {"genius": Genius, "generic-input": GenericInput}.get(ptype)
+    return PRODUCERS.get(ptype)
+
+
+def __getattr__(name: str) -> Any:
+    # the classes stay importable from the package, loaded on first use
+    return PRODUCERS.builtin_class(name)
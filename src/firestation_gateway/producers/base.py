@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from firestation_gateway import metrics
+from firestation_gateway.eventbus import emit_traced, event_name
+from firestation_gateway.gpio import (
+    get_edge_monitor,
+    get_poll_sampler,
+    lines,
+    simulation,
+)
+
+from .engine import ENGINE, SELFTEST
+
+LOGGER = logging.getLogger(__name__)
+
+TIMER_PERIOD = 0.1
+
+# Accept kernel edge timestamps only if they are this close to "now"
+# (protects against kernels using a different clock than CLOCK_MONOTONIC)
+EDGE_TIMESTAMP_WINDOW = 1_000_000_000
+
+
+class BaseInput(threading.Thread):
+    """Base class for inputs with a time based state machine.
+
+    The input is either sampled every TIMER_PERIOD in the shared
+    PollSampler ("poll") or waits for edge events of the GPIO line in the
+    shared EdgeMonitor ("edge").
+    The state (time since the input became active, thresholds in ns for
+    leaving IDLE and ACTIVE, policy flags) lives in a slot of the shared
+    InputEngine, which runs the state machine of all input types.
+    """
+
+    def __init__(self, name: str, emitter) -> None:
+        super().__init__(name=name)
+        self.emitter = emitter
+        self.running = True
+        self.pin_in = None
+        self.edge_detect = False
+        # trigger file of a simulated input in 'stat' mode
+        self._sim_file: Optional[Path] = None
+        # trigger file watched by inotify (removed by close())
+        self._sim_watch: Optional[str] = None
+        self._stop_event = threading.Event()
+        self.event_alarm = event_name(name, "alarm")
+        self.event_idle = event_name(name, "idle")
+        self.event_selftest = event_name(name, "selftest")
+        # engine slot, allocated by _configure()
+        self._slot: Optional[int] = None
+        self._sampling_interval = TIMER_PERIOD
+        self._lat_debounce = metrics.STAGE_LATENCY.labels("debounce", "")
+        self._lat_emit = metrics.STAGE_LATENCY.labels("emit", "")
+
+    def _open_input(
+        self,
+        chip_path,
+        line,
+        sampling="edge",
+        active_low=False,
+        bias="default",
+    ):
+        if sampling not in ["edge", "poll"]:
+            raise ValueError("sampling: Invalid value. Use 'edge' or 'poll'")
+        self.edge_detect = sampling == "edge"
+        if lines.SUPPORTED:
+            # one line request (and read) for all inputs of the chip
+            self.pin_in = lines.request_input(
+                chip_path, line, sampling, active_low, bias
+            )
+            return
+        # periphery is only needed on kernels without the GPIO uAPI v2
+        from periphery import GPIO  # pylint: disable=import-outside-toplevel
+
+        edge = "both" if self.edge_detect else "none"
+        self.pin_in = GPIO(
+            chip_path, line, "in", edge=edge, inverted=active_low, bias=bias
+        )
+
+    def _open_simulation(self, path, mode="inotify"):
+        """Simulated input: active while the file 'path' exists.
+
+        'inotify' watches the file, 'memory' is driven only through
+        simulation.set_line(name, ...), 'stat' polls the file.
+        """
+        if mode not in simulation.SIMULATION_MODES:
+            raise ValueError(
+                "simulate: Invalid value. Use 'inotify', 'memory' or 'stat'"
+            )
+        if mode != "stat":
+            line = simulation.get_line(self.name)
+            try:
+                if mode == "inotify":
+                    simulation.watch_file(path, line)
+                    self._sim_watch = path
+            except OSError as e:
+                LOGGER.warning(
+                    "%s: inotify failed (%s), using stat", self.name, e
+                )
+            else:
+                self.pin_in = line
+                self.edge_detect = True
+                return
+        self._sim_file = Path(path)
+
+    def _read_input(self) -> bool:
+        if self.pin_in is not None:
+            return self.pin_in.read()
+        return self._sim_file.is_file()
+
+    def _configure(
+        self, thresholds: Tuple[int, int], selftest: bool = False
+    ) -> None:
+        """Set the thresholds (ns for IDLE->ACTIVE and ACTIVE->ALARM) and
+        the policy of the input, called by the subclass __init__()."""
+        self._slot = ENGINE.add(
+            self, thresholds, SELFTEST if selftest else 0
+        )
+
+    @property
+    def _active_since(self) -> Optional[int]:
+        return ENGINE.active_since(self._slot)
+
+    @property
+    def _state(self) -> int:
+        return ENGINE.state[self._slot]
+
+    def _emit(self, event: str, now: int) -> None:
+        """Send event decided at 'now' with the trace of the alarm path."""
+        t_emit = time.monotonic_ns()
+        edge_time = ENGINE.changed[self._slot]
+        self._lat_debounce.observe_ns(now - edge_time)
+        self._lat_emit.observe_ns(t_emit - now)
+        emit_traced(
+            self.emitter,
+            event,
+            {"time": time.asctime(), "source": self.name},
+            {"edge": edge_time, "debounce": now, "emit": t_emit},
+        )
+
+    def fileno(self) -> int:
+        return self.pin_in.fd
+
+    def next_deadline(self) -> Optional[int]:
+        return ENGINE.next_deadline(self._slot)
+
+    def handle_edge(self, now: int) -> None:
+        timestamp = now
+        # drain all queued events, the last one is the current edge
+        while self.pin_in.poll(0):
+            event = self.pin_in.read_event()
+            if 0 <= now - event.timestamp < EDGE_TIMESTAMP_WINDOW:
+                timestamp = event.timestamp
+        self.update(self._read_input(), now, timestamp)
+
+    def handle_timer(self, now: int) -> None:
+        ENGINE.evaluate(self._slot, now)
+
+    def sample(self, now: int) -> None:
+        """Read the input once and update the state machine."""
+        self.update(self._read_input(), now)
+
+    def update(
+        self, active: bool, now: int, timestamp: Optional[int] = None
+    ) -> None:
+        """Set the input value (changed at 'timestamp', default 'now') and
+        update the state machine."""
+        if timestamp is None:
+            timestamp = now
+        ENGINE.set_input(self._slot, active, timestamp)
+        ENGINE.evaluate(self._slot, now)
+
+    def _run_edge(self) -> None:
+        monitor = get_edge_monitor()
+        self.sample(time.monotonic_ns())
+        monitor.register(self)
+        self._stop_event.wait()
+        monitor.unregister(self)
+
+    def _run_poll(self) -> None:
+        sampler = get_poll_sampler(self._sampling_interval)
+        sampler.register(self)
+        self._stop_event.wait()
+        sampler.unregister(self)
+
+    def run(self) -> None:
+        if self.edge_detect:
+            self._run_edge()
+        else:
+            self._run_poll()
+
+    def stop(self) -> None:
+        self.running = False
+        self._stop_event.set()
+
+    def close(self) -> None:
+        """Release the input line (after stop())."""
+        if self.pin_in is not None and hasattr(self.pin_in, "close"):
+            self.pin_in.close()
+        if self._sim_watch is not None:
+            simulation.unwatch_file(self._sim_watch, self.pin_in)
+            self._sim_watch = None
+        if self._slot is not None:
+            ENGINE.remove(self._slot)
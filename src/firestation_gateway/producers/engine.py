@@ -0,0 +1,136 @@
+import logging
+import threading
+from array import array
+from typing import Any, List, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# states, a line leaves IDLE/ACTIVE when it has been active longer than
+# the threshold of the state
+IDLE, ACTIVE, ALARM = range(3)
+
+# policy flags of a line
+SELFTEST = 1  # ACTIVE -> IDLE is a selftest (Genius), emits "selftest"
+
+_INACTIVE = -1
+
+
+class InputEngine:
+    """State machines of all inputs in compact arrays.
+
+    Each input owns a slot: the time it became active (ns, -1: inactive),
+    the time of the last change, its state, two thresholds (ns relative
+    to the activation: IDLE->ACTIVE, ACTIVE->ALARM) and its policy flags.
+    evaluate() is the one state machine of all input types:
+
+        IDLE -> ACTIVE:       nothing emitted (debounced)
+        any -> ALARM:         "alarm"
+        ACTIVE -> IDLE:       "selftest" (flag SELFTEST), then "idle"
+        ACTIVE/ALARM -> IDLE: "idle"
+
+    Events are emitted through the input (BaseInput._emit()). A slot is
+    updated by the thread driving its input only (EdgeMonitor,
+    PollSampler or the event loop), add() and remove() are thread safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inputs: List[Any] = []
+        self.since = array("q")
+        self.changed = array("q")
+        self.state = bytearray()
+        self.thresholds = array("q")
+        self.flags = bytearray()
+        self._free: List[int] = []
+
+    def add(self, inp, thresholds: Tuple[int, int], flags: int = 0) -> int:
+        """Allocate a slot for 'inp' (IDLE, inactive) with its thresholds
+        (ns for IDLE->ACTIVE and ACTIVE->ALARM) and policy flags."""
+        if not 0 <= thresholds[0] <= thresholds[1]:
+            raise ValueError("Thresholds must be >= 0 and ascending.")
+        with self._lock:
+            if self._free:
+                slot = self._free.pop()
+                self.inputs[slot] = inp
+                self.since[slot] = _INACTIVE
+                self.changed[slot] = 0
+                self.state[slot] = IDLE
+                self.thresholds[2 * slot : 2 * slot + 2] = array(
+                    "q", thresholds
+                )
+                self.flags[slot] = flags
+                return slot
+            self.inputs.append(inp)
+            self.since.append(_INACTIVE)
+            self.changed.append(0)
+            self.state.append(IDLE)
+            self.thresholds.extend(thresholds)
+            self.flags.append(flags)
+            return len(self.inputs) - 1
+
+    def remove(self, slot: int) -> None:
+        with self._lock:
+            if self.inputs[slot] is None:
+                return
+            self.inputs[slot] = None
+            self._free.append(slot)
+
+    def set_input(self, slot: int, active: bool, timestamp: int) -> None:
+        since = self.since[slot]
+        if active:
+            if since == _INACTIVE:
+                self.since[slot] = timestamp
+                self.changed[slot] = timestamp
+        elif since != _INACTIVE:
+            self.since[slot] = _INACTIVE
+            self.changed[slot] = timestamp
+
+    def active_since(self, slot: int) -> Optional[int]:
+        since = self.since[slot]
+        return None if since == _INACTIVE else since
+
+    def pending(self, slot: int, now: int) -> int:
+        """State the line should be in at 'now'."""
+        since = self.since[slot]
+        if since == _INACTIVE:
+            return IDLE
+        elapsed = now - since
+        if elapsed < self.thresholds[2 * slot]:
+            return IDLE
+        if elapsed < self.thresholds[2 * slot + 1]:
+            return ACTIVE
+        return ALARM
+
+    def next_deadline(self, slot: int) -> Optional[int]:
+        since = self.since[slot]
+        state = self.state[slot]
+        if since == _INACTIVE or state == ALARM:
+            return None
+        return since + self.thresholds[2 * slot + state]
+
+    def evaluate(self, slot: int, now: int) -> None:
+        """Move the line to its pending state, emit the transition."""
+        state = self.state[slot]
+        pending = self.pending(slot, now)
+        if pending == state:
+            return
+        self.state[slot] = pending
+        inp = self.inputs[slot]
+        # pylint: disable=protected-access
+        LOGGER.debug("%s: New state: %d -> %d", inp.name, state, pending)
+        if pending == ACTIVE:
+            if state == IDLE:
+                LOGGER.info("%s: STATE: Idle -> Active", inp.name)
+        elif pending == ALARM:
+            LOGGER.info("%s: STATE: Active -> Alarm", inp.name)
+            inp._emit(inp.event_alarm, now)
+        else:
+            if state == ACTIVE and self.flags[slot] & SELFTEST:
+                LOGGER.debug("%s: EVT: Selftest", inp.name)
+                inp._emit(inp.event_selftest, now)
+            LOGGER.info("%s: STATE: -> Idle", inp.name)
+            inp._emit(inp.event_idle, now)
+
+
+# shared by all inputs
+ENGINE = InputEngine()
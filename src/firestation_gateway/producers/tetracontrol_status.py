@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from firestation_gateway import metrics, tetracontrol
+from firestation_gateway.consumers.retry import policy_from_config
+from firestation_gateway.eventbus import event_name, is_enabled
+from firestation_gateway.httppool import PooledSession
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class StatusPollPolicy:
+    """
+    Polling of the ISSI status (params 'poll').
+
+    Attributes:
+        interval (float):     Seconds between polls after a change.
+        interval_max (float): Polls without a change stretch the interval
+                              (x1.5) up to this.
+        timeout (float):      Timeout of a single poll in seconds.
+        backoff (float):      Delay after the first failed poll in seconds.
+        backoff_max (float):  Upper limit of the (doubling) delay.
+    """
+
+    interval: float = 5.0
+    interval_max: float = 15.0
+    timeout: float = 10.0
+    backoff: float = 5.0
+    backoff_max: float = 300.0
+
+    def __post_init__(self):
+        if self.interval <= 0 or self.interval_max < self.interval:
+            raise ValueError(
+                "poll: 'interval' must be > 0 and <= 'interval_max'"
+            )
+        if self.timeout <= 0:
+            raise ValueError("poll: 'timeout' must be > 0")
+        if self.backoff <= 0 or self.backoff_max < self.backoff:
+            raise ValueError(
+                "poll: 'backoff' must be > 0 and <= 'backoff_max'"
+            )
+
+    @classmethod
+    def from_config(cls, config) -> "StatusPollPolicy":
+        return policy_from_config(cls, config, "poll")
+
+    def delay(self, quiet: int, failures: int) -> float:
+        """Delay after 'quiet' polls without a change or 'failures' failed
+        polls in a row."""
+        if failures:
+            return min(self.backoff_max, self.backoff * 2 ** (failures - 1))
+        return min(self.interval_max, self.interval * 1.5**quiet)
+
+
+def _entries(
+    payload, issi_key: str, status_key: str
+) -> Iterator[Tuple[str, str]]:
+    """(issi, status) of the entries in an issi.json response: a list of
+    objects, an object holding such a list or an object by ISSI."""
+    if isinstance(payload, dict):
+        lists = [v for v in payload.values() if isinstance(v, list)]
+        if not lists:
+            for issi, entry in payload.items():
+                if isinstance(entry, dict):
+                    entry = entry.get(status_key)
+                if entry is not None:
+                    yield str(issi), str(entry)
+            return
+        payload = lists[0]
+    if not isinstance(payload, list):
+        raise TypeError("Unknown issi.json format")
+    for entry in payload:
+        if not isinstance(entry, dict):
+            continue
+        issi = entry.get(issi_key)
+        status = entry.get(status_key)
+        if issi is not None and status is not None:
+            yield str(issi), str(status)
+
+
+class TetracontrolStatus(threading.Thread):
+    """Turn ISSI status changes (e.g. FMS status) into events.
+
+    issi.json of TETRAcontrol is polled (params 'poll'), the status of
+    every ISSI is kept by ISSI and only changes are emitted:
+
+        <name>_status:               every change
+        <name>_status_<status>:      change to <status>
+        <name>_<issi>:               every change of <issi>
+        <name>_<issi>_<status>:      change of <issi> to <status>
+
+    Only configured events are emitted. A response equal to the previous
+    one is not parsed at all, so a quiet poll costs the request only.
+    The first poll sets the snapshot without events (param
+    'emit_initial': emit the current status of all ISSIs).
+    """
+
+    def __init__(self, name: str, emitter, events_config, config=None):
+        super().__init__(name=name, daemon=True)
+        self.emitter = emitter
+        if not isinstance(config, dict):
+            config = {}
+        self.url = config.get("url")
+        if not self.url:
+            raise ValueError(f"{name}: 'url' missing.")
+        self.filter = str(config.get("filter", ""))
+        self.issi_key = str(config.get("issi_key", "ISSI"))
+        self.status_key = str(config.get("status_key", "Status"))
+        self.emit_initial = bool(config.get("emit_initial", False))
+        self.policy = StatusPollPolicy.from_config(config.get("poll"))
+        self.client = tetracontrol.TETRAcontrolClient(
+            self.url,
+            config.get("token"),
+            PooledSession.from_config(self.url, config),
+        )
+        self.events = {
+            event_name(name, event)
+            for event, evt_cfg in (events_config or {}).items()
+            if is_enabled(evt_cfg)
+        }
+        # last seen status by ISSI
+        self.snapshot: Dict[str, str] = {}
+        self._body: Optional[bytes] = None
+        self._synced = False
+        self._stop_event = threading.Event()
+        self._lat = {
+            stage: metrics.STATUS_POLL.labels(name, stage)
+            for stage in ("request", "diff")
+        }
+        self._changes = metrics.STATUS_CHANGES.labels(name)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def close(self) -> None:
+        self.client.close()
+
+    def run(self) -> None:
+        quiet = failures = 0
+        delay = 0.0
+        while not self._stop_event.wait(delay):
+            try:
+                changed = self.poll()
+            except (OSError, TypeError, ValueError) as e:
+                # connection, HTTP status (the requests exceptions are
+                # OSError), JSON or an unknown format
+                failures += 1
+                if failures == 1:
+                    LOGGER.warning("%s: Status poll failed: %s", self.name, e)
+            except Exception:  # pylint: disable=broad-except
+                # e.g. an emit, the changes are emitted by the next poll
+                failures += 1
+                LOGGER.exception("%s: Status poll failed", self.name)
+            else:
+                if failures:
+                    LOGGER.info("%s: Status poll working again", self.name)
+                failures = 0
+                quiet = 0 if changed else quiet + 1
+            delay = self.policy.delay(quiet, failures)
+        self.close()
+
+    def poll(self) -> int:
+        """Poll issi.json once, emit the changes (returns their number)."""
+        t_start = time.monotonic_ns()
+        r = self.client.issi_status(self.filter, timeout=self.policy.timeout)
+        t_response = time.monotonic_ns()
+        self._lat["request"].observe_ns(t_response - t_start)
+        if r.content == self._body:
+            return 0
+        # parsed completely before the snapshot changes
+        entries = list(_entries(r.json(), self.issi_key, self.status_key))
+        changes = self.diff(entries)
+        self._lat["diff"].observe_ns(time.monotonic_ns() - t_response)
+        emit = self._synced or self.emit_initial
+        for issi, previous, status in changes:
+            if emit:
+                self._emit(issi, previous, status)
+            # taken over once emitted: if an emit fails, the next poll
+            # sees the remaining changes again
+            self.snapshot[issi] = status
+        self._body = r.content
+        if not self._synced:
+            self._synced = True
+            LOGGER.info("%s: %d ISSIs", self.name, len(self.snapshot))
+            if not self.emit_initial:
+                return 0
+        return len(changes)
+
+    def diff(self, entries) -> List[Tuple[str, Optional[str], str]]:
+        """(issi, previous, status) of the entries differing from the
+        snapshot (not updated here)."""
+        seen = {}
+        changes = []
+        for issi, status in entries:
+            previous = seen.get(issi, self.snapshot.get(issi))
+            if previous != status:
+                seen[issi] = status
+                changes.append((issi, previous, status))
+        return changes
+
+    def _emit(self, issi: str, previous: Optional[str], status: str) -> None:
+        self._changes.inc()
+        LOGGER.info(
+            "%s: ISSI %s: Status %s -> %s", self.name, issi, previous, status
+        )
+        data = {
+            "time": time.asctime(),
+            "source": self.name,
+            "issi": issi,
+            "status": status,
+            "previous": previous,
+        }
+        for event in ("status", f"status_{status}", issi, f"{issi}_{status}"):
+            name = event_name(self.name, event)
+            if name in self.events:
+                self.emitter.emit(name, data)
@@ -0,0 +1,96 @@
+import logging
+import signal
+import threading
+
+from .gateway import ConfigWatcher
+from .gpio import get_edge_monitor
+from .producers.base import BaseInput
+
+LOGGER = logging.getLogger(__name__)
+
+IO_WORKERS = 4
+
+
+class ThreadRuntime:
+    """Every producer and consumer runs in its own thread."""
+
+    @staticmethod
+    def start_producer(p):
+        p.start()
+
+    @staticmethod
+    def stop_producer(p):
+        p.stop()
+        p.join()
+
+    @staticmethod
+    def start_consumer(c):
+        c.start()
+
+    @staticmethod
+    def stop_consumer(c):
+        c.stop()
+        c.join()
+
+    def retire_consumer(self, c, successor):
+        # BaseConsumerQueued, ProcessConsumer
+        if hasattr(c, "retire"):
+            c.retire(successor)
+            if hasattr(c, "wait_handed_over"):
+                # before the successor starts
+                c.wait_handed_over(c.is_alive)
+        else:
+            self.stop_consumer(c)
+
+    @staticmethod
+    def refresh_inputs(producers):
+        inputs = [
+            p
+            for p in producers
+            if isinstance(p, BaseInput) and p.edge_detect
+        ]
+        if inputs:
+            get_edge_monitor().refresh(inputs)
+
+
+def run_threads(gateway, watch_config=False, on_started=None):
+    """Run every producer and consumer in its own thread.
+
+    SIGHUP (or a changed config file with 'watch_config') reloads the
+    config. 'on_started' is called once everything has been started.
+    """
+    gateway.start(ThreadRuntime())
+    if on_started is not None:
+        on_started()
+    reload_request = threading.Event()
+    signal.signal(signal.SIGHUP, lambda *_: reload_request.set())
+    watcher = None
+    if watch_config:
+        watcher = ConfigWatcher.create(gateway.path, reload_request.set)
+
+    try:
+        while True:
+            if reload_request.wait(1):
+                reload_request.clear()
+                gateway.reload()
+    except KeyboardInterrupt:
+        LOGGER.info("KeyboardInt...")
+
+    # Stop Threads
+    if watcher is not None:
+        watcher.close()
+    gateway.stop()
+
+
+def run_asyncio(
+    gateway, io_workers=IO_WORKERS, watch_config=False, on_started=None
+):
+    """Run all producers and consumers in a single event loop.
+
+    SIGHUP (or a changed config file with 'watch_config') reloads the
+    config. 'on_started' is called once everything has been started.
+    """
+    # asyncio is only imported for this runtime
+    from . import runtime_asyncio  # pylint: disable=import-outside-toplevel
+
+    runtime_asyncio.run(gateway, io_workers, watch_config, on_started)
@@ -0,0 +1,357 @@
+import asyncio
+import logging
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .consumers.base import BaseConsumerQueued
+from .gateway import ConfigWatcher
+from .gpio import SampleBatch
+from .producers.base import BaseInput
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _AsyncEventQueue:
+    """Adapter of the EventQueue of a consumer task (see
+    BaseConsumerQueued.event_queue).
+
+    Events may be emitted from the event loop or from foreign producer
+    threads. Both put into the (thread safe) EventQueue and wake the
+    task, only foreign threads may block on a full queue.
+    """
+
+    def __init__(self, loop, events):
+        self.loop = loop
+        self.events = events
+        self._ready = asyncio.Event()
+        self._loop_thread = threading.get_ident()
+
+    def put(self, item, block=True):
+        if threading.get_ident() == self._loop_thread:
+            self.events.put(item, block=False)
+            self._ready.set()
+        else:
+            self.events.put(item, block)
+            self.loop.call_soon_threadsafe(self._ready.set)
+
+    async def get(self):
+        while True:
+            try:
+                return self.events.get_nowait()
+            except queue.Empty:
+                # foreign threads set() via the loop, after this clear()
+                self._ready.clear()
+            await self._ready.wait()
+
+    def get_nowait(self):
+        return self.events.get_nowait()
+
+    def qsize(self):
+        return self.events.qsize()
+
+    def depth(self, priority):
+        return self.events.depth(priority)
+
+    def close(self):
+        self.events.close()
+
+
+class _AsyncInput:
+    """Drive an edge triggered BaseInput from the event loop."""
+
+    def __init__(self, loop, producer: BaseInput, readers):
+        self.loop = loop
+        self.producer = producer
+        # fd -> [_AsyncInput], lines of one request share the fd
+        self.readers = readers
+        self.fd = -1
+        self._timer = None
+
+    def start(self):
+        self.producer.sample(time.monotonic_ns())
+        self.attach()
+        self._schedule()
+
+    def stop(self):
+        self.producer.stop()
+        if self._timer is not None:
+            self._timer.cancel()
+        self.detach()
+
+    def attach(self):
+        self.fd = self.producer.fileno()
+        watchers = self.readers.setdefault(self.fd, [])
+        if not watchers:
+            self.loop.add_reader(self.fd, _on_readable, self.readers, self.fd)
+        watchers.append(self)
+
+    def detach(self):
+        watchers = self.readers.get(self.fd, [])
+        if self in watchers:
+            watchers.remove(self)
+            if not watchers:
+                del self.readers[self.fd]
+                self.loop.remove_reader(self.fd)
+
+    def on_edge(self):
+        # a failing input (or consumer behind it) must not stop the
+        # other inputs of the fd or the event loop
+        try:
+            self.producer.handle_edge(time.monotonic_ns())
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("Edge of '%s' failed", self.producer.name)
+        self._schedule()
+
+    def _on_timer(self):
+        self._timer = None
+        try:
+            self.producer.handle_timer(time.monotonic_ns())
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("Timer of '%s' failed", self.producer.name)
+        self._schedule()
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        deadline = self.producer.next_deadline()
+        if deadline is not None:
+            delay = max(0.0, (deadline - time.monotonic_ns()) / 1e9)
+            self._timer = self.loop.call_later(delay, self._on_timer)
+
+
+def _on_readable(readers, fd):
+    for watcher in list(readers.get(fd, ())):
+        watcher.on_edge()
+
+
+async def _poll(batch: SampleBatch, interval):
+    """Sample all polled inputs with the same interval at once."""
+    while True:
+        t_start = time.monotonic()
+        try:
+            batch.sample()
+        except Exception:  # pylint: disable=broad-except
+            # the task samples all inputs of the interval
+            LOGGER.exception("Sampling failed")
+        elapsed = time.monotonic() - t_start
+        await asyncio.sleep(max(0.0, interval - elapsed))
+
+
+class _AsyncInputs:
+    """All BaseInput producers of the event loop.
+
+    Edge inputs get an fd watcher (shared by the lines of one request),
+    polled inputs are sampled together, one task per sampling interval.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.edge = {}
+        self.polled = {}
+        self._readers = {}
+        self._tasks = {}
+
+    def add(self, p):
+        if p.edge_detect:
+            self.edge[p] = _AsyncInput(self.loop, p, self._readers)
+            self.edge[p].start()
+            return
+        # pylint: disable-next=protected-access
+        interval = p._sampling_interval
+        batch = self.polled.setdefault(interval, SampleBatch())
+        batch.register(p)
+        if interval not in self._tasks:
+            self._tasks[interval] = self.loop.create_task(
+                _poll(batch, interval)
+            )
+
+    def remove(self, p):
+        if p in self.edge:
+            self.edge.pop(p).stop()
+            return
+        # pylint: disable-next=protected-access
+        interval = p._sampling_interval
+        batch = self.polled.get(interval)
+        if batch is not None and p in batch:
+            batch.unregister(p)
+            p.stop()
+        if not batch and interval in self._tasks:
+            self._tasks.pop(interval).cancel()
+            del self.polled[interval]
+
+    def refresh(self):
+        """Watch the fds again after line requests have been renewed."""
+        for i in self.edge.values():
+            i.detach()
+        for i in self.edge.values():
+            i.attach()
+            # edges may have been missed meanwhile
+            i.on_edge()
+
+    def stop(self):
+        for p in list(self.edge):
+            self.remove(p)
+        for batch in list(self.polled.values()):
+            for p in batch.inputs():
+                self.remove(p)
+
+
+async def _consume(loop, executor, consumer: BaseConsumerQueued):
+    while consumer.running and not consumer.retired:
+        try:
+            item = await asyncio.wait_for(
+                consumer.event_queue.get(), consumer.next_retry_timeout()
+            )
+        except asyncio.TimeoutError:
+            pass
+        else:
+            if not consumer.running:
+                break
+            # blocking I/O (HTTP, GPIO) is done in the bounded executor
+            await loop.run_in_executor(
+                executor, consumer.safe_call, consumer.dispatch, item
+            )
+        timeout = consumer.next_retry_timeout()
+        if timeout is not None and timeout <= 0:
+            await loop.run_in_executor(
+                executor, consumer.safe_call, consumer.process_retries
+            )
+    await loop.run_in_executor(executor, consumer.close)
+
+
+class AsyncioRuntime:
+    """Producers and consumers in one event loop.
+
+    BaseInput producers are driven by fd watchers / polling tasks and
+    BaseConsumerQueued consumers are tasks. Plugins which are not known
+    to the adapter keep their own thread. The methods may be called from
+    other threads (config reload), they run in the event loop.
+    """
+
+    def __init__(self, loop, executor, senders=None):
+        self.loop = loop
+        self.executor = executor
+        # concurrent sends of the consumers (see deliver_many()), not
+        # 'executor': its workers wait for the sends
+        self.senders = senders
+        self.inputs = _AsyncInputs(loop)
+        self.tasks = {}
+        self.threaded = []
+        self._loop_thread = threading.get_ident()
+
+    def _in_loop(self, func, *args):
+        if threading.get_ident() == self._loop_thread:
+            func(*args)
+            return
+
+        async def call():
+            func(*args)
+
+        asyncio.run_coroutine_threadsafe(call(), self.loop).result()
+
+    def start_producer(self, p):
+        if isinstance(p, BaseInput):
+            self._in_loop(self.inputs.add, p)
+        else:
+            self.threaded.append(p)
+            p.start()
+
+    def stop_producer(self, p):
+        if isinstance(p, BaseInput):
+            self._in_loop(self.inputs.remove, p)
+        else:
+            p.stop()
+            p.join()
+            self.threaded.remove(p)
+
+    def start_consumer(self, c):
+        if isinstance(c, BaseConsumerQueued):
+            self._in_loop(self._start_task, c)
+        else:
+            self.threaded.append(c)
+            c.start()
+
+    def _start_task(self, c):
+        # keeps the events queued before the start (outbox replay, reload
+        # hand over)
+        c.event_queue = _AsyncEventQueue(self.loop, c.event_queue)
+        c.send_executor = self.senders
+        self.tasks = {k: t for k, t in self.tasks.items() if not t.done()}
+        self.tasks[c] = self.loop.create_task(
+            _consume(self.loop, self.executor, c)
+        )
+
+    def stop_consumer(self, c):
+        c.stop()
+        if c in self.threaded:
+            c.join()
+            self.threaded.remove(c)
+
+    def retire_consumer(self, c, successor):
+        if isinstance(c, BaseConsumerQueued):
+            self._in_loop(c.retire, successor)
+            task = self.tasks.get(c)
+            if threading.get_ident() != self._loop_thread:
+                # the task hands the events over, before the successor
+                # starts
+                c.wait_handed_over(
+                    lambda: task is not None and not task.done()
+                )
+        elif hasattr(c, "retire"):
+            # ProcessConsumer
+            c.retire(successor)
+        else:
+            self.stop_consumer(c)
+
+    def refresh_inputs(self, producers):
+        _ = producers
+        self._in_loop(self.inputs.refresh)
+
+
+async def _run_asyncio(gateway, io_workers, watch_config, on_started):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(
+        max_workers=io_workers, thread_name_prefix="io"
+    )
+    senders = ThreadPoolExecutor(
+        max_workers=io_workers, thread_name_prefix="send"
+    )
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    runtime = AsyncioRuntime(loop, executor, senders)
+    gateway.start(runtime)
+    if on_started is not None:
+        on_started()
+
+    # the reload blocks (config file, plugin setup), it runs in a thread
+    def request_reload():
+        loop.run_in_executor(None, gateway.reload)
+
+    loop.add_signal_handler(signal.SIGHUP, request_reload)
+    watcher = None
+    if watch_config:
+        # called in the thread of the file watcher
+        watcher = ConfigWatcher.create(
+            gateway.path, lambda: loop.call_soon_threadsafe(request_reload)
+        )
+
+    await stop_event.wait()
+    LOGGER.info("Stopping...")
+
+    if watcher is not None:
+        watcher.close()
+    await loop.run_in_executor(None, gateway.stop)
+    runtime.inputs.stop()
+    await asyncio.gather(*runtime.tasks.values())
+    executor.shutdown(wait=True)
+    senders.shutdown(wait=True)
+
+
+def run(gateway, io_workers, watch_config=False, on_started=None):
+    asyncio.run(_run_asyncio(gateway, io_workers, watch_config, on_started))
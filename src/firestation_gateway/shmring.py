@@ -0,0 +1,149 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from typing import Any, Optional, Tuple
+
+RING_SIZE = 1024 * 1024
+# tmpfs, the ring is never written to a disk
+SHM_DIR = "/dev/shm"
+
+# header fields, the writer and the reader side on own cache lines
+_U64 = struct.Struct("<Q")
+_U32 = struct.Struct("<I")
+_HEAD = 0  # writer: bytes written
+_WRITTEN = 8  # writer: records written
+_TAIL = 64  # reader: bytes read
+_READ = 72  # reader: records read
+_SLEEPING = 128  # reader: waiting for the doorbell
+_DRAINED = 132  # reader: all events handled (see ProcessConsumer)
+_COMMAND = 192  # owner: command to the reader
+_DATA = 256
+
+# record: sequence number (records written before), payload length,
+# crc32(sequence number, length, payload)
+_RECORD = struct.Struct("<QII")
+_CRC_FIELDS = struct.Struct("<QI")
+
+
+def _flag(field: int) -> property:
+    return property(
+        lambda self: _U32.unpack_from(self.buf, field)[0],
+        lambda self, value: _U32.pack_into(self.buf, field, int(value)),
+    )
+
+
+class ShmRing:
+    """Single producer, single consumer ring buffer in shared memory.
+
+    The writer only moves 'head', the reader only 'tail', no lock is
+    shared between the processes. Python has no memory barriers, so on
+    weakly ordered CPUs (ARM) the reader may see 'head' before the bytes
+    of the record: every record carries its sequence number, a record
+    whose number is not the next one expected is an older record at the
+    same offset (previous lap) and is read again later. A CRC32 over
+    number, length and payload detects partly visible records. The
+    writer stores the payload before the header and moves 'head' last.
+
+    The memory is a file in SHM_DIR mapped by both processes. The owner
+    (create()) removes it in close(), other processes attach() by path.
+    """
+
+    def __init__(self, path: str, fd: int, owner: bool):
+        self.path = path
+        self.owner = owner
+        try:
+            self.buf = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        self.capacity = len(self.buf) - _DATA
+
+    @classmethod
+    def create(cls, size: int = RING_SIZE) -> "ShmRing":
+        fd, path = tempfile.mkstemp(
+            prefix="firestation-ring-",
+            dir=SHM_DIR if os.path.isdir(SHM_DIR) else None,
+        )
+        os.ftruncate(fd, _DATA + size)
+        return cls(path, fd, owner=True)
+
+    @classmethod
+    def attach(cls, path: str) -> "ShmRing":
+        return cls(path, os.open(path, os.O_RDWR), owner=False)
+
+    def _get(self, field: int) -> int:
+        return _U64.unpack_from(self.buf, field)[0]
+
+    def _set(self, field: int, value: int) -> None:
+        _U64.pack_into(self.buf, field, value)
+
+    # flags of the reader (sleeping, drained) and the owner (command)
+    sleeping = _flag(_SLEEPING)
+    drained = _flag(_DRAINED)
+    command = _flag(_COMMAND)
+
+    def __len__(self) -> int:
+        """Records not read yet."""
+        return self._get(_WRITTEN) - self._get(_READ)
+
+    def _copy_in(self, pos: int, data: bytes) -> None:
+        start = pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.buf[_DATA + start : _DATA + start + first] = data[:first]
+        if first < len(data):
+            self.buf[_DATA : _DATA + len(data) - first] = data[first:]
+
+    def _copy_out(self, pos: int, size: int) -> bytes:
+        start = pos % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(self.buf[_DATA + start : _DATA + start + first])
+        if first < size:
+            data += bytes(self.buf[_DATA : _DATA + size - first])
+        return data
+
+    def put(self, event_name: str, data: Any, trace=None) -> bool:
+        """Append an event and its trace (writer side), False if the ring
+        is full."""
+        payload = json.dumps([event_name, data, trace]).encode()
+        size = _RECORD.size + len(payload)
+        head = self._get(_HEAD)
+        if size > self.capacity - (head - self._get(_TAIL)):
+            return False
+        seq = self._get(_WRITTEN)
+        crc = zlib.crc32(payload, zlib.crc32(_CRC_FIELDS.pack(seq, size)))
+        self._copy_in(head + _RECORD.size, payload)
+        self._copy_in(head, _RECORD.pack(seq, size, crc))
+        self._set(_WRITTEN, seq + 1)
+        # published last
+        self._set(_HEAD, head + size)
+        return True
+
+    def get(self) -> Optional[Tuple[str, Any, Any]]:
+        """Next (event_name, data, trace) (reader side), None if there is
+        none (yet)."""
+        tail = self._get(_TAIL)
+        available = self._get(_HEAD) - tail
+        if available < _RECORD.size:
+            return None
+        seq, size, crc = _RECORD.unpack(self._copy_out(tail, _RECORD.size))
+        read = self._get(_READ)
+        # an old record of the previous lap or a torn header
+        if seq != read or not _RECORD.size <= size <= available:
+            return None
+        payload = self._copy_out(tail + _RECORD.size, size - _RECORD.size)
+        if zlib.crc32(payload, zlib.crc32(_CRC_FIELDS.pack(seq, size))) != crc:
+            return None
+        self._set(_TAIL, tail + size)
+        self._set(_READ, read + 1)
+        event_name, data, trace = json.loads(payload)
+        return event_name, data, trace
+
+    def close(self) -> None:
+        self.buf.close()
+        if self.owner:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
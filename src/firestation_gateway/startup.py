@@ -0,0 +1,59 @@
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+def process_age() -> Optional[float]:
+    """Seconds since the process was started, None if unknown (no /proc)."""
+    try:
+        with open("/proc/self/stat", "rb") as f:
+            # fields after the command name, starttime is field 22
+            start_ticks = int(f.read().rsplit(b")", 1)[1].split()[19])
+        with open("/proc/uptime", "rb") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+class StartupProfile:
+    """Durations of the startup phases (--profile-startup).
+
+    The first phase is the time from the process start (interpreter,
+    CLI imports) until the profile was created, with the resolution of
+    the kernel clock ticks (10ms).
+    """
+
+    def __init__(self, enabled: bool = True):
+        # report() logs only if enabled
+        self.enabled = enabled
+        self.phases: List[Tuple[str, float]] = []
+        age = process_age()
+        if age is not None:
+            self.phases.append(("python, cli", age))
+        self._t = time.monotonic()
+
+    def mark(self, phase: str, *parts: Tuple[str, float]) -> None:
+        """End 'phase'.
+
+        'parts' ((name, seconds), ...) have been measured within the phase
+        and are reported separately.
+        """
+        now = time.monotonic()
+        elapsed = now - self._t
+        self._t = now
+        for name, seconds in parts:
+            self.phases.append((name, seconds))
+            elapsed -= seconds
+        self.phases.append((phase, elapsed))
+
+    def report(self) -> None:
+        if not self.enabled:
+            return
+        total = sum(seconds for _, seconds in self.phases)
+        LOGGER.info("Startup: %.1f ms", total * 1e3)
+        for name, seconds in self.phases:
+            LOGGER.info("  %-28s %8.1f ms", name, seconds * 1e3)
@@ -1,4 +1,11 @@
-from .client import TETRAcontrolClient, TETRAcontrolSDSTyp
+from .client import SDSTemplate, TETRAcontrolClient, TETRAcontrolSDSTyp
+from .devices import DevicePolicy, DevicePool
 
 
-__all__ = ["TETRAcontrolClient", "TETRAcontrolSDSTyp"]
+__all__ = [
+    "DevicePolicy",
+    "DevicePool",
+    "SDSTemplate",
+    "TETRAcontrolClient",
+    "TETRAcontrolSDSTyp",
+]
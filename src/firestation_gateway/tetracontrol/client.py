@@ -1,10 +1,17 @@
 import logging
 import dataclasses
-import requests
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+from firestation_gateway.httppool import PooledSession
 from .model import SDSCalloutModel, SDSModel, RadioModel
 
 LOG = logging.getLogger(__name__)
 
+# RADIO.json: keys and values telling whether the radio is connected
+_CONNECTED_KEYS = ("connected", "online", "status", "state")
+_CONNECTED = {"1", "true", "yes", "connected", "online", "ok"}
+_DISCONNECTED = {"0", "false", "no", "disconnected", "offline", "error"}
+
 
 class TETRAcontrolSDSTyp:
     SIMPLE = 0
@@ -13,21 +20,79 @@ class TETRAcontrolSDSTyp:
     CALLOUT = 195
 
 
+FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+class SDSTemplate:
+    """
+    SDS validated by the model and form encoded once.
+
+    Only the device (GerID) and the callout number (CONum) are set when
+    the SDS is sent.
+    """
+
+    __slots__ = ("_body", "model")
+
+    def __init__(self, data: Dict[str, Any], device_id: int = 1):
+        data = dict(data)
+        data.setdefault("GerID", device_id)
+        try:
+            if data.get("Typ") == TETRAcontrolSDSTyp.CALLOUT:
+                model = SDSCalloutModel(**data)
+            else:
+                model = SDSModel(**data)
+        except TypeError as e:
+            raise ValueError(f"SDS: Invalid parameter ({e}).") from e
+        fields = dataclasses.asdict(model)
+        self.model = model
+        del fields["GerID"]
+        fields.pop("CONum", None)
+        self._body = urlencode(fields) + "&GerID="
+
+    @property
+    def callout(self) -> bool:
+        return isinstance(self.model, SDSCalloutModel)
+
+    def body(
+        self, conum: Optional[int] = None, device_id: Optional[int] = None
+    ) -> str:
+        if device_id is None:
+            device_id = self.model.GerID
+        if not 1 <= device_id <= 4:
+            raise ValueError("'GerID' must be 1-4")
+        if not self.callout:
+            return f"{self._body}{device_id}"
+        if conum is None:
+            conum = self.model.CONum
+        if not 1 <= conum <= 250:
+            raise ValueError("'CONum' 1-250: Vorfall-Nummer.")
+        return f"{self._body}{device_id}&CONum={conum}"
+
+
 class TETRAcontrolClient:
-    def __init__(self, url: str, token: str):
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        session: PooledSession = None,
+        device_id: int = 1,
+    ):
         self.cookies = {"userkey": token}
         self.server = url
+        if session is None:
+            session = PooledSession(url, prewarm=False, refresh_interval=0)
+        self.session = session
         # send SDS encrypted
         self.sds_enc = True
-        # default device id (1-6)
-        # TODO: make configurable
-        self.device_id = 1
+        # default device (GerID 1-4), see send_sds() for others
+        self.device_id = device_id
 
-    def _request(self, url, data, timeout):
-        r = requests.post(
+    def _request(self, url, data, timeout, headers=None):
+        r = self.session.post(
             url,
             data=data,
             cookies=self.cookies,
+            headers=headers,
             timeout=timeout,
         )
         if r.status_code != 200:
@@ -37,20 +102,62 @@ class TETRAcontrolClient:
         r.raise_for_status()
         return r
 
+    def close(self):
+        self.session.close()
+
     def sds(self, data: dict, timeout: float = 10.0):
+        return self.send_sds(SDSTemplate(data, self.device_id), None, timeout)
+
+    def send_sds(
+        self,
+        template: SDSTemplate,
+        conum: Optional[int] = None,
+        timeout: float = 10.0,
+        device_id: Optional[int] = None,
+    ):
         url = f"{self.server}/API/SDS"
-        if "Typ" in data and data["Typ"] == 195:
-            _dat = SDSCalloutModel(**data)
-        else:
-            _dat = SDSModel(**data)
-        return self._request(url, dataclasses.asdict(_dat), timeout)
+        body = template.body(conum, device_id)
+        return self._request(url, body, timeout, FORM_HEADERS)
 
     def device_status(self, device_id=1, timeout: float = 10.0):
         url = f"{self.server}/API/RADIO.json"
         _dat = RadioModel(GerID=device_id)
         return self._request(url, dataclasses.asdict(_dat), timeout)
 
+    def check_device(self, device_id=1, timeout: float = 10.0):
+        """device_status() of a radio, raises ValueError if the answer is
+        no JSON or the radio reports that it is not connected (TypeError:
+        unknown format)."""
+        r = self.device_status(device_id, timeout)
+        if radio_connected(r.json(), device_id) is False:
+            raise ValueError(f"Radio {device_id} not connected")
+        return r
+
     def issi_status(self, used_filter: str, timeout: float = 10.0):
         url = f"{self.server}/API/issi.json"
         _dat = {"filter": used_filter}
         return self._request(url, _dat, timeout)
+
+
+def radio_connected(payload: Any, device_id: int = 1) -> Optional[bool]:
+    """Connection state of radio 'device_id' in a RADIO.json answer (an
+    object or a list of objects with 'GerID'), None if not reported."""
+    if isinstance(payload, list):
+        entries = [
+            e
+            for e in payload
+            if isinstance(e, dict)
+            and str(e.get("GerID", device_id)) == str(device_id)
+        ]
+        payload = entries[0] if entries else {}
+    if not isinstance(payload, dict):
+        raise TypeError("RADIO.json: Unknown format")
+    for key, value in payload.items():
+        if str(key).lower() not in _CONNECTED_KEYS:
+            continue
+        text = str(value).strip().lower()
+        if text in _CONNECTED:
+            return True
+        if text in _DISCONNECTED:
+            return False
+    return None
@@ -0,0 +1,156 @@
+import functools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+from firestation_gateway import metrics
+from firestation_gateway.consumers.retry import policy_from_config
+from firestation_gateway.health import HealthPolicy, HealthProber
+
+SELECT = ("least_loaded", "round_robin")
+
+
+@dataclass
+class DevicePolicy:
+    """
+    Radios (GerID) used for sending (params 'devices').
+
+    Attributes:
+        ids (list):   GerID of the devices (1-4).
+        select (str): "least_loaded": the device with the fewest SDS in
+                      flight (then the longest unused one),
+                      "round_robin": the devices in turn.
+    """
+
+    ids: List[int] = field(default_factory=lambda: [1])
+    select: str = "least_loaded"
+
+    def __post_init__(self):
+        if not self.ids or len(set(self.ids)) != len(self.ids):
+            raise ValueError("devices: 'ids' must be unique and not empty")
+        if any(not 1 <= i <= 4 for i in self.ids):
+            raise ValueError("devices: 'ids' must be 1-4 (GerID)")
+        if self.select not in SELECT:
+            raise ValueError(f"devices: 'select' must be one of {SELECT}")
+
+    @classmethod
+    def from_config(cls, config) -> "DevicePolicy":
+        if not isinstance(config, dict):
+            config = {}
+        config = dict(config)
+        if "ids" in config:
+            try:
+                config["ids"] = [int(i) for i in config["ids"]]
+            except (TypeError, ValueError) as e:
+                raise ValueError("devices: Invalid 'ids'.") from e
+        return policy_from_config(cls, config, "devices")
+
+
+class Device:
+    """A radio of the pool and its load."""
+
+    __slots__ = ("device_id", "failures", "in_flight", "last_used", "prober")
+
+    def __init__(self, device_id: int):
+        self.device_id = device_id
+        self.in_flight = 0
+        self.last_used = 0.0
+        # failed sends in a row
+        self.failures = 0
+        self.prober: Optional[HealthProber] = None
+
+    @property
+    def available(self) -> bool:
+        """Not reported down by the health check."""
+        return self.prober is None or self.prober.status.up is not False
+
+
+class DevicePool:
+    """Spread the sends of a consumer across its radios.
+
+    acquire() selects a device as configured, skipping devices whose
+    health check (check_device, params 'health') failed; if all of them
+    are down all are used. A device with failed sends is chosen last
+    among equally loaded ones. Sends, send durations and sends in flight
+    are exported per device (firestation_device_*).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        policy: DevicePolicy,
+        probe: Optional[Callable[..., Any]] = None,
+        health_policy: Optional[HealthPolicy] = None,
+    ):
+        self.name = name
+        self.policy = policy
+        self.devices = [Device(i) for i in policy.ids]
+        self._lock = threading.Lock()
+        self._next = 0
+        self._sends = {}
+        self._latency = {}
+        self._gauges = metrics.GaugeFunctions()
+        for device in self.devices:
+            label = str(device.device_id)
+            for result in ("ok", "failed"):
+                self._sends[device, result] = metrics.DEVICE_SENDS.labels(
+                    name, label, result
+                )
+            self._latency[device] = metrics.DEVICE_SEND_LATENCY.labels(
+                name, label
+            )
+            self._gauges.set(
+                metrics.DEVICE_IN_FLIGHT,
+                lambda d=device: d.in_flight,
+                name,
+                label,
+            )
+            if probe is not None:
+                # one device keeps the name of the consumer as target
+                target = name
+                if len(self.devices) > 1:
+                    target = f"{name}/{device.device_id}"
+                device.prober = HealthProber(
+                    target,
+                    functools.partial(probe, device.device_id),
+                    health_policy,
+                )
+
+    def start(self) -> None:
+        for device in self.devices:
+            if device.prober is not None:
+                device.prober.start()
+
+    def stop(self) -> None:
+        for device in self.devices:
+            if device.prober is not None:
+                device.prober.stop()
+        self._gauges.remove()
+
+    def acquire(self) -> Device:
+        """Select a device for a send, release() it afterwards."""
+        with self._lock:
+            devices = self.devices
+            if self.policy.select == "round_robin":
+                count = len(devices)
+                order = devices[self._next :] + devices[: self._next]
+                device = next((d for d in order if d.available), order[0])
+                self._next = (devices.index(device) + 1) % count
+            else:
+                device = min(
+                    [d for d in devices if d.available] or devices,
+                    key=lambda d: (d.in_flight, d.failures > 0, d.last_used),
+                )
+            device.in_flight += 1
+            device.last_used = time.monotonic()
+            return device
+
+    def release(self, device: Device, ok: bool, duration: float) -> None:
+        """End of a send on 'device' taking 'duration' seconds."""
+        with self._lock:
+            device.in_flight -= 1
+            device.failures = 0 if ok else device.failures + 1
+        self._sends[device, "ok" if ok else "failed"].inc()
+        if ok:
+            self._latency[device].observe(duration)
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from firestation_gateway.consumers.base import BaseConsumerQueued
+from firestation_gateway.eventbus import EventBus
+from firestation_gateway.runtime_asyncio import AsyncioRuntime, _AsyncInput
+
+
+class Recorder(BaseConsumerQueued):
+    def __init__(self, bus):
+        super().__init__("Recorder", bus, {"in_alarm": None})
+        self.handled = []
+        self.threads = set()
+
+    def handle_event(self, event_name, data, evt_cfg=None):
+        self.threads.add(threading.current_thread().name)
+        self.handled.append(data["n"])
+
+
+class FakeInput:
+    """Edge input on an eventfd with a timer 'delay' ns after an edge."""
+
+    def __init__(self, delay, fail=False):
+        self.name = "fake"
+        self.delay = delay
+        self.fail = fail
+        self.fd = os.eventfd(0, os.EFD_NONBLOCK)
+        self.deadline = None
+        self.calls = []
+
+    def fileno(self):
+        return self.fd
+
+    def sample(self, now):
+        self.calls.append("sample")
+
+    def handle_edge(self, now):
+        os.eventfd_read(self.fd)
+        self.calls.append("edge")
+        self.deadline = now + self.delay
+        if self.fail:
+            raise OSError("No space left on device")
+
+    def next_deadline(self):
+        return self.deadline
+
+    def handle_timer(self, now):
+        self.calls.append("timer")
+        self.deadline = None
+
+    def stop(self):
+        pass
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_consumer_task_handles_events_from_loop_and_threads():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(2, thread_name_prefix="io")
+        senders = ThreadPoolExecutor(2, thread_name_prefix="send")
+        runtime = AsyncioRuntime(loop, executor, senders)
+        bus = EventBus()
+        consumer = Recorder(bus)
+        # queued before the start, e.g. replayed from the outbox
+        bus.emit("in_alarm", {"n": 1})
+        runtime.start_consumer(consumer)
+        assert consumer.send_executor is senders
+        bus.emit("in_alarm", {"n": 2})
+        # a producer keeping its own thread
+        await loop.run_in_executor(None, bus.emit, "in_alarm", {"n": 3})
+        await wait_for(lambda: len(consumer.handled) == 3)
+
+        runtime.stop_consumer(consumer)
+        await asyncio.gather(*runtime.tasks.values())
+        executor.shutdown()
+        senders.shutdown()
+        return consumer
+
+    consumer = asyncio.run(scenario())
+    assert consumer.handled == [1, 2, 3]
+    # no consumer thread, the sends run in the shared executor
+    assert not consumer.is_alive()
+    assert all(name.startswith("io") for name in consumer.threads)
+
+
+def test_edge_input_is_driven_by_the_loop():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        inp = FakeInput(delay=20_000_000)
+        watcher = _AsyncInput(loop, inp, {})
+        watcher.start()
+        os.eventfd_write(inp.fd, 1)
+        await wait_for(lambda: "timer" in inp.calls)
+        watcher.stop()
+        os.close(inp.fd)
+        return inp.calls
+
+    assert asyncio.run(scenario()) == ["sample", "edge", "timer"]
+
+
+def test_failing_edge_input_keeps_its_timer():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        inp = FakeInput(delay=20_000_000, fail=True)
+        watcher = _AsyncInput(loop, inp, {})
+        watcher.start()
+        os.eventfd_write(inp.fd, 1)
+        await wait_for(lambda: "timer" in inp.calls)
+        watcher.stop()
+        os.close(inp.fd)
+        return inp.calls
+
+    assert asyncio.run(scenario()) == ["sample", "edge", "timer"]
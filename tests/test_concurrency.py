@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from firestation_gateway.consumers.base import BaseConsumerQueued
+from firestation_gateway.eventbus import EventBus
+
+
+class Failure(Exception):
+    pass
+
+
+class Fanout(BaseConsumerQueued):
+    """Sends every event to 'destinations', each send takes 'latency'."""
+
+    DELIVERY_EXCEPTIONS = (Failure,)
+
+    def __init__(self, destinations, latency=0.1, concurrency=4):
+        config = {"concurrency": concurrency, "retry": {"backoff": 0.01}}
+        super().__init__("Fanout", EventBus(), {"in_alarm": None}, config)
+        self.destinations = destinations
+        self.latency = latency
+        self.failing = set()
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def handle_event(self, event_name, data, evt_cfg=None):
+        return self.deliver_many(
+            [
+                (f"{event_name} -> {d}", self.send, (d,))
+                for d in self.destinations
+            ]
+        )
+
+    def send(self, dest, timeout=10.0):
+        _ = timeout
+        with self.lock:
+            self.threads.add(threading.current_thread().name)
+        time.sleep(self.latency)
+        if dest in self.failing:
+            raise Failure(dest)
+        return dest.upper()
+
+
+def test_destinations_are_sent_concurrently():
+    consumer = Fanout(["a", "b", "c", "d"])
+    start = time.monotonic()
+    results = consumer.handle_event("in_alarm", {})
+    assert time.monotonic() - start < 0.3
+    # in the order of the destinations
+    assert results == ["A", "B", "C", "D"]
+    assert len(consumer.threads) == 4
+    consumer.close()
+
+
+def test_failed_destination_is_retried_alone():
+    consumer = Fanout(["a", "b"], latency=0)
+    consumer.failing.add("b")
+    assert consumer.handle_event("in_alarm", {}) == ["A", None]
+    assert len(consumer._retries) == 1
+    consumer.close()
+
+
+def test_concurrency_one_is_sequential():
+    consumer = Fanout(["a", "b", "c"], latency=0.05, concurrency=1)
+    start = time.monotonic()
+    assert consumer.handle_event("in_alarm", {}) == ["A", "B", "C"]
+    assert time.monotonic() - start >= 0.15
+    assert consumer.threads == {threading.current_thread().name}
+    consumer.close()
+
+
+def test_shared_executor_keeps_the_concurrency():
+    consumer = Fanout(["a", "b", "c", "d"], concurrency=2)
+    shared = ThreadPoolExecutor(8, thread_name_prefix="shared")
+    consumer.send_executor = shared
+    start = time.monotonic()
+    assert consumer.handle_event("in_alarm", {}) == ["A", "B", "C", "D"]
+    # two at a time
+    assert time.monotonic() - start >= 0.2
+    assert all(name.startswith("shared") for name in consumer.threads)
+    consumer.close()
+    shared.shutdown()
+
+
+@pytest.mark.parametrize("value", [0, "many"])
+def test_invalid_concurrency(value):
+    with pytest.raises(ValueError, match="concurrency"):
+        Fanout(["a"], concurrency=value)
@@ -0,0 +1,103 @@
+import types
+
+import pytest
+
+from firestation_gateway.health import HealthProber, HealthStatus
+from firestation_gateway.tetracontrol import (
+    DevicePolicy,
+    DevicePool,
+    TETRAcontrolClient,
+)
+from firestation_gateway.tetracontrol.client import radio_connected
+
+
+def pool(ids, select="least_loaded"):
+    return DevicePool(
+        "Devices", DevicePolicy.from_config({"ids": ids, "select": select})
+    )
+
+
+def set_down(pool_, *device_ids):
+    for device in pool_.devices:
+        device.prober = types.SimpleNamespace(
+            status=HealthStatus(up=device.device_id not in device_ids)
+        )
+
+
+def ids(devices):
+    return [d.device_id for d in devices]
+
+
+def test_least_loaded_device_is_used():
+    devices = pool([1, 2, 3])
+    busy = [devices.acquire() for _ in range(3)]
+    assert sorted(ids(busy)) == [1, 2, 3]
+    devices.release(busy[1], True, 0.1)
+    # the only device without a send in flight
+    assert devices.acquire() is busy[1]
+
+
+def test_failed_device_is_chosen_last():
+    devices = pool([1, 2])
+    first = devices.acquire()
+    devices.release(first, False, 1.0)
+    assert devices.acquire() is not first
+
+
+def test_round_robin():
+    devices = pool([2, 4, 1], "round_robin")
+    chosen = []
+    for _ in range(4):
+        device = devices.acquire()
+        chosen.append(device.device_id)
+        devices.release(device, True, 0.1)
+    assert chosen == [2, 4, 1, 2]
+
+
+@pytest.mark.parametrize("select", ["least_loaded", "round_robin"])
+def test_devices_reported_down_are_skipped(select):
+    devices = pool([1, 2], select)
+    set_down(devices, 1)
+    assert ids(devices.acquire() for _ in range(3)) == [2, 2, 2]
+    # all down: all are used
+    set_down(devices, 1, 2)
+    assert devices.acquire().device_id in (1, 2)
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"ids": []},
+        {"ids": [1, 1]},
+        {"ids": [5]},
+        {"ids": ["x"]},
+        {"select": "random"},
+    ],
+)
+def test_invalid_config(config):
+    with pytest.raises(ValueError, match="devices"):
+        DevicePolicy.from_config(config)
+
+
+@pytest.mark.parametrize(
+    "payload, connected",
+    [
+        ({"GerID": 1, "Connected": True}, True),
+        ({"GerID": 1, "Status": "offline"}, False),
+        ([{"GerID": 1, "online": 1}, {"GerID": 2, "online": 0}], False),
+        ({"GerID": 2, "Name": "MRT"}, None),
+    ],
+)
+def test_radio_connected(payload, connected):
+    assert radio_connected(payload, 2) is connected
+
+
+def test_disconnected_radio_is_down():
+    client = TETRAcontrolClient("http://127.0.0.1:9", "token")
+    client.device_status = lambda device_id, timeout: types.SimpleNamespace(
+        json=lambda: {"GerID": device_id, "Connected": False}
+    )
+    prober = HealthProber("Devices", lambda timeout: client.check_device(3))
+    assert prober.check().up is False
+    assert "not connected" in prober.status.error
+    client.close()
@@ -0,0 +1,89 @@
+import os
+import threading
+
+from firestation_gateway.gpio.edge import EdgeMonitor
+
+
+class FakeInput:
+    """Input on an eventfd, edges are signalled by edge()."""
+
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.fd = os.eventfd(0, os.EFD_NONBLOCK)
+        self.edges = 0
+        self.called = threading.Event()
+        # a timer is due shortly after each edge
+        self.deadline = None
+        self.timers = []
+        self.timed = threading.Event()
+
+    def fileno(self):
+        return self.fd
+
+    def next_deadline(self):
+        return self.deadline
+
+    def edge(self):
+        os.eventfd_write(self.fd, 1)
+
+    def handle_edge(self, now):
+        os.eventfd_read(self.fd)
+        self.edges += 1
+        self.deadline = now + 10_000_000
+        self.called.set()
+        if self.fail:
+            raise OSError("No space left on device")
+
+    def handle_timer(self, now):
+        self.timers.append(now >= self.deadline)
+        self.deadline = None
+        self.timed.set()
+
+
+def test_edges_and_deadlines_are_handled():
+    monitor = EdgeMonitor()
+    monitor.start()
+    inp = FakeInput("in")
+    monitor.register(inp)
+    try:
+        inp.edge()
+        assert inp.called.wait(2)
+        assert inp.timed.wait(2)
+        assert (inp.edges, inp.timers) == (1, [True])
+    finally:
+        monitor.stop()
+        monitor.join(2)
+        os.close(inp.fd)
+
+
+def test_failing_input_does_not_stop_the_monitor():
+    monitor = EdgeMonitor()
+    monitor.start()
+    broken = FakeInput("broken", fail=True)
+    working = FakeInput("working")
+    monitor.register(broken)
+    monitor.register(working)
+    try:
+        broken.edge()
+        assert broken.called.wait(2)
+        working.edge()
+        assert working.called.wait(2)
+        assert monitor.is_alive()
+    finally:
+        monitor.stop()
+        monitor.join(2)
+        os.close(broken.fd)
+        os.close(working.fd)
+
+
+def test_call_at_runs_callback():
+    monitor = EdgeMonitor()
+    monitor.start()
+    called = threading.Event()
+    try:
+        monitor.call_at(0, lambda now: called.set())
+        assert called.wait(2)
+    finally:
+        monitor.stop()
+        monitor.join(2)
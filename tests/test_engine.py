@@ -0,0 +1,208 @@
+import threading
+import types
+
+import pytest
+
+from firestation_gateway.gpio import PollSampler, SampleBatch
+from firestation_gateway.producers.engine import (
+    ACTIVE,
+    ALARM,
+    IDLE,
+    SELFTEST,
+    InputEngine,
+)
+
+MS = 1_000_000
+
+
+class Input:
+    def __init__(self, name="in"):
+        self.name = name
+        self.event_alarm = f"{name}_alarm"
+        self.event_idle = f"{name}_idle"
+        self.event_selftest = f"{name}_selftest"
+        self.emitted = []
+
+    def _emit(self, event, now):
+        self.emitted.append((event, now))
+
+
+def test_alarm_after_the_thresholds():
+    engine = InputEngine()
+    inp = Input()
+    slot = engine.add(inp, (100 * MS, 300 * MS))
+    engine.set_input(slot, True, 0)
+    assert engine.next_deadline(slot) == 100 * MS
+    engine.evaluate(slot, 100 * MS)
+    assert engine.state[slot] == ACTIVE
+    assert engine.next_deadline(slot) == 300 * MS
+    engine.evaluate(slot, 300 * MS)
+    assert engine.state[slot] == ALARM
+    assert engine.next_deadline(slot) is None
+    engine.set_input(slot, False, 400 * MS)
+    engine.evaluate(slot, 400 * MS)
+    assert inp.emitted == [("in_alarm", 300 * MS), ("in_idle", 400 * MS)]
+    assert engine.changed[slot] == 400 * MS
+
+
+def test_short_activation_is_debounced_or_a_selftest():
+    engine = InputEngine()
+    plain, genius = Input("plain"), Input("genius")
+    slots = [
+        engine.add(plain, (10 * MS, 500 * MS)),
+        engine.add(genius, (10 * MS, 500 * MS), SELFTEST),
+    ]
+    for slot in slots:
+        # shorter than the debounce time: nothing
+        engine.set_input(slot, True, 0)
+        engine.set_input(slot, False, 5 * MS)
+        engine.evaluate(slot, 5 * MS)
+        # active, then idle before the alarm
+        engine.set_input(slot, True, 10 * MS)
+        engine.evaluate(slot, 20 * MS)
+        engine.set_input(slot, False, 30 * MS)
+        engine.evaluate(slot, 30 * MS)
+        assert engine.state[slot] == IDLE
+    assert [e for e, _ in plain.emitted] == ["plain_idle"]
+    assert [e for e, _ in genius.emitted] == [
+        "genius_selftest",
+        "genius_idle",
+    ]
+
+
+def test_slots_are_reused():
+    engine = InputEngine()
+    first = engine.add(Input(), (0, 0))
+    engine.remove(first)
+    engine.remove(first)
+    assert engine.add(Input(), (1, 2)) == first
+    assert engine.active_since(first) is None
+    with pytest.raises(ValueError):
+        engine.add(Input(), (2, 1))
+
+
+class Group:
+    """LineGroup values, read once per pass."""
+
+    def __init__(self, size):
+        self.path = "/dev/gpiochip0"
+        self.size = size
+        self.values = 0
+        self.generation = 1
+        self.reads = 0
+
+    def __len__(self):
+        return self.size
+
+    def get_values(self):
+        self.reads += 1
+        return self.values
+
+
+class Line:
+    def __init__(self, name, group=None, index=0):
+        self.name = name
+        self.pin_in = types.SimpleNamespace(group=group, index=index)
+        self.fail = False
+        self.updates = []
+        self.timers = []
+        self.deadline = None
+
+    def update(self, active, now):
+        self.updates.append((active, now))
+        if self.fail:
+            raise OSError("No space left on device")
+
+    def sample(self, now):
+        self.updates.append(("sample", now))
+
+    def next_deadline(self):
+        return self.deadline
+
+    def handle_timer(self, now):
+        self.timers.append(now)
+        self.deadline = None
+
+
+def test_only_changed_lines_are_updated():
+    group = Group(3)
+    lines = [Line(f"l{i}", group, i) for i in range(3)]
+    other = Line("periphery")
+    batch = SampleBatch()
+    for line in lines + [other]:
+        batch.register(line)
+
+    batch.sample(1)
+    # first pass: all lines get their value
+    assert [line.updates for line in lines] == [[(False, 1)]] * 3
+    group.values = 0b100
+    batch.sample(2)
+    batch.sample(3)
+    assert lines[2].updates[1:] == [(True, 2)]
+    assert lines[0].updates[1:] == lines[1].updates[1:] == []
+    assert group.reads == 3
+    # lines without group are sampled every time
+    assert len(other.updates) == 3
+
+
+def test_renewed_group_updates_all_lines():
+    group = Group(2)
+    lines = [Line(f"l{i}", group, i) for i in range(2)]
+    batch = SampleBatch()
+    for line in lines:
+        batch.register(line)
+    batch.sample(1)
+    group.generation += 1
+    batch.sample(2)
+    assert [len(line.updates) for line in lines] == [2, 2]
+
+
+def test_due_timers_are_handled():
+    group = Group(1)
+    line = Line("l0", group)
+    line.deadline = 50 * MS
+    batch = SampleBatch()
+    batch.register(line)
+    batch.sample(10 * MS)
+    assert line.timers == []
+    batch.sample(60 * MS)
+    assert line.timers == [60 * MS]
+    batch.sample(120 * MS)
+    assert line.timers == [60 * MS]
+
+
+def test_failed_update_is_repeated():
+    group = Group(2)
+    lines = [Line(f"l{i}", group, i) for i in range(2)]
+    batch = SampleBatch()
+    for line in lines:
+        batch.register(line)
+    batch.sample(1)
+    lines[0].fail = True
+    group.values = 0b11
+    batch.sample(2)
+    lines[0].fail = False
+    batch.sample(3)
+    batch.sample(4)
+    # the value is passed again until update() has taken it
+    assert lines[0].updates[1:] == [(True, 2), (True, 3)]
+    assert lines[1].updates[1:] == [(True, 2)]
+
+
+def test_sampler_thread_survives_errors():
+    passes = threading.Semaphore(0)
+
+    def sample():
+        passes.release()
+        raise RuntimeError("broken")
+
+    sampler = PollSampler(0.001)
+    sampler.batch.sample = sample
+    sampler.start()
+    try:
+        assert passes.acquire(timeout=2)
+        assert passes.acquire(timeout=2)
+        assert sampler.is_alive()
+    finally:
+        sampler.stop()
+        sampler.join(2)
@@ -0,0 +1,108 @@
+from firestation_gateway.consumers.base import BaseConsumerQueued
+from firestation_gateway.eventbus import EventBus, current_trace, emit_traced
+
+
+class Collector(BaseConsumerQueued):
+    def __init__(self, bus):
+        super().__init__("Collector", bus, {"in_alarm": None})
+        self.handled = []
+
+    def handle_event(self, event_name, data, evt_cfg=None):
+        self.handled.append((event_name, data))
+
+
+def sink(calls, name):
+    def call(event_name, data, evt_cfg):
+        calls.append((name, event_name, data, evt_cfg))
+
+    return call
+
+
+def test_exact_subscription_beats_a_pattern():
+    bus = EventBus()
+    calls = []
+    specific, common = sink(calls, "specific"), sink(calls, "common")
+    bus.subscribe("*_alarm", specific, {"from": "pattern"})
+    bus.subscribe("In_Alarm", specific, {"from": "name"})
+    bus.subscribe("*", common)
+    bus.subscribe("in_idle", common, {"enabled": False})
+    bus.compile(["in_alarm", "in_idle"])
+
+    bus.emit("in_alarm", 1)
+    bus.emit("in_idle", 2)
+    assert calls == [
+        ("specific", "in_alarm", 1, {"from": "name"}),
+        ("common", "in_alarm", 1, None),
+        ("common", "in_idle", 2, None),
+    ]
+
+
+def test_unknown_event_is_resolved_on_first_use():
+    bus = EventBus()
+    calls = []
+    bus.subscribe("*_selftest", sink(calls, "s"))
+    bus.compile(["in_alarm"])
+    bus.emit("other_selftest", 3)
+    bus.emit("other_idle", 4)
+    assert calls == [("s", "other_selftest", 3, None)]
+    assert "other_idle" in bus._routes
+
+
+def test_swap_replaces_the_routes_at_once():
+    bus, staging = EventBus(), EventBus()
+    calls = []
+    consumer = Collector(bus)
+    bus.subscribe("in_alarm", sink(calls, "old"))
+    staging.adopt(bus, [consumer])
+    staging.subscribe("in_alarm", sink(calls, "new"))
+    staging.compile(["in_alarm"])
+    bus.swap(staging)
+    bus.emit("in_alarm", 5)
+    assert calls == [("new", "in_alarm", 5, None)]
+    assert consumer.event_queue.qsize() == 1
+
+
+def test_pyee_style_handlers():
+    bus = EventBus()
+    received = []
+    bus.on("in_alarm", received.append)
+    bus.emit("in_alarm", {"source": "in"})
+    assert received == [{"source": "in"}]
+
+
+def test_failing_sink_does_not_stop_the_others():
+    bus = EventBus()
+    received = []
+
+    def broken(name, data, evt_cfg):
+        raise RuntimeError("full")
+
+    bus.subscribe("in_alarm", broken)
+    bus.on("in_alarm", received.append)
+    bus.emit("in_alarm", 1)
+    assert received == [1]
+
+
+def test_trace_is_not_part_of_the_event_data():
+    bus = EventBus()
+    consumer = Collector(bus)
+    enqueue_latency = consumer._lat["enqueue"]
+    before = sum(enqueue_latency.snapshot()[0])
+    trace = {"edge": 1, "debounce": 2, "emit": 3}
+
+    emit_traced(bus, "in_alarm", {"source": "in"}, trace)
+    assert current_trace() is None
+    consumer.dispatch(consumer.event_queue.get_nowait())
+
+    assert consumer.handled == [("in_alarm", {"source": "in"})]
+    assert sum(enqueue_latency.snapshot()[0]) == before + 1
+
+
+def test_untraced_event():
+    bus = EventBus()
+    consumer = Collector(bus)
+    bus.emit("in_alarm", {"source": "in"})
+    item = consumer.event_queue.get_nowait()
+    assert item[-1] is None
+    consumer.dispatch(item)
+    assert consumer.handled == [("in_alarm", {"source": "in"})]
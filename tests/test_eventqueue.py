@@ -0,0 +1,101 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from firestation_gateway.consumers.eventqueue import (
+    EventQueue,
+    QueuePolicy,
+    get_priority,
+)
+
+
+def item(event_name, n=0):
+    return (event_name, {"n": n}, None, None, n, None)
+
+
+def new_queue(**policy):
+    overflows = []
+    q = EventQueue(
+        QueuePolicy.from_config(policy),
+        lambda it: get_priority(it[0], it[3]),
+        lambda it, action: overflows.append((it[0], it[1]["n"], action)),
+    )
+    return q, overflows
+
+
+def drain(q):
+    items = []
+    while True:
+        try:
+            items.append(q.get_nowait())
+        except queue.Empty:
+            return [(it[0], it[1]["n"]) for it in items]
+
+
+def test_alarm_before_backlog_and_markers_first():
+    q, _ = new_queue()
+    q.put(item("in_idle", 1))
+    q.put(item("in_alarm", 2))
+    q.put(("system_stop", None, None, None, 0, None))
+    assert q.get_nowait()[0] == "system_stop"
+    assert drain(q) == [("in_alarm", 2), ("in_idle", 1)]
+
+
+def test_drop_oldest_of_the_lowest_class():
+    q, overflows = new_queue(size=2)
+    q.put(item("in_idle", 1))
+    q.put(item("in_idle", 2))
+    q.put(item("in_alarm", 3))
+    q.put(item("in_idle", 4))
+    assert overflows == [("in_idle", 1, "dropped"), ("in_idle", 2, "dropped")]
+    assert drain(q) == [("in_alarm", 3), ("in_idle", 4)]
+
+
+def test_drop_new_event_of_a_lower_class():
+    q, overflows = new_queue(size=2)
+    q.put(item("in_alarm", 1))
+    q.put(item("in_alarm", 2))
+    q.put(item("in_idle", 3))
+    assert overflows == [("in_idle", 3, "dropped")]
+    assert drain(q) == [("in_alarm", 1), ("in_alarm", 2)]
+
+
+def test_block_waits_for_space():
+    q, overflows = new_queue(size=1, overflow="block", block_timeout=5)
+    q.put(item("in_alarm", 1))
+    threading.Timer(0.1, q.get).start()
+    t_start = time.monotonic()
+    q.put(item("in_alarm", 2))
+    assert time.monotonic() - t_start >= 0.05
+    assert not overflows
+    assert drain(q) == [("in_alarm", 2)]
+
+
+def test_block_timeout_drops_the_oldest():
+    q, overflows = new_queue(size=1, overflow="block", block_timeout=0.05)
+    q.put(item("in_alarm", 1))
+    q.put(item("in_alarm", 2))
+    assert overflows == [("in_alarm", 1, "dropped")]
+    # not in an event loop
+    q.put(item("in_alarm", 3), block=False)
+    assert overflows[-1] == ("in_alarm", 2, "dropped")
+
+
+def test_spill_keeps_all_events_in_order(tmp_path):
+    q, overflows = new_queue(size=2, overflow="spill", spill_path=tmp_path)
+    for n in range(5):
+        q.put(item("in_idle", n))
+    q.put(item("in_alarm", 5))
+    assert q.qsize() == 6
+    assert {action for _, _, action in overflows} == {"spilled"}
+    assert drain(q) == [("in_alarm", 5)] + [("in_idle", n) for n in range(5)]
+    q.close()
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        QueuePolicy.from_config({"overflow": "never"})
+    with pytest.raises(ValueError):
+        QueuePolicy.from_config({"size": "many"})
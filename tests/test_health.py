@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from firestation_gateway import health, metrics
+from firestation_gateway.health import HealthPolicy, HealthProber
+
+
+class Probe:
+    """Fails with the queued errors, then succeeds."""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, timeout):
+        _ = timeout
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+def wait_up(prober, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not prober.status.up and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def gauge(metric, target):
+    return metric._children[(target,)]()
+
+
+def test_failures_and_recovery():
+    probe = Probe([ConnectionError("refused"), ValueError("bad answer")])
+    prober = HealthProber("HealthA", probe)
+    status = prober.check()
+    assert status.up is False and status.failures == 1
+    assert status.error == "refused"
+    assert prober.check().failures == 2
+    status = prober.check()
+    assert status.up is True and status.failures == 0
+    assert status.latency is not None
+
+
+def test_unexpected_error_counts_as_failed():
+    prober = HealthProber("HealthE", Probe([KeyError("GerID")]))
+    failed = prober._checks["failed"]
+    before = failed.value
+    status = prober.check()
+    assert status.up is False and status.error == "'GerID'"
+    assert failed.value == before + 1
+    assert prober.check().up is True
+
+
+def test_backoff_doubles_up_to_the_maximum():
+    policy = HealthPolicy(backoff=5, backoff_max=30)
+    assert [policy.delay(n) for n in range(1, 6)] == [5, 10, 20, 30, 30]
+    with pytest.raises(ValueError, match="health"):
+        HealthPolicy.from_config({"timeout": 0})
+
+
+def test_status_is_exported_by_the_last_prober():
+    old = HealthProber("HealthB", Probe([OSError("down")]))
+    new = HealthProber("HealthB", Probe())
+    old.check()
+    old.start()
+    new.start()
+    try:
+        wait_up(new)
+        assert health.get_status("HealthB") is new.status
+        old.stop()
+        assert health.get_status("HealthB") is new.status
+        assert gauge(metrics.HEALTH_UP, "HealthB") == 1
+    finally:
+        new.stop()
+    assert health.get_status("HealthB") is None
+    assert ("HealthB",) not in metrics.HEALTH_UP._children
+
+
+def test_failed_checks_are_repeated_in_the_background():
+    probe = Probe([OSError("down")])
+    prober = HealthProber(
+        "HealthC", probe, HealthPolicy(interval=60, backoff=0.01)
+    )
+    prober.start()
+    try:
+        wait_up(prober)
+        assert probe.calls == 2
+        assert prober.status.up is True
+    finally:
+        prober.stop()
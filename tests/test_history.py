@@ -0,0 +1,66 @@
+import json
+
+from click.testing import CliRunner
+
+from firestation_gateway import history
+from firestation_gateway.core import main
+
+
+def test_recorded_events_and_outcomes(tmp_path):
+    db = tmp_path / "history.db"
+    recorder = history.HistoryRecorder(
+        history.HistoryPolicy(path=str(db)), prune=False
+    )
+    recorder.record_event("eingang3_alarm", {"source": "Eingang3"})
+    recorder.record_delivery(
+        "TC", "eingang3_alarm", {"source": "Eingang3"}, "delivered"
+    )
+    recorder.record_event("eingang4_idle", {"source": "Eingang4"})
+    recorder.flush()
+    recorder.close()
+
+    connection = history.connect(str(db))
+    try:
+        rows = history.query(connection, source="EINGANG3")
+        assert [(r["kind"], r["outcome"]) for r in rows] == [
+            ("delivery", "delivered"),
+            ("event", None),
+        ]
+        rows = history.query(connection, event_type="idle")
+        assert [r["event"] for r in rows] == ["eingang4_idle"]
+        assert not history.query(connection, consumer="Connect")
+    finally:
+        connection.close()
+
+    result = CliRunner().invoke(
+        main,
+        ["history", "--db", str(db), "--consumer", "TC", "--json"],
+    )
+    assert result.exit_code == 0, result.output
+    (line,) = result.output.splitlines()
+    assert json.loads(line)["event"] == "eingang3_alarm"
+
+
+def test_full_ring_drops_the_oldest(tmp_path):
+    recorder = history.HistoryRecorder(
+        history.HistoryPolicy(path=str(tmp_path / "h.db"), ring_size=2)
+    )
+    for n in range(3):
+        recorder.record_event(f"in{n}_alarm", None)
+    assert [row[4] for row in recorder._ring] == ["in1_alarm", "in2_alarm"]
+    recorder.close()
+
+
+def test_history_command_uses_the_config_of_the_group(tmp_path):
+    db = tmp_path / "history.db"
+    config = tmp_path / "config.yaml"
+    config.write_text(f"history:\n  path: {db}\n")
+    runner = CliRunner()
+
+    result = runner.invoke(main, ["--config", str(config), "history"])
+    assert result.exit_code == 1
+    assert str(db) in result.output
+
+    history.connect(str(db)).close()
+    result = runner.invoke(main, ["--config", str(config), "history"])
+    assert result.exit_code == 0, result.output
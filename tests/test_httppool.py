@@ -0,0 +1,118 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from firestation_gateway.httppool import PooledSession, is_retryable
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self, body=b"ok"):
+        self.server.clients.append(
+            (self.client_address[1], self.headers.get("Connection"))
+        )
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._answer()
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        self.server.clients.append((self.client_address[1], "head"))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.clients = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_connection_is_reused(server):
+    session = PooledSession(base_url(server), prewarm=False)
+    try:
+        for _ in range(3):
+            r = session.post(base_url(server) + "/API/SDS", data="x")
+            assert r.status_code == 200
+    finally:
+        session.close()
+    ports = {port for port, _ in server.clients}
+    assert len(server.clients) == 3 and len(ports) == 1
+
+
+def test_without_keepalive_every_request_connects(server):
+    session = PooledSession(
+        base_url(server), keepalive=False, prewarm=False, refresh_interval=0
+    )
+    try:
+        for _ in range(2):
+            session.post(base_url(server), data="x")
+    finally:
+        session.close()
+    assert [c for _, c in server.clients] == ["close", "close"]
+    assert len({port for port, _ in server.clients}) == 2
+
+
+def test_prewarm_opens_the_connection_used_later(server):
+    session = PooledSession(base_url(server), refresh_interval=0)
+    try:
+        session._thread.join(5)
+        session.post(base_url(server), data="x")
+    finally:
+        session.close()
+    (head_port, kind), (post_port, _) = server.clients
+    assert kind == "head" and head_port == post_port
+
+
+def test_ping_of_an_unreachable_server():
+    session = PooledSession("http://127.0.0.1:9", prewarm=False)
+    try:
+        assert not session.ping()
+    finally:
+        session.close()
+
+
+def test_invalid_config():
+    with pytest.raises(ValueError, match="HTTP pool"):
+        PooledSession.from_config("http://127.0.0.1:9", {"pool_size": "x"})
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+
+@pytest.mark.parametrize(
+    "exc, retryable",
+    [
+        (requests.exceptions.ConnectionError(), True),
+        (requests.exceptions.Timeout(), True),
+        (http_error(503), True),
+        (http_error(429), True),
+        (http_error(400), False),
+        (requests.exceptions.InvalidURL(), False),
+    ],
+)
+def test_is_retryable(exc, retryable):
+    assert is_retryable(exc) is retryable
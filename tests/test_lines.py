@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+from firestation_gateway.eventbus import EventBus
+from firestation_gateway.gpio import lines, sample_all
+from firestation_gateway.producers.generic_input import GenericInput
+
+
+class FakeChip:
+    """The line request ioctls of a gpiochip, levels by line offset."""
+
+    def __init__(self):
+        self.levels = {}
+        self.offsets = []
+        self.config = None
+        self.reads = 0
+        self.written = []
+
+    def ioctl(self, fd, request, arg):
+        _ = fd
+        if request == lines._GET_LINE_IOCTL:
+            self.offsets = list(arg.offsets[: arg.num_lines])
+            self.config = arg.config
+            arg.fd = os.eventfd(0)
+        elif request == lines._GET_VALUES_IOCTL:
+            self.reads += 1
+            arg.bits = sum(
+                int(self.levels.get(offset, 0)) << i
+                for i, offset in enumerate(self.offsets)
+                if arg.mask >> i & 1
+            )
+        elif request == lines._SET_VALUES_IOCTL:
+            self.written.append((arg.bits, arg.mask))
+
+
+@pytest.fixture
+def chip(tmp_path, monkeypatch):
+    fake = FakeChip()
+    monkeypatch.setattr(lines.fcntl, "ioctl", fake.ioctl)
+    fake.path = str(tmp_path / "gpiochip0")
+    with open(fake.path, "w", encoding="utf-8"):
+        pass
+    return fake
+
+
+def test_inputs_of_a_chip_share_one_request(chip):
+    a = lines.request_input(chip.path, 4, "poll")
+    b = lines.request_input(chip.path, 7, "poll", bias="pull_up")
+    assert a.group is b.group
+    assert chip.offsets == [4, 7]
+    assert (a.index, b.index) == (0, 1)
+
+    chip.levels = {7: 1}
+    group = a.group
+    group.freeze()
+    assert (a.read(), b.read()) == (False, True)
+    group.thaw()
+    assert chip.reads == 1
+
+    generation = group.generation
+    a.close()
+    # renewed without the line, indexes change
+    assert chip.offsets == [7]
+    assert group.generation > generation and b.index == 0
+    b.close()
+    assert group.fd == -1
+
+
+def test_flags_of_most_lines_are_the_default(chip):
+    for offset in (1, 2):
+        lines.request_input(chip.path, offset, "edge", bias="pull_up")
+    lines.request_input(chip.path, 3, "edge", active_low=True)
+    config = chip.config
+    assert config.flags & lines.BIAS_FLAGS["pull_up"]
+    assert config.num_attrs == 1
+    attr = config.attrs[0]
+    assert attr.attr.id == lines._ATTR_ID_FLAGS
+    assert attr.attr.value & lines._FLAG_ACTIVE_LOW
+    assert attr.mask == 0b100
+
+
+def test_line_used_twice(chip):
+    lines.request_input(chip.path, 1, "poll")
+    with pytest.raises(ValueError, match="used twice"):
+        lines.request_input(chip.path, 1, "poll")
+    with pytest.raises(ValueError, match="bias"):
+        lines.request_input(chip.path, 2, "poll", bias="up")
+
+
+def test_outputs_are_set_together(chip):
+    out1 = lines.request_output(chip.path, 5, owner="Out")
+    out2 = lines.request_output(chip.path, 6, value=True)
+    # initial values are part of the request
+    assert chip.config.attrs[0].attr.id == lines._ATTR_ID_OUTPUT_VALUES
+    assert chip.config.attrs[0].attr.value == 0b10
+    out1.group.set_values({out1: True, out2: False})
+    assert chip.written == [(0b01, 0b11)]
+    # the same owner again (config reload) shares the line
+    assert lines.request_output(chip.path, 5, owner="Out") is out1
+    assert out1.users == 2
+
+
+def test_polled_inputs_are_read_with_one_ioctl(chip, monkeypatch):
+    monkeypatch.setattr(lines, "SUPPORTED", True)
+    inputs = [
+        GenericInput(
+            f"In{n}",
+            EventBus(),
+            {},
+            {
+                "line": n,
+                "path": chip.path,
+                "sampling": "poll",
+                "time_alarm": 1,
+            },
+        )
+        for n in range(3)
+    ]
+    try:
+        assert all(isinstance(i.pin_in, lines.Line) for i in inputs)
+        reads = chip.reads
+        sample_all(inputs)
+        assert chip.reads == reads + 1
+    finally:
+        for i in inputs:
+            i.close()
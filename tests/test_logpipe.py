@@ -0,0 +1,64 @@
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+from firestation_gateway import logpipe
+
+
+@pytest.fixture
+def root_handlers():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    logpipe.flush()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def record(msg, *args):
+    return logging.LogRecord(
+        "test", logging.INFO, __file__, 1, msg, args, None
+    )
+
+
+def test_full_ring_drops_the_oldest():
+    ring = logpipe.LogRing(size=2)
+    dropped = ring._dropped.value
+    for n in range(3):
+        ring.put_nowait(record("n=%d", n))
+    assert ring.qsize() == 2
+    assert ring._dropped.value == dropped + 1
+    assert [ring.get().getMessage() for _ in range(2)] == ["n=1", "n=2"]
+    with pytest.raises(queue.Empty):
+        ring.get(block=False)
+
+
+def test_json_lines():
+    formatter = logpipe.JsonFormatter()
+    entry = json.loads(formatter.format(record("Alarm %s", "in")))
+    assert entry["message"] == "Alarm in"
+    assert entry["level"] == "INFO"
+    assert entry["time"].endswith("+00:00")
+    try:
+        raise OSError("disk full")
+    except OSError:
+        failed = record("failed")
+        failed.exc_info = sys.exc_info()
+    assert "OSError: disk full" in json.loads(formatter.format(failed))["exc"]
+
+
+def test_async_records_are_written_by_flush(capsys, root_handlers):
+    logpipe.setup(logging.INFO, log_async=True, log_json=True)
+    logging.getLogger("firestation_gateway.test").info("event %d", 1)
+    logpipe.flush()
+    lines = capsys.readouterr().err.splitlines()
+    assert [json.loads(line)["message"] for line in lines] == ["event 1"]
+    # written directly after flush()
+    logging.getLogger("firestation_gateway.test").info("event %d", 2)
+    assert "event 2" in capsys.readouterr().err
@@ -0,0 +1,80 @@
+import urllib.request
+
+from firestation_gateway import metrics
+from firestation_gateway.metrics_server import start_server
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry()
+    hist = registry.histogram(
+        "lat_seconds", "Latency", ("stage",), buckets=(0.1, 1.0)
+    )
+    child = hist.labels("queue")
+    child.observe(0.05)
+    child.observe_ns(500_000_000)
+    child.observe(5)
+    assert registry.render().splitlines() == [
+        "# HELP lat_seconds Latency",
+        "# TYPE lat_seconds histogram",
+        'lat_seconds_bucket{stage="queue",le="0.1"} 1',
+        'lat_seconds_bucket{stage="queue",le="1.0"} 2',
+        'lat_seconds_bucket{stage="queue",le="+Inf"} 3',
+        'lat_seconds_sum{stage="queue"} 5.55',
+        'lat_seconds_count{stage="queue"} 3',
+    ]
+
+
+def test_counter_and_gauge():
+    registry = metrics.Registry()
+    counter = registry.counter("sent_total", "Sent", ("consumer",))
+    counter.labels("a").inc()
+    counter.labels("a").inc(2)
+    gauge = registry.gauge("depth", "Depth")
+    gauge.set_function(lambda: 7)
+    text = registry.render()
+    assert 'sent_total{consumer="a"} 3' in text
+    assert "\ndepth 7\n" in text
+    # the same name returns the registered metric
+    assert registry.counter("sent_total", "Sent", ("consumer",)) is counter
+
+
+def test_gauge_without_value_is_left_out():
+    registry = metrics.Registry()
+    gauge = registry.gauge("latency", "Latency", ("consumer",))
+    gauge.set_function(lambda: float(None), "a")
+    gauge.set_function(lambda: 0.5, "b")
+    lines = registry.render().splitlines()
+    assert 'latency{consumer="b"} 0.5' in lines
+    assert not any('consumer="a"' in line for line in lines)
+
+
+def test_gauge_functions_are_removed_with_their_owner():
+    gauge = metrics.Registry().gauge("depth", "Depth", ("consumer",))
+    old = metrics.GaugeFunctions()
+    old.set(gauge, lambda: 1, "a")
+    new = metrics.GaugeFunctions()
+    new.set(gauge, lambda: 2, "a")
+    # replaced by the new owner: kept
+    old.remove()
+    assert list(gauge.render())[-1] == 'depth{consumer="a"} 2'
+    new.remove()
+    assert len(list(gauge.render())) == 2
+
+
+def test_metrics_endpoint():
+    metrics.STAGE_LATENCY.labels("queue", "Endpoint").observe(0.001)
+    server = start_server({"port": 0})
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(
+            f"http://127.0.0.1:{port}/metrics", timeout=5
+        ) as r:
+            body = r.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert "# TYPE firestation_stage_latency_seconds histogram" in body
+    assert (
+        'firestation_stage_latency_seconds_count{stage="queue",'
+        'consumer="Endpoint"} 1' in body
+    )
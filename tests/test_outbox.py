@@ -0,0 +1,161 @@
+import threading
+
+import pytest
+
+from firestation_gateway.consumers import outbox as outbox_module
+from firestation_gateway.consumers.base import BaseConsumerQueued
+from firestation_gateway.consumers.outbox import Outbox
+from firestation_gateway.eventbus import EventBus
+
+
+class Failure(Exception):
+    pass
+
+
+class Sink(BaseConsumerQueued):
+    """Delivers every event to send(), failing the first 'fail' calls."""
+
+    DELIVERY_EXCEPTIONS = (Failure,)
+
+    def __init__(self, path, fail=0, retry=None):
+        config = {
+            "outbox": {"path": str(path), "commit_interval": 0},
+            "retry": retry or {"backoff": 0.01, "backoff_max": 0.01},
+        }
+        super().__init__("Sink", EventBus(), {"in_alarm": None}, config)
+        self.fail = fail
+        self.sent = []
+
+    def handle_event(self, event_name, data, evt_cfg=None):
+        self.deliver(event_name, self.send, data)
+
+    def send(self, data, timeout=10.0):
+        _ = timeout
+        if self.fail:
+            self.fail -= 1
+            raise Failure("down")
+        self.sent.append(data)
+        return True
+
+
+def run_once(consumer):
+    consumer.dispatch(consumer.event_queue.get(timeout=1))
+
+
+def restart(consumer, path):
+    consumer.close()
+    return Sink(path)
+
+
+def test_delivered_event_is_not_replayed(tmp_path):
+    consumer = Sink(tmp_path)
+    consumer.enqueue("in_alarm", {"source": "in"})
+    run_once(consumer)
+    assert consumer.sent == [{"source": "in"}]
+    assert not consumer.outbox._seq_segment
+
+    consumer = restart(consumer, tmp_path)
+    assert consumer.event_queue.qsize() == 0
+    consumer.close()
+
+
+def test_given_up_event_is_not_replayed(tmp_path):
+    consumer = Sink(tmp_path, fail=1, retry={"deadline": 0})
+    consumer.enqueue("in_alarm", {"source": "in"})
+    run_once(consumer)
+    assert consumer.sent == []
+
+    consumer = restart(consumer, tmp_path)
+    assert consumer.event_queue.qsize() == 0
+    consumer.close()
+
+
+def test_retried_event_is_acked_after_delivery(tmp_path):
+    consumer = Sink(tmp_path, fail=1)
+    consumer.enqueue("in_alarm", {"source": "in"})
+    run_once(consumer)
+    # waiting for the retry: still pending
+    assert consumer.outbox._seq_segment
+    while consumer._retries:
+        consumer.process_retries()
+    assert consumer.sent == [{"source": "in"}]
+    assert not consumer.outbox._seq_segment
+
+    consumer = restart(consumer, tmp_path)
+    assert consumer.event_queue.qsize() == 0
+    consumer.close()
+
+
+def test_pending_event_is_replayed(tmp_path):
+    consumer = Sink(tmp_path)
+    consumer.enqueue("in_alarm", {"source": "in"})
+
+    consumer = restart(consumer, tmp_path)
+    assert consumer.event_queue.qsize() == 1
+    run_once(consumer)
+    assert consumer.sent == [{"source": "in"}]
+    consumer.close()
+
+
+def test_segments_are_compacted(tmp_path):
+    outbox = Outbox(tmp_path, segment_size=64, commit_interval=0)
+    seqs = [outbox.append("in_alarm", {"n": n}) for n in range(10)]
+    assert len(list(tmp_path.glob("*.seg"))) > 1
+    for seq in seqs:
+        outbox.ack(seq)
+    outbox.close()
+    assert len(list(tmp_path.glob("*.seg"))) == 1
+    outbox = Outbox(tmp_path)
+    assert outbox.replay() == []
+    outbox.close()
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    outbox = Outbox(tmp_path, commit_interval=0)
+    outbox.append("in_alarm", {"n": 1})
+    outbox.append("in_alarm", {"n": 2})
+    outbox.close()
+    (segment,) = tmp_path.glob("*.seg")
+    data = segment.read_bytes()
+    # a crash in the middle of the last record
+    segment.write_bytes(data[:-3])
+    outbox = Outbox(tmp_path)
+    assert [event[2] for event in outbox.replay()] == [{"n": 1}]
+    outbox.close()
+
+
+def test_failed_outbox_write_keeps_the_event(tmp_path, monkeypatch):
+    consumer = Sink(tmp_path)
+
+    def append(event_name, data):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(consumer.outbox, "append", append)
+    consumer.enqueue("in_alarm", {"n": 1})
+    run_once(consumer)
+    assert consumer.sent == [{"n": 1}]
+    consumer.close()
+
+
+def test_commit_thread_survives_fsync_errors(tmp_path, monkeypatch):
+    synced = threading.Semaphore(0)
+
+    def fsync(fd):
+        synced.release()
+        raise OSError("I/O error")
+
+    outbox = Outbox(tmp_path, commit_interval=0)
+    monkeypatch.setattr(outbox_module.os, "fsync", fsync)
+    outbox.append("in_alarm", {"n": 1})
+    assert synced.acquire(timeout=2)
+    outbox.append("in_alarm", {"n": 2})
+    assert synced.acquire(timeout=2)
+    assert outbox._thread.is_alive()
+    monkeypatch.undo()
+    outbox.close()
+
+
+@pytest.mark.parametrize("config", [{}, {"path": "x", "segment_size": "a"}])
+def test_invalid_config(config):
+    with pytest.raises(ValueError):
+        Outbox.from_config(config, "Sink")
@@ -0,0 +1,69 @@
+import logging
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import firestation_gateway
+from firestation_gateway import consumers, producers
+from firestation_gateway.plugins import PluginRegistry
+from firestation_gateway.startup import StartupProfile
+
+
+def test_builtin_is_imported_on_first_use():
+    registry = PluginRegistry(
+        "firestation_gateway.consumers",
+        "firestation_gateway.test_plugins",
+        {"output": ".generic_output:GenericOutput"},
+    )
+    assert registry.names() == ["output"]
+    assert not registry.load_times
+    cls = registry.get("output")
+    assert cls.__name__ == "GenericOutput"
+    assert registry.get("output") is cls
+    assert list(registry.load_times) == ["output"]
+    assert registry.get("missing") is None
+
+
+def test_classes_stay_importable_from_the_packages():
+    assert consumers.Connect is consumers.get_consumer("connect")
+    assert producers.Genius is producers.get_producer("genius")
+    with pytest.raises(AttributeError):
+        _ = consumers.Missing
+
+
+def test_gpio_config_does_not_import_requests():
+    code = (
+        "import sys\n"
+        "from firestation_gateway.consumers import get_consumer\n"
+        "from firestation_gateway.producers import get_producer\n"
+        "get_consumer('generic-output')\n"
+        "get_producer('generic-input')\n"
+        "print('requests' in sys.modules)\n"
+    )
+    src = Path(firestation_gateway.__file__).parents[1]
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+        env={"PYTHONPATH": str(src)},
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_startup_phases(caplog):
+    profile = StartupProfile()
+    profile.mark("config")
+    profile.mark("consumers", ("import connect", 0.0))
+    names = [name for name, _ in profile.phases]
+    assert names[-3:] == ["config", "import connect", "consumers"]
+    assert all(seconds >= 0 for _, seconds in profile.phases[-3:])
+
+    with caplog.at_level(logging.INFO, "firestation_gateway.startup"):
+        StartupProfile(enabled=False).report()
+        assert not caplog.records
+        profile.report()
+    assert caplog.records[0].getMessage().startswith("Startup: ")
+    assert len(caplog.records) == len(profile.phases) + 1
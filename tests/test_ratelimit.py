@@ -0,0 +1,79 @@
+import pytest
+
+from firestation_gateway.consumers import base
+from firestation_gateway.consumers.coalesce import Coalescer
+from firestation_gateway.consumers.generic_webhook import GenericWebhook
+from firestation_gateway.consumers.ratelimit import RateLimit, TokenBucket
+from firestation_gateway.eventbus import EventBus
+
+
+def test_token_bucket_burst_and_refill():
+    bucket = TokenBucket(rate=1.0, burst=2)
+    assert bucket.take(now=bucket._t)
+    assert bucket.take(now=bucket._t)
+    assert not bucket.take(now=bucket._t)
+    assert bucket.take(now=bucket._t + 1.0)
+    # never more than 'burst' tokens after a quiet time
+    t = bucket._t + 60
+    assert [bucket.take(now=t) for _ in range(3)] == [True, True, False]
+
+
+@pytest.mark.parametrize(
+    "config", [{"per_minute": -1}, {"burst": 0}, {"per_minutes": 1}]
+)
+def test_invalid_rate_limit(config):
+    with pytest.raises(ValueError):
+        RateLimit.from_config(config)
+
+
+def item(event_name):
+    return (event_name, {"source": "in"}, None, None, 0, None)
+
+
+def test_coalescer_collapses_repeated_events():
+    coalescer = Coalescer()
+    assert coalescer.add("in", item("in_alarm"), 5, now=0)[0] is not None
+    # held back, the later one replaces it
+    assert coalescer.add("in", item("in_alarm"), 5, now=1)[0] is None
+    _, dropped, reason = coalescer.add("in", item("in_alarm"), 5, now=2)
+    assert dropped is not None and reason
+    assert coalescer
+    # same as the event sent last: dropped at the end of the window
+    ((held, reason),) = coalescer.due(now=5)
+    assert held[0] == "in_alarm" and reason
+    assert not coalescer
+
+
+def test_coalescer_passes_on_a_changed_event():
+    coalescer = Coalescer()
+    coalescer.add("in", item("in_alarm"), 5, now=0)
+    coalescer.add("in", item("in_idle"), 5, now=1)
+    assert coalescer.due(now=4) == []
+    ((held, reason),) = coalescer.due(now=5)
+    assert held[0] == "in_idle" and reason == ""
+
+
+def test_all_destinations_rate_limited_is_suppressed(monkeypatch):
+    outcomes = []
+    monkeypatch.setattr(
+        base.history,
+        "record_delivery",
+        lambda consumer, event_name, data, outcome, detail="": (
+            outcomes.append((outcome, detail))
+        ),
+    )
+    consumer = GenericWebhook(
+        "Hooks",
+        EventBus(),
+        {"in_alarm": None},
+        {
+            "testmode": True,
+            "endpoints": ["http://127.0.0.1:9/limited"],
+            "rate_limit": {"per_minute": 1, "burst": 1},
+        },
+    )
+    for _ in range(2):
+        consumer.enqueue("in_alarm", {"source": "in"})
+        consumer.dispatch(consumer.event_queue.get_nowait())
+    consumer.close()
+    assert outcomes == [("handled", ""), ("suppressed", "rate_limited")]
@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+
+import pytest
+
+from firestation_gateway import metrics
+from firestation_gateway.consumers.base import BaseConsumerQueued
+from firestation_gateway.eventbus import EventBus
+from firestation_gateway.gateway import (
+    ConfigWatcher,
+    Gateway,
+    create_consumer,
+)
+from firestation_gateway.runtime import ThreadRuntime
+
+
+class Recorder(BaseConsumerQueued):
+    """Records the handled events, each taking 'delay' seconds."""
+
+    def __init__(self, name, handled, delay=0.0):
+        super().__init__(name, EventBus(), {"in_alarm": None})
+        self.handled = handled
+        self.delay = delay
+        self.busy = threading.Event()
+
+    def handle_event(self, event_name, data, evt_cfg=None):
+        self.busy.set()
+        time.sleep(self.delay)
+        self.handled.append((self.name, data["n"]))
+
+
+def test_retire_hands_queued_events_over_once_in_order():
+    handled = []
+    old = Recorder("Old", handled, delay=0.05)
+    new = Recorder("New", handled)
+    old.start()
+    for n in range(20):
+        old.enqueue("in_alarm", {"n": n})
+    # a delivery is in flight while the consumer is replaced
+    assert old.busy.wait(2)
+    ThreadRuntime().retire_consumer(old, new)
+    new.start()
+    old.join(5)
+    assert not old.is_alive()
+    while new.event_queue.qsize():
+        time.sleep(0.01)
+    new.stop()
+    new.join(5)
+
+    assert [n for _, n in handled] == list(range(20))
+    assert handled[0] == ("Old", 0)
+    assert handled[-1][0] == "New"
+
+
+def test_retire_without_running_consumer():
+    handled = []
+    old = Recorder("Old", handled)
+    new = Recorder("New", handled)
+    old.enqueue("in_alarm", {"n": 1})
+    old.retire(new)
+    old.wait_handed_over(old.is_alive)
+    assert old.retired
+    assert new.event_queue.qsize() == 1
+
+
+def test_closed_consumer_removes_its_gauges():
+    gone = Recorder("Gone", [])
+    old = Recorder("Kept", [])
+    new = Recorder("Kept", [])
+    new.enqueue("in_alarm", {"n": 1})
+    gone.close()
+    # closed after the successor of the same name registered its gauges
+    old.close()
+
+    depth = list(metrics.QUEUE_DEPTH.render())
+    assert 'firestation_queue_depth{consumer="Kept"} 1' in depth
+    assert not any('consumer="Gone"' in line for line in depth)
+    assert not any(
+        key[0] == "Gone" for key in metrics.QUEUE_CLASS_DEPTH._children
+    )
+
+
+def config(line_params):
+    return {
+        "producers": [
+            {
+                "name": "Input1",
+                "type": "generic-input",
+                "params": dict(
+                    {"line": -1, "time_alarm": 100, "simulate": "memory"},
+                    **line_params,
+                ),
+                "events": {"alarm": None},
+            }
+        ],
+        "consumers": [
+            {
+                "name": "Log",
+                "type": "generic-printout",
+                "params": {},
+                "events": {"input1_alarm": None},
+            }
+        ],
+    }
+
+
+def test_failed_producer_keeps_running_config():
+    gateway = Gateway(config({}))
+    gateway.start(ThreadRuntime())
+    try:
+        old = gateway.producers["Input1"]
+        assert gateway.reload(config({"bias": "invalid"}))
+        producer = gateway.producers["Input1"]
+        assert producer is not old
+        assert producer.is_alive()
+        assert gateway.config["producers"][0]["params"].get("bias") is None
+    finally:
+        gateway.stop()
+
+
+def test_reload_replaces_changed_entries_only():
+    gateway = Gateway(config({}))
+    gateway.start(ThreadRuntime())
+    try:
+        producer = gateway.producers["Input1"]
+        consumer = gateway.consumers["Log"]
+        assert gateway.reload(config({}))
+        assert gateway.producers["Input1"] is producer
+        assert gateway.consumers["Log"] is consumer
+
+        changed = config({})
+        changed["consumers"][0]["params"] = {"note": "changed"}
+        assert gateway.reload(changed)
+        assert gateway.producers["Input1"] is producer
+        successor = gateway.consumers["Log"]
+        assert successor is not consumer
+        ((sink, _),) = gateway.emitter.routes("input1_alarm")
+        assert sink.__self__ is successor
+
+        # invalid: the running config stays
+        assert not gateway.reload({"producers": []})
+        assert gateway.consumers["Log"] is successor
+    finally:
+        gateway.stop()
+
+
+def test_config_watcher_reports_written_and_replaced_files(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("a: 1\n")
+    changed = threading.Event()
+    watcher = ConfigWatcher(str(path), changed.set)
+    try:
+        assert not changed.wait(0.1)
+        path.write_text("a: 22\n")
+        assert changed.wait(2)
+        changed.clear()
+        # saved by an editor: written to another file and renamed
+        new = tmp_path / "config.yaml.new"
+        new.write_text("a: 333\n")
+        os.replace(new, path)
+        assert changed.wait(2)
+    finally:
+        watcher.close()
+
+
+def test_invalid_worker_config_fails_before_the_worker_starts():
+    config = {
+        "name": "Hooks",
+        "type": "generic-webhook",
+        "events": {"in_alarm": None},
+        "params": {"process": True},
+    }
+    with pytest.raises(ValueError, match="endpoints"):
+        create_consumer(config, EventBus())
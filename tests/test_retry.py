@@ -0,0 +1,137 @@
+import time
+
+import pytest
+
+from firestation_gateway.consumers.base import BaseConsumerQueued
+from firestation_gateway.consumers.retry import RetryPolicy
+from firestation_gateway.eventbus import EventBus
+
+
+class Failure(Exception):
+    def __init__(self, retryable=True):
+        super().__init__("down")
+        self.retryable = retryable
+
+
+class Sender(BaseConsumerQueued):
+    """Sends every event with send(), which fails with 'failures'."""
+
+    DELIVERY_EXCEPTIONS = (Failure,)
+
+    def __init__(self, failures=(), retry=None):
+        config = {"retry": retry or {"backoff": 0.01, "backoff_max": 0.01}}
+        super().__init__("Sender", EventBus(), {"in_alarm": None}, config)
+        self.failures = list(failures)
+        self.attempts = []
+        self.sent = []
+
+    def handle_event(self, event_name, data, evt_cfg=None):
+        self.deliver(event_name, self.send, data)
+
+    def send(self, data, timeout=10.0):
+        self.attempts.append((data, timeout))
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append(data)
+        return True
+
+    def is_retryable(self, exc):
+        return exc.retryable
+
+
+def handle(consumer, n):
+    consumer.enqueue("in_alarm", {"n": n})
+    consumer.dispatch(consumer.event_queue.get(timeout=1))
+
+
+def run_retries(consumer, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while consumer._retries and time.monotonic() < deadline:
+        time.sleep(consumer.next_retry_timeout())
+        consumer.process_retries()
+
+
+def test_backoff_doubles_up_to_the_maximum():
+    policy = RetryPolicy(backoff=1.0, backoff_max=5.0)
+    for attempt, delay in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0), (9, 5.0)]:
+        for _ in range(20):
+            assert delay / 2 <= policy.delay(attempt) <= delay
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"backoff": 0},
+        {"backoff": 10, "backoff_max": 1},
+        {"attempt_timeout": 0},
+        {"deadline": -1},
+        {"deadline": "soon"},
+        {"retries": 3},
+    ],
+)
+def test_invalid_config(config):
+    with pytest.raises(ValueError, match="retry"):
+        RetryPolicy.from_config(config)
+
+
+def test_failed_delivery_is_retried_after_later_events():
+    consumer = Sender(failures=[Failure()])
+    handle(consumer, 1)
+    # the failed event does not block the next one
+    handle(consumer, 2)
+    assert consumer.sent == [{"n": 2}]
+    assert consumer.next_retry_timeout() is not None
+    run_retries(consumer)
+    assert consumer.sent == [{"n": 2}, {"n": 1}]
+    assert consumer.next_retry_timeout() is None
+
+
+def test_not_retryable_failure_is_given_up():
+    consumer = Sender(failures=[Failure(retryable=False)])
+    handle(consumer, 1)
+    assert not consumer._retries
+    assert consumer.sent == []
+
+
+def test_retries_end_at_the_deadline():
+    consumer = Sender(
+        failures=[Failure()] * 100,
+        retry={"backoff": 0.01, "backoff_max": 0.02, "deadline": 0.2},
+    )
+    handle(consumer, 1)
+    run_retries(consumer)
+    assert not consumer._retries
+    assert consumer.sent == []
+    assert 2 < len(consumer.attempts) < 100
+    # the last attempts get the time left until the deadline at most
+    assert consumer.attempts[-1][1] <= 0.2
+
+
+def test_unexpected_error_is_not_retried():
+    consumer = Sender(failures=[RuntimeError("bug")])
+    handle(consumer, 1)
+    handle(consumer, 2)
+    assert not consumer._retries
+    assert consumer.sent == [{"n": 2}]
+
+
+class Broken(Sender):
+    def handle_event(self, event_name, data, evt_cfg=None):
+        if data["n"] == 1:
+            raise KeyError("template")
+        super().handle_event(event_name, data, evt_cfg)
+
+
+def test_consumer_thread_survives_a_failing_event():
+    consumer = Broken()
+    consumer.start()
+    try:
+        consumer.enqueue("in_alarm", {"n": 1})
+        consumer.enqueue("in_alarm", {"n": 2})
+        deadline = time.monotonic() + 2
+        while not consumer.sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert consumer.sent == [{"n": 2}]
+    finally:
+        consumer.stop()
+        consumer.join(2)
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from firestation_gateway import shmring
+from firestation_gateway.shmring import ShmRing
+
+
+def record_size(event_name, data, trace=None):
+    return shmring._RECORD.size + len(json.dumps([event_name, data, trace]))
+
+
+@pytest.fixture
+def ring():
+    ring = ShmRing.create(4 * record_size("in_alarm", {"n": 0}))
+    yield ring
+    ring.close()
+
+
+def test_put_get_in_order(ring):
+    assert ring.get() is None
+    for n in range(3):
+        assert ring.put("in_alarm", {"n": n})
+    assert len(ring) == 3
+    assert [ring.get() for _ in range(3)] == [
+        ("in_alarm", {"n": n}, None) for n in range(3)
+    ]
+    assert ring.get() is None
+    assert len(ring) == 0
+
+
+def test_full_ring_and_wrap_around(ring):
+    for lap in range(5):
+        for n in range(4):
+            assert ring.put("in_alarm", {"n": n})
+        assert not ring.put("in_alarm", {"n": 4})
+        assert [ring.get()[1]["n"] for _ in range(4)] == [0, 1, 2, 3], lap
+
+
+def test_attach_shares_the_ring(ring):
+    reader = ShmRing.attach(ring.path)
+    try:
+        ring.put("in_alarm", {"n": 1}, {"emit": 5})
+        assert reader.get() == ("in_alarm", {"n": 1}, {"emit": 5})
+        reader.drained = True
+        assert ring.drained
+    finally:
+        reader.close()
+
+
+def test_record_of_previous_lap_is_not_read(ring):
+    size = record_size("in_alarm", {"n": 0})
+    for n in range(4):
+        ring.put("in_alarm", {"n": n})
+    for _ in range(4):
+        ring.get()
+    # 'head' visible before the bytes of the next record: the offset
+    # still holds the complete record {"n": 0} of the last lap
+    head = ring._get(shmring._HEAD)
+    ring._set(shmring._HEAD, head + size)
+    ring._set(shmring._WRITTEN, ring._get(shmring._WRITTEN) + 1)
+    assert ring.get() is None
+    # the bytes arrive
+    ring._set(shmring._HEAD, head)
+    ring._set(shmring._WRITTEN, ring._get(shmring._WRITTEN) - 1)
+    ring.put("in_alarm", {"n": 9})
+    assert ring.get() == ("in_alarm", {"n": 9}, None)
+
+
+def test_partly_visible_record_is_not_read(ring):
+    ring.put("in_alarm", {"n": 1})
+    # last payload byte not visible yet
+    pos = shmring._DATA + record_size("in_alarm", {"n": 1}) - 1
+    byte = ring.buf[pos]
+    ring.buf[pos] = 0
+    assert ring.get() is None
+    ring.buf[pos] = byte
+    assert ring.get() == ("in_alarm", {"n": 1}, None)
@@ -0,0 +1,92 @@
+import os
+import select
+import time
+
+from firestation_gateway.eventbus import EventBus
+from firestation_gateway.gpio import simulation
+from firestation_gateway.producers.generic_input import GenericInput
+
+
+def wait_level(line, level, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while line.read() != level and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return line.read()
+
+
+def test_level_changes_are_edge_events():
+    line = simulation.SimulatedLine("test")
+    poller = select.poll()
+    poller.register(line.fd, select.POLLIN)
+    assert not poller.poll(0)
+
+    line.set(True)
+    line.set(True)
+    line.set(False)
+    assert poller.poll(0)
+    assert line.poll()
+    assert line.read_event().edge == "rising"
+    falling = line.read_event()
+    assert falling.edge == "falling"
+    assert falling.timestamp <= time.monotonic_ns()
+    assert not line.poll()
+    # all events read: no longer signalled
+    assert not poller.poll(0)
+    assert not line.read()
+
+
+def test_lines_are_shared_by_name():
+    line = simulation.get_line("Shared_Input")
+    assert simulation.get_line("shared_input") is line
+    simulation.set_line("SHARED_INPUT", True)
+    assert line.read()
+
+
+def test_trigger_file_drives_the_line(tmp_path):
+    path = tmp_path / "eingang_active"
+    path.touch()
+    line = simulation.SimulatedLine("file")
+    simulation.watch_file(str(path), line)
+    # the current state is taken at once
+    assert line.read()
+
+    os.remove(path)
+    assert not wait_level(line, False)
+    path.write_text("1")
+    assert wait_level(line, True)
+    os.rename(path, tmp_path / "other")
+    assert not wait_level(line, False)
+
+
+def test_unwatched_file_does_not_drive_the_line(tmp_path):
+    path = tmp_path / "eingang_unwatched"
+    line = simulation.SimulatedLine("unwatched")
+    simulation.watch_file(str(path), line)
+    watcher = simulation._watcher
+    assert tmp_path in watcher._dirs
+    simulation.unwatch_file(str(path), line)
+    # the last file of the directory: the watch is removed
+    assert tmp_path not in watcher._dirs
+    path.touch()
+    time.sleep(0.05)
+    assert not line.read()
+
+
+def test_closed_input_is_unwatched():
+    producer = GenericInput("SimWatch", EventBus(), {}, {"time_alarm": 1})
+    name = b"firestation_gw_simwatch_active"
+    watches = simulation._watcher._watches
+    assert any(name in files for files in watches.values())
+    producer.close()
+    assert not any(name in files for files in watches.values())
+
+
+def test_memory_input_waits_for_edges():
+    producer = GenericInput(
+        "SimIn", EventBus(), {}, {"time_alarm": 1, "simulate": "memory"}
+    )
+    try:
+        assert producer.edge_detect
+        assert producer.pin_in is simulation.get_line("simin")
+    finally:
+        producer.close()
@@ -0,0 +1,144 @@
+import json
+
+import pytest
+
+from firestation_gateway.eventbus import EventBus
+from firestation_gateway.producers.tetracontrol_status import (
+    StatusPollPolicy,
+    TetracontrolStatus,
+    _entries,
+)
+
+
+class Response:
+    def __init__(self, payload):
+        self.content = json.dumps(payload).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Client:
+    """issi.json answers, one per poll."""
+
+    def __init__(self, *payloads):
+        self.responses = [Response(p) for p in payloads]
+
+    def issi_status(self, used_filter, timeout):
+        _ = used_filter, timeout
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+def status_producer(events, payloads, **config):
+    bus = EventBus()
+    emitted = []
+
+    def record(name, data, _):
+        emitted.append((name, data))
+
+    for event in events:
+        bus.subscribe(event, record)
+    producer = TetracontrolStatus(
+        "FMS",
+        bus,
+        {event[len("fms_") :]: None for event in events},
+        dict(
+            {
+                "url": "http://127.0.0.1:9",
+                "prewarm": False,
+                "refresh_interval": 0,
+            },
+            **config,
+        ),
+    )
+    producer.client.close()
+    producer.client = Client(*payloads)
+    return producer, emitted
+
+
+def entries(*pairs):
+    return [{"ISSI": issi, "Status": status} for issi, status in pairs]
+
+
+def test_only_changes_are_emitted():
+    producer, emitted = status_producer(
+        ["fms_status", "fms_status_3", "fms_1001_2"],
+        [
+            entries((1001, 1), (1002, 2)),
+            entries((1001, 1), (1002, 2)),
+            entries((1001, 2), (1002, 3)),
+        ],
+    )
+    # the first poll takes the snapshot
+    assert producer.poll() == 0
+    assert producer.poll() == 0
+    assert producer.poll() == 2
+    assert [name for name, _ in emitted] == [
+        "fms_status",
+        "fms_1001_2",
+        "fms_status",
+        "fms_status_3",
+    ]
+    _, data = emitted[-1]
+    assert data["issi"] == "1002"
+    assert (data["previous"], data["status"]) == ("2", "3")
+    assert producer.snapshot == {"1001": "2", "1002": "3"}
+
+
+def test_failed_emit_is_repeated_by_the_next_poll():
+    producer, emitted = status_producer(
+        ["fms_status"],
+        [entries((1, 1), (2, 1))] + [entries((1, 2), (2, 2))] * 2,
+    )
+    producer.poll()
+    emit = producer.emitter.emit
+    calls = []
+
+    def failing(name, data):
+        calls.append(data["issi"])
+        if len(calls) == 2:
+            raise RuntimeError("queue")
+        emit(name, data)
+
+    producer.emitter.emit = failing
+    with pytest.raises(RuntimeError):
+        producer.poll()
+    assert producer.snapshot == {"1": "2", "2": "1"}
+    # the same answer again: only the change not emitted yet
+    assert producer.poll() == 1
+    assert [data["issi"] for _, data in emitted] == ["1", "2"]
+
+
+def test_initial_status_is_emitted_on_request():
+    producer, emitted = status_producer(
+        ["fms_status"], [entries((1, "A"))], emit_initial=True
+    )
+    assert producer.poll() == 1
+    assert emitted[0][1]["previous"] is None
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        [{"ISSI": 7, "Status": 4}, {"ISSI": 8}],
+        {"list": [{"ISSI": 7, "Status": 4}]},
+        {"7": {"Status": 4}},
+        {"7": 4},
+    ],
+)
+def test_response_formats(payload):
+    assert list(_entries(payload, "ISSI", "Status")) == [("7", "4")]
+
+
+def test_unknown_format():
+    with pytest.raises(TypeError):
+        list(_entries("x", "ISSI", "Status"))
+
+
+def test_quiet_polls_stretch_the_interval():
+    policy = StatusPollPolicy(interval=2, interval_max=5, backoff=1)
+    assert [policy.delay(q, 0) for q in range(4)] == [2, 3, 4.5, 5]
+    assert [policy.delay(0, f) for f in range(1, 4)] == [1, 2, 4]
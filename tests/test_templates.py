@@ -0,0 +1,129 @@
+import json
+from urllib.parse import parse_qs
+
+import pytest
+
+from firestation_gateway.connectapi import OperationTemplate
+from firestation_gateway.consumers.connect import Connect
+from firestation_gateway.consumers.tetracontrol import Tetracontrol
+from firestation_gateway.eventbus import EventBus
+from firestation_gateway.tetracontrol import SDSTemplate, TETRAcontrolSDSTyp
+
+
+def form(body):
+    return {k: v[0] for k, v in parse_qs(body).items()}
+
+
+def test_sds_body_sets_only_device_and_callout_number():
+    template = SDSTemplate(
+        {"Ziel": 1234, "Text": "Alarm & Co", "Typ": 1, "Flash": 1}
+    )
+    assert form(template.body(device_id=3)) == {
+        "Ziel": "1234",
+        "Text": "Alarm & Co",
+        "Typ": "1",
+        "Flash": "1",
+        "Encr": "1",
+        "Prio": "0",
+        "GerID": "3",
+    }
+
+    callout = SDSTemplate(
+        {"Ziel": 5, "Text": "x", "Typ": TETRAcontrolSDSTyp.CALLOUT}, 2
+    )
+    assert callout.callout
+    fields = form(callout.body(17))
+    assert (fields["GerID"], fields["CONum"]) == ("2", "17")
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"Ziel": 1, "Text": "x", "Typ": 7},
+        {"Ziel": 1, "Text": "x", "Prio": 16},
+        {"Ziel": 1, "Text": "x", "Unknown": 1},
+        {"Text": "x"},
+    ],
+)
+def test_invalid_sds_fails_when_compiled(data):
+    with pytest.raises(ValueError):
+        SDSTemplate(data)
+
+
+def test_sds_send_values_are_checked():
+    callout = SDSTemplate({"Ziel": 5, "Text": "x", "Typ": 195})
+    with pytest.raises(ValueError, match="CONum"):
+        callout.body(251)
+    with pytest.raises(ValueError, match="GerID"):
+        callout.body(1, device_id=5)
+
+
+def test_operation_body_sets_only_start():
+    template = OperationTemplate(
+        {"Keyword": "F1", "Ric": "123", "Address": {"City": "Ort"}}
+    )
+    body = json.loads(template.body("2024-05-01T10:00:00"))
+    assert body == {
+        "Keyword": "F1",
+        "Ric": "123",
+        "Address": {"City": "Ort"},
+        "Start": "2024-05-01T10:00:00",
+    }
+
+
+@pytest.mark.parametrize(
+    "operation",
+    [{"Ric": "1"}, {"Keyword": "F1", "Ric": ""}],
+)
+def test_operation_without_keyword_or_ric(operation):
+    with pytest.raises(ValueError):
+        OperationTemplate(operation)
+
+
+def tetracontrol(events_config):
+    return Tetracontrol(
+        "TC",
+        EventBus(),
+        events_config,
+        {"url": "http://127.0.0.1:9", "token": "t", "testmode": True},
+    )
+
+
+def test_tetracontrol_compiles_one_template_per_destination():
+    consumer = tetracontrol(
+        {
+            "in_alarm": {"text": "Alarm", "dest": [1, "2"], "type": "callout"},
+            "in_idle": {"text": "Ende", "dest": 3, "enabled": False},
+        }
+    )
+    try:
+        templates = consumer.templates["in_alarm"]
+        assert [t.model.Ziel for t in templates] == [1, 2]
+        assert all(t.callout for t in templates)
+        assert "in_idle" not in consumer.templates
+    finally:
+        consumer.close()
+
+
+@pytest.mark.parametrize(
+    "evt_cfg, message",
+    [
+        ({"dest": 1}, "'text' missing"),
+        ({"text": "x", "dest": "abc"}, "Invalid 'dest'"),
+        ({"text": "x", "dest": []}, "'dest' missing"),
+    ],
+)
+def test_invalid_event_fails_at_startup(evt_cfg, message):
+    with pytest.raises((TypeError, ValueError), match=f"in_alarm: {message}"):
+        tetracontrol({"in_alarm": evt_cfg})
+
+
+def test_connect_compiles_one_template_per_ric():
+    templates = Connect.compile_operation(
+        "in_alarm",
+        {"keyword": "F1", "ric": ["1", "2"], "address": {"city": "Ort"}},
+    )
+    assert [t.operation["Ric"] for t in templates] == ["1", "2"]
+    assert templates[0].operation["Address"]["City"] == "Ort"
+    with pytest.raises(ValueError, match="in_alarm: Operation: 'Keyword'"):
+        Connect.compile_operation("in_alarm", {"ric": "1"})
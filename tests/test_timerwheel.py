@@ -0,0 +1,80 @@
+import random
+
+from firestation_gateway.gpio.timerwheel import RESOLUTION, TimerWheel
+
+MS = RESOLUTION
+
+
+def callback():
+    pass
+
+
+def test_expire_in_deadline_order_across_levels():
+    wheel = TimerWheel(0)
+    # level 0, 1, 2 and beyond the top level
+    deadlines = [5 * MS, 300 * MS, 70_000 * MS, (1 << 33) * MS, 1 * MS]
+    timers = {wheel.schedule(d, callback): d for d in deadlines}
+    assert len(wheel) == 5
+    fired = []
+    now = 0
+    while len(wheel):
+        now = wheel.next_expiry()
+        for timer in wheel.expire(now):
+            assert timer.deadline <= now
+            fired.append(timers[timer])
+    assert fired == sorted(deadlines)
+
+
+def test_next_expiry_rounds_up_to_the_tick():
+    wheel = TimerWheel(0)
+    assert wheel.next_expiry() is None
+    wheel.schedule(MS + 1, callback)
+    assert wheel.next_expiry() == 2 * MS
+    assert wheel.expire(2 * MS - 1) == []
+    assert len(wheel.expire(2 * MS)) == 1
+    assert wheel.next_expiry() is None
+
+
+def test_past_deadline_expires_at_once():
+    wheel = TimerWheel(10 * MS)
+    timer = wheel.schedule(5 * MS, callback)
+    assert wheel.next_expiry() == 0
+    assert wheel.expire(10 * MS) == [timer]
+
+
+def test_cancel_and_reschedule():
+    wheel = TimerWheel(0)
+    timer = wheel.schedule(10 * MS, callback)
+    wheel.cancel(timer)
+    wheel.cancel(timer)
+    wheel.cancel(None)
+    assert len(wheel) == 0
+    assert wheel.expire(20 * MS) == []
+
+    timer = wheel.schedule(30 * MS, callback)
+    assert wheel.reschedule(timer, 30 * MS, callback) is timer
+    moved = wheel.reschedule(timer, 500 * MS, callback)
+    assert moved is not timer and len(wheel) == 1
+    assert wheel.expire(100 * MS) == []
+    assert wheel.expire(500 * MS) == [moved]
+    assert wheel.reschedule(None, None, callback) is None
+
+
+def test_random_deadlines_match_a_sorted_list():
+    rnd = random.Random(7)
+    wheel = TimerWheel(0)
+    pending = {}
+    now = 0
+    for _ in range(2000):
+        if pending and rnd.random() < 0.2:
+            timer = rnd.choice(list(pending))
+            wheel.cancel(timer)
+            del pending[timer]
+        deadline = now + rnd.randrange(1, 200_000) * MS
+        pending[wheel.schedule(deadline, callback)] = deadline
+        now += rnd.randrange(0, 5_000) * MS
+        for timer in wheel.expire(now):
+            assert pending.pop(timer) <= now
+        # nothing due is left behind
+        assert all(d > now for d in pending.values())
+    assert len(wheel) == len(pending)
@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from firestation_gateway.consumers.generic_webhook import GenericWebhook
+from firestation_gateway.eventbus import EventBus, emit_traced
+
+RETRY = {"backoff": 0.05, "backoff_max": 0.05, "deadline": 5}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):  # pylint: disable=invalid-name
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.requests.append((self.path, time.monotonic(), body))
+            statuses = server.statuses.get(self.path, [])
+            status = statuses.pop(0) if statuses else 200
+        time.sleep(server.delay)
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.statuses = {}
+    httpd.delay = 0.0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def start_webhook(config, events_config=None):
+    bus = EventBus()
+    params = dict({"retry": RETRY, "prewarm": False}, **config)
+    consumer = GenericWebhook(
+        "Webhook", bus, events_config or {"in_alarm": None}, params
+    )
+    consumer.start()
+    return bus, consumer
+
+
+def wait_requests(server, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while len(server.requests) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return list(server.requests)
+
+
+def stop(consumer):
+    consumer.stop()
+    consumer.join(5)
+
+
+def test_body_template_and_no_trace(server):
+    bus, consumer = start_webhook(
+        {"url": url(server, "/hook")},
+        {"in_alarm": {"body": {"who": "{data[source]}", "data": "{data}"}}},
+    )
+    try:
+        trace = {"edge": 1, "debounce": 2, "emit": 3}
+        emit_traced(bus, "in_alarm", {"source": "in"}, trace)
+        [(path, _, body)] = wait_requests(server, 1)
+    finally:
+        stop(consumer)
+    assert path == "/hook"
+    assert json.loads(body) == {"who": "in", "data": {"source": "in"}}
+
+
+def test_server_error_is_retried(server):
+    server.statuses["/hook"] = [503]
+    bus, consumer = start_webhook({"url": url(server, "/hook")})
+    try:
+        bus.emit("in_alarm", {"source": "in"})
+        requests = wait_requests(server, 2)
+    finally:
+        stop(consumer)
+    assert len(requests) == 2
+    assert requests[0][2] == requests[1][2]
+
+
+def test_client_error_is_not_retried(server):
+    server.statuses["/hook"] = [400]
+    bus, consumer = start_webhook({"url": url(server, "/hook")})
+    try:
+        bus.emit("in_alarm", {"source": "in"})
+        wait_requests(server, 1)
+        # a retry would be sent after the backoff
+        time.sleep(0.3)
+    finally:
+        stop(consumer)
+    assert len(server.requests) == 1
+
+
+def test_endpoints_are_sent_at_the_same_time(server):
+    server.delay = 0.3
+    bus, consumer = start_webhook(
+        {
+            "endpoints": [
+                {"name": "a", "url": url(server, "/a")},
+                {"name": "b", "url": url(server, "/b")},
+                {"name": "c", "url": url(server, "/c")},
+            ]
+        }
+    )
+    try:
+        bus.emit("in_alarm", {"source": "in"})
+        requests = wait_requests(server, 3)
+    finally:
+        stop(consumer)
+    assert sorted(path for path, _, _ in requests) == ["/a", "/b", "/c"]
+    stamps = [t for _, t, _ in requests]
+    # not one after the other (0.3 s each)
+    assert max(stamps) - min(stamps) < 0.25
+
+
+def test_invalid_body_names_the_event():
+    with pytest.raises(TypeError, match="in_alarm: body"):
+        GenericWebhook(
+            "Webhook",
+            EventBus(),
+            {"in_alarm": {"body": 5}},
+            {"url": "http://127.0.0.1:9/", "prewarm": False},
+        )